@@ -9,14 +9,17 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from core.config import APPConfig, APIConfiguration
-from db.session import get_db
+from core.config import get_app_config
+from db.session import get_read_db
 from core.exceptions import AppException
+from core.security import verify_access_token, revocation_store
+from db.repositories.user_repository import UserRepository
+from models.orm.users import UserRole
 
 from core.middlewares import CustomOAuth2Middleware
 
 # Security Schemes
-oauth2_schemes = CustomOAuth2Middleware(tokenUrl=f"{APPConfig.APP_API_DEFAULT_PATH}/auth/login", auto_error=False)
+oauth2_schemes = CustomOAuth2Middleware(tokenUrl=f"{get_app_config().APP_API_DEFAULT_PATH}/auth/login", auto_error=False)
 http_bearer = HTTPBearer(auto_error=False)
 
 class TokenPayload(BaseModel):
@@ -27,7 +30,29 @@ class TokenPayload(BaseModel):
     scopes: list[str] = []
     
 
-async def get_current_user(request: Request, db: Annotated[AsyncSession, Depends(get_db)],
+async def get_current_user(request: Request, db: Annotated[AsyncSession, Depends(get_read_db)],
                            credentials: Annotated[Optional[HTTPAuthorizationCredentials], Depends(http_bearer)],
                            token: Annotated[Optional[str], Depends(oauth2_schemes)]):
-    pass
\ No newline at end of file
+    token = credentials.credentials if credentials else token
+    if not token:
+        raise AppException.Unauthorized()
+
+    try:
+        # revocation is checked on every call, even when the claims come from the token cache
+        claims = verify_access_token(token, is_revoked=revocation_store.is_revoked_claims)
+        user_id = uuid.UUID(claims["sub"])
+    except (ValueError, KeyError, JWTError):
+        raise AppException.Unauthorized()
+
+    user = await UserRepository(db).get_by_id(user_id)
+    if user is None or not user.is_active:
+        raise AppException.Unauthorized()
+
+    request.state.token_claims = claims
+    return user
+
+
+async def require_admin(current_user = Depends(get_current_user)):
+    if current_user.role != UserRole.ADMIN:
+        raise AppException.Forbidden()
+    return current_user
@@ -0,0 +1,30 @@
+import asyncio, threading
+
+from fastapi import APIRouter, status, HTTPException, Depends, Query
+from fastapi.responses import PlainTextResponse
+
+from api.v1.dependencies.auth import require_admin
+from core.observability import profiler
+
+admin_endpoint = APIRouter(prefix="/admin", tags=["Administration"], dependencies=[Depends(require_admin)])
+
+
+@admin_endpoint.get("/profile", response_class=PlainTextResponse)
+async def profile_worker(
+    seconds: float = Query(10, gt=0, le=60),
+    interval_ms: float = Query(5, ge=1, le=100)
+):
+    """Sample this worker's event loop for `seconds` and return a flamegraph-ready collapsed-stack file"""
+    already_running = HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A profile is already running on this worker")
+    if profiler.running:
+        raise already_running
+
+    # the sampler runs in a side thread, the loop keeps serving (and gets sampled) meanwhile
+    loop_thread = threading.get_ident()
+    try:
+        collapsed = await asyncio.to_thread(profiler.profile, loop_thread, seconds, interval_ms / 1000)
+    except RuntimeError:
+        # the check above is only a shortcut: two requests can both pass it before either thread
+        # took the lock, profile() itself refuses the second one
+        raise already_running
+    return PlainTextResponse(collapsed, headers={"Content-Disposition": 'attachment; filename="profile.collapsed"'})
@@ -1,14 +1,78 @@
-from fastapi import APIRouter, status, Depends, HTTPException
+from fastapi import APIRouter, status, Depends, HTTPException, Request, Response
 from fastapi.security import OAuth2PasswordRequestForm
 
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from datetime import timedelta
 from typing import Annotated
+from uuid import UUID
+
+from jose import JWTError
+
+from api.v1.dependencies.auth import get_current_user
+from core.exceptions import AppException
+from core.security import api_config, create_access_token, create_refresh_token, hashing_service, revocation_store, verify_refresh_token
+from db.repositories.user_repository import UserRepository
+from db.session import get_db, get_read_db
+from db.write_behind import user_counters
+from models.schemas.token import TokenCreate, TokenRefresh
 
 auth_route = APIRouter(tags=['Authentication'])
 
-@auth_route.post("/login")
-async def login(auth: Annotated[OAuth2PasswordRequestForm, Depends()]):
-    pass
+@auth_route.post("/login", response_model=TokenCreate)
+async def login(auth: Annotated[OAuth2PasswordRequestForm, Depends()], db: Annotated[AsyncSession, Depends(get_db)]):
+    """
+        `username` may be the username or the email. Attempt accounting and lockout happen in one
+        UPDATE (UserRepository.begin_login), argon2 runs after that transaction committed
+    """
+    repository = UserRepository(db)
+    attempt = await repository.begin_login(
+        auth.username,
+        max_attempts=api_config.API_LOGIN_MAX_ATTEMPTS,
+        lockout=timedelta(minutes=api_config.API_LOGIN_LOCKOUT_MINUTES)
+    )
+    # same answer for unknown / locked / wrong password, nothing to enumerate
+    if attempt is None:
+        raise AppException.Unauthorized()
+
+    result = await hashing_service.verify(auth.password, attempt.hashed_password)
+    if not result.valid:
+        raise AppException.Unauthorized()
+
+    await repository.finish_login(attempt.user_id, new_hash=result.new_hash)
+    user_counters.touch_login(attempt.user_id)
+    subject = str(attempt.user_id)
+    return TokenCreate(
+        token_type="bearer",
+        access_token=await create_access_token({"type": "access"}, subject=subject),
+        refresh_token=await create_refresh_token({"type": "refresh"}, subject=subject)
+    )
+
+@auth_route.post("/refresh-token", response_model=TokenCreate)
+async def refresh_token(body: TokenRefresh, db: Annotated[AsyncSession, Depends(get_read_db)]):
+    """New access + refresh token pair, the refresh token sent in is revoked (rotation, single use)"""
+    try:
+        claims = verify_refresh_token(body.refresh_token)
+        user_id = UUID(claims["sub"])
+    except (ValueError, KeyError, JWTError):
+        raise AppException.Unauthorized()
+    # claimed before anything is awaited, a replayed or concurrent refresh with the same token gets 401
+    if claims.get("type") != "refresh" or not await revocation_store.claim(claims["jti"], claims["exp"]):
+        raise AppException.Unauthorized()
+
+    user = await UserRepository(db).get_by_id(user_id)
+    if user is None or not user.is_active:
+        raise AppException.Unauthorized()
+    subject = str(user_id)
+    return TokenCreate(
+        token_type="bearer",
+        access_token=await create_access_token({"type": "access"}, subject=subject),
+        refresh_token=await create_refresh_token({"type": "refresh"}, subject=subject)
+    )
 
-@auth_route.post("/refresh-token")
-async def refresh_token():
-    pass
\ No newline at end of file
+@auth_route.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(request: Request, current_user = Depends(get_current_user)):
+    """Revoke the access token used for this request until it expires"""
+    claims = request.state.token_claims
+    await revocation_store.revoke(claims["jti"], claims["exp"])
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
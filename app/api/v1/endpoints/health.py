@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Request, status
+from fastapi.responses import JSONResponse
+
+health_endpoint = APIRouter(tags=["Health"])
+
+
+@health_endpoint.get("/live")
+async def live():
+    """The worker is up and its event loop answers, restart it when this fails"""
+    return {"status": "alive"}
+
+
+@health_endpoint.get("/ready")
+async def ready(request: Request):
+    """Send traffic here only once the db pool is warm, flips back while draining on shutdown"""
+    state = getattr(request.app.state, "readiness", "starting")
+    if state != "ready":
+        return JSONResponse({"status": state}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return {"status": state}
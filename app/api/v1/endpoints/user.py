@@ -1,14 +1,68 @@
-from fastapi import APIRouter, status, HTTPException, Depends
-from fastapi.responses import JSONResponse
+from typing import Optional
+from uuid import UUID
 
-from models.schemas.user import UserCreate, UserPublic
-from models.orm.users import User, UserProfile
+from fastapi import APIRouter, status, HTTPException, Depends, Header, Request, Query
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from api.v1.dependencies.auth import get_current_user, require_admin
+from models.schemas.profile import ProfilePublic
+from models.schemas.user import UserCreate, UserPublic, UserUpdate
+from models.orm.users import User, UserProfile, UserRole
+from core.conditional import REVALIDATE, content_etag, match_versions, none_match, version_etag
+from core.config import get_api_config
+from core.security import hashing_service
+from core.exceptions import AppException, AppExceptionHandler
+from core.bulk_import import BulkUserImporter, iter_records
+from core.responses import DuplexStreamingResponse, SchemaJSONResponse, json_dumps
+from core.pagination import encode_cursor, decode_cursor
+from core.password_policy import username_policy
+from db.availability import availability_index, normalize_email, normalize_username
+from db.repositories.profile_repository import ProfileRepository
+from db.repositories.user_repository import UserRepository
 # Database 
-from db.session import get_db, AsyncSession
+from db.session import get_db, get_read_db, AsyncSession, session_manager
 
 user_endpoint = APIRouter(tags=["User Information"])
 
 #
+@user_endpoint.get("/users", response_class=StreamingResponse, dependencies=[Depends(require_admin)])
+async def list_users(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    role: Optional[UserRole] = None,
+    is_active: Optional[bool] = None
+):
+    """List users newest first, keyset paginated. Body: {"items": [UserPublic...], "next_cursor": str | null}"""
+    try:
+        after = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    async def page():
+        # own session, the response is streamed after request dependencies are torn down
+        async with session_manager.session() as session:
+            yield b'{"items":['
+            count, last = 0, None
+            async for row in UserRepository(session).stream_page(limit + 1, after, role, is_active):
+                if count == limit:
+                    break
+                yield (b"," if count else b"") + json_dumps({
+                    "email": row.email,
+                    "username": row.username,
+                    "user_id": row.user_id,
+                    "role": row.role,
+                    "is_active": row.is_active
+                })
+                count, last = count + 1, row
+            else:
+                last = None  # fewer than limit + 1 rows, this is the last page
+
+            next_cursor = encode_cursor(last.created_at, last.user_id) if last is not None else None
+            yield b'],"next_cursor":' + json_dumps(next_cursor) + b'}'
+
+    return StreamingResponse(page(), media_type="application/json")
+
+
 @user_endpoint.post("/users", response_model=UserPublic, status_code=status.HTTP_201_CREATED)
 async def create_user(
     user_data: UserCreate, 
@@ -16,8 +70,8 @@ async def create_user(
 ):
     """Create new user with profile"""
     try:
-        # Hash password properly
-        hashed_password = user_data.password
+        # Hash password off the event loop
+        hashed_password = await hashing_service.hash(user_data.password)
         
         # Create user with profile
         db_user = User(
@@ -35,13 +89,153 @@ async def create_user(
         db.add(db_user)
         await db.commit()
         await db.refresh(db_user)
+        availability_index.add(db_user.username, db_user.email)
         
-        # Convert to Pydantic model
-        return UserPublic.model_validate(db_user)
+        # Serialized once straight from the ORM row, FastAPI's response_model pass is skipped
+        return SchemaJSONResponse(
+            db_user, UserPublic, status_code=status.HTTP_201_CREATED,
+            headers={"ETag": version_etag(db_user.updated_at, UserPublic)}
+        )
         
+    except AppExceptionHandler:
+        raise
     except Exception as e:
         await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
-        )
\ No newline at end of file
+        )
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": REVALIDATE})
+
+
+def require_owner(user_id: UUID, current_user: User):
+    if current_user.user_id != user_id and current_user.role != UserRole.ADMIN:
+        raise AppException.Forbidden()
+
+
+@user_endpoint.get("/users/availability")
+async def check_availability(
+    username: Optional[str] = Query(None, max_length=70),
+    email: Optional[str] = Query(None, max_length=255),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+        Signup form check, {"username": bool, "email": bool} for the ones asked. Free names are answered
+        by the in-memory filter (db/availability.py), only a probable hit runs the exact query
+    """
+    if username is None and email is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Pass username and/or email")
+
+    repository = UserRepository(db)
+    result = {}
+    if username is not None:
+        username = normalize_username(username)
+        result["username"] = username.lower() not in username_policy.restricted and await availability_index.is_available(
+            availability_index.might_have_username, repository.username_taken, username
+        )
+    if email is not None:
+        result["email"] = await availability_index.is_available(
+            availability_index.might_have_email, repository.email_taken, normalize_email(email)
+        )
+    return result
+
+
+@user_endpoint.get("/users/{user_id}", response_model=UserPublic)
+async def get_user(
+    user_id: UUID,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+    if_none_match: Optional[str] = Header(None)
+):
+    """Strong ETag from the row version, a matching If-None-Match is answered from a version-only query"""
+    require_owner(user_id, current_user)
+    repository = UserRepository(db)
+    if if_none_match:
+        version = await repository.get_version(user_id)
+        if version is None:
+            raise AppException.UserNotFound(str(user_id))
+        etag = version_etag(version, UserPublic)
+        if none_match(if_none_match, etag):
+            return not_modified(etag)
+
+    user = await repository.read_one(user_id, UserPublic, extra=(User.updated_at,))
+    if user is None:
+        raise AppException.UserNotFound(str(user_id))
+    return SchemaJSONResponse(user, UserPublic, headers={
+        "ETag": version_etag(user["updated_at"], UserPublic), "Cache-Control": REVALIDATE
+    })
+
+
+@user_endpoint.patch("/users/{user_id}", response_model=UserPublic)
+async def update_user(
+    user_id: UUID,
+    update_data: UserUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    if_match: Optional[str] = Header(None)
+):
+    """
+        Optimistic concurrency: send the ETag you last saw as If-Match, a write that lost the race gets 412.
+        current_password is checked against the account being changed
+    """
+    require_owner(user_id, current_user)
+    repository = UserRepository(db)
+    user = await repository.get_by_id(user_id)
+    if user is None:
+        raise AppException.UserNotFound(str(user_id))
+    # UserUpdate already insists on current_password for email / username / password changes
+    if update_data.current_password is not None:
+        hashed = await repository.password_hash(user_id)
+        if not (await hashing_service.verify(update_data.current_password, hashed)).valid:
+            raise AppException.Unauthorized()
+
+    hashed_password = await hashing_service.hash(update_data.new_password) if update_data.new_password else None
+    user = await repository.update(
+        user_id, update_data,
+        if_match=match_versions(if_match, UserPublic) if if_match else None,
+        hashed_password=hashed_password
+    )
+    return SchemaJSONResponse(user, UserPublic, headers={"ETag": version_etag(user.updated_at, UserPublic)})
+
+
+@user_endpoint.get("/users/{user_id}/profile", response_model=ProfilePublic)
+async def get_profile(
+    user_id: UUID,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+    if_none_match: Optional[str] = Header(None)
+):
+    """Profiles have no version column, the ETag is a hash of the body (the row comes from the repository cache)"""
+    require_owner(user_id, current_user)
+    profile = await ProfileRepository(db).get_by_user_id(user_id)
+    if profile is None:
+        raise AppException.UserNotFound(str(user_id))
+
+    response = SchemaJSONResponse(profile, ProfilePublic)
+    etag = content_etag(response.body)
+    if none_match(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = REVALIDATE
+    return response
+
+
+@user_endpoint.post("/users:bulk", response_class=DuplexStreamingResponse, dependencies=[Depends(require_admin)])
+async def bulk_create_users(request: Request):
+    """
+        Bulk import, body is NDJSON (one UserCreate per line) or CSV with a header (Content-Type: text/csv).
+        The report is streamed back as NDJSON, one line per input row, while the upload is still being read.
+        A line over API_BULK_MAX_LINE_BYTES is reported as that row's error (code 413), the rest goes on
+    """
+    max_line_bytes = get_api_config().API_BULK_MAX_LINE_BYTES
+    records = iter_records(request.stream(), request.headers.get("content-type", ""), max_line_bytes)
+    importer = BulkUserImporter(session_manager.session, hashing_service, max_line_bytes=max_line_bytes)
+
+    async def report():
+        async for entry in importer.run(records):
+            yield json_dumps(entry) + b"\n"
+
+    return DuplexStreamingResponse(report())
@@ -0,0 +1,83 @@
+"""
+    Availability index: startup scan time and memory held for N users, then M lookups of names that are
+    not taken, observed false positive rate (= share that still ran the exact query) vs the expected one,
+    and per-check latency filter-first vs always querying. Exits 1 when a taken name was reported free
+    (a false negative would mean a missing key). Throwaway aiosqlite file by default, --url for postgres
+    run from app/ : python -m benchmarks.bench_availability [--users 100000] [--lookups 20000]
+"""
+import argparse, asyncio, os, tempfile, time, uuid
+
+from sqlalchemy import insert
+
+from db.availability import AvailabilityIndex
+from db.cache import RepositoryCache
+from db.repositories.user_repository import UserRepository
+from db.session import DatabaseSessionManager
+from models.orm.users import User, UserRole
+
+
+async def run(users: int, lookups: int, error_rate: float, url: str) -> bool:
+    manager = DatabaseSessionManager()
+    manager.init(url, replica_urls=[])
+    await manager.create_all()
+
+    async with manager.session() as session:
+        for start in range(0, users, 5000):
+            await session.execute(insert(User), [
+                {"user_id": uuid.uuid4(), "email": f"user{i}@example.com", "username": f"user_{i}",
+                 "hashed_password": "x", "role": UserRole.USER}
+                for i in range(start, min(start + 5000, users))
+            ])
+        await session.commit()
+
+    index = AvailabilityIndex(manager.session, capacity=users, error_rate=error_rate)
+    started = time.perf_counter()
+    await index.load()
+    stats = index.stats()
+    print(f"load: {users} users, {stats['keys']} keys in {time.perf_counter() - started:.2f}s, "
+          f"{stats['bytes'] / 1024:.1f} KiB ({stats['bytes'] * 8 / stats['keys']:.1f} bits/key, {stats['hash_count']} hashes)")
+
+    queries = 0
+    async with manager.session() as session:
+        repository = UserRepository(session, RepositoryCache(max_entries=0))
+
+        async def counted(username: str) -> bool:
+            nonlocal queries
+            queries += 1
+            return await repository.username_taken(username)
+
+        free = [f"new_{uuid.uuid4().hex[:16]}" for _ in range(lookups)]
+        started = time.perf_counter()
+        wrong = [name for name in free if not await index.is_available(index.might_have_username, counted, name)]
+        filtered = (time.perf_counter() - started) / lookups * 1e6
+
+        started = time.perf_counter()
+        for name in free:
+            await repository.username_taken(name)
+        direct = (time.perf_counter() - started) / lookups * 1e6
+
+        taken = [f"user_{i}" for i in range(0, users, max(1, users // 1000))]
+        missed = [name for name in taken if await index.is_available(index.might_have_username, counted, name)]
+
+    print(f"free names: {lookups} lookups, {queries - len(taken)} reached the db -> observed fp rate "
+          f"{(queries - len(taken)) / lookups:.4%}, expected {stats['expected_fp_rate']:.4%} (target {error_rate:.4%})")
+    print(f"per check: {filtered:8.1f} us filter first, {direct:8.1f} us exact query every time")
+    print(f"taken names: {len(taken)} checked, {len(missed)} reported free -> {'OK' if not missed and not wrong else 'WRONG'}")
+
+    await manager.close()
+    return not missed and not wrong
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=20_000)
+    parser.add_argument("--error-rate", type=float, default=0.001)
+    parser.add_argument("--url", default=None)
+    args = parser.parse_args()
+    url = args.url or f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    raise SystemExit(0 if asyncio.run(run(args.users, args.lookups, args.error_rate, url)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+    Response compression: CPU seconds per MB and ratio for every codec this process has (gzip always,
+    br / zstd when brotli / zstandard are installed) on a small, a page-sized and an OpenAPI-sized JSON body,
+    then the OpenAPI document through CompressionMiddleware (cached) vs GZipMiddleware (recompressed per request)
+    run from app/ : python -m benchmarks.bench_compression [--iterations 200]
+"""
+import argparse, asyncio, json, time, uuid
+
+from datetime import datetime
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import Response
+from starlette.routing import Route
+
+from core.compression import CompressionMiddleware, available_codecs
+
+
+def users_json(rows: int) -> bytes:
+    return json.dumps([
+        {"user_id": str(uuid.uuid4()), "email": f"user{i}@example.com", "username": f"user_{i}",
+         "role": "user", "is_active": True, "created_at": datetime.now().isoformat()}
+        for i in range(rows)
+    ]).encode()
+
+
+def openapi_json() -> bytes:
+    # shaped like FastAPI's document: many paths repeating the same schema fragments
+    paths = {
+        f"/api/v1/resource{i}/{{item_id}}": {
+            method: {
+                "summary": f"{method.title()} resource {i}", "operationId": f"{method}_resource{i}",
+                "parameters": [{"name": "item_id", "in": "path", "required": True, "schema": {"type": "string", "format": "uuid"}}],
+                "responses": {
+                    "200": {"description": "Successful Response", "content": {"application/json": {"schema": {"$ref": "#/components/schemas/UserPublic"}}}},
+                    "422": {"description": "Validation Error", "content": {"application/json": {"schema": {"$ref": "#/components/schemas/HTTPValidationError"}}}}
+                }
+            } for method in ("get", "patch", "delete")
+        } for i in range(120)
+    }
+    return json.dumps({"openapi": "3.1.0", "info": {"title": "bench", "version": "1.0.0"}, "paths": paths}).encode()
+
+
+def codec_table(iterations: int):
+    bodies = {"1 user": users_json(1), "100 users": users_json(100), "openapi": openapi_json()}
+    print(f"{'codec':<10}{'level':>6} {'body':<10}{'size':>10}{'ratio':>8}{'cpu s/MB':>10}")
+    for codec in available_codecs():
+        for name, body in bodies.items():
+            # small bodies need more rounds for a measurable time
+            rounds = max(iterations, 200_000 // len(body))
+            started = time.process_time()
+            for _ in range(rounds):
+                compressed = codec.compress(body)
+            cpu = time.process_time() - started
+            per_mb = cpu / (len(body) * rounds / 1024 / 1024)
+            print(f"{codec.name:<10}{codec.level:>6} {name:<10}{len(body):>10}{len(body) / len(compressed):>8.2f}{per_mb:>10.4f}")
+
+
+async def drive(app, requests: int) -> tuple[float, int]:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/openapi.json", "raw_path": b"/openapi.json", "query_string": b"",
+        "root_path": "", "headers": [(b"host", b"bench"), (b"accept-encoding", b"gzip")],
+        "client": ("127.0.0.1", 5000), "server": ("bench", 80),
+    }
+    sent = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal sent
+        if message["type"] == "http.response.body":
+            sent += len(message.get("body", b""))
+
+    started = time.process_time()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.process_time() - started) / requests * 1e6, sent // requests
+
+
+def middleware_table(requests: int):
+    body = openapi_json()
+
+    async def openapi(request):
+        return Response(body, media_type="application/json")
+
+    apps = {
+        "GZipMiddleware": Starlette(routes=[Route("/openapi.json", openapi)], middleware=[Middleware(GZipMiddleware)]),
+        "CompressionMiddleware": Starlette(routes=[Route("/openapi.json", openapi)], middleware=[Middleware(CompressionMiddleware)]),
+    }
+    for name, app in apps.items():
+        us, size = asyncio.run(drive(app, requests))
+        print(f"/openapi.json via {name:<22}: {us:9.1f} us cpu/request, {size} bytes on the wire")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    codec_table(args.iterations)
+    middleware_table(args.iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+    Per-statement overhead of the pool/cursor instrumentation (budget: < 10us per statement)
+    uses a plain sqlite engine, no server needed
+    run from app/ : python -m benchmarks.bench_db_instrumentation [--queries 50000]
+"""
+import argparse, time
+
+from sqlalchemy import create_engine, text
+
+from db.instrumentation import instrument_engine
+
+BUDGET_US = 10.0
+
+
+def run(instrumented: bool, queries: int) -> float:
+    engine = create_engine("sqlite://")
+    if instrumented:
+        instrument_engine(engine, name="bench", slow_query_ms=1000)
+
+    statement = text("SELECT :value + 1")
+    with engine.connect() as connection:
+        started = time.perf_counter()
+        for value in range(queries):
+            connection.execute(statement, {"value": value})
+        elapsed = time.perf_counter() - started
+    engine.dispose()
+    return elapsed / queries * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=50_000)
+    args = parser.parse_args()
+
+    run(False, 1000)  # warm up the statement cache
+    plain, instrumented = run(False, args.queries), run(True, args.queries)
+    overhead = instrumented - plain
+    print(f"plain        : {plain:6.1f} us/query")
+    print(f"instrumented : {instrumented:6.1f} us/query")
+    print(f"overhead     : {overhead:6.1f} us/query (budget {BUDGET_US} us) -> {'OK' if overhead <= BUDGET_US else 'OVER BUDGET'}")
+    raise SystemExit(0 if overhead <= BUDGET_US else 1)
+
+
+if __name__ == "__main__":
+    main()
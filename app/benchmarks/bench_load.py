@@ -0,0 +1,238 @@
+"""
+    In-process load test: the real app (create_app() + lifespan, all middlewares) driven over ASGI, no
+    network, against a throwaway aiosqlite file. Scenarios run one after the other at --concurrency
+    clients each: create_user, login, refresh (every client follows its own rotated refresh token)
+    and read (GET /users/{id} with a Bearer token). Reports p50/p95/p99 latency and requests/s, the
+    whole sequence runs --repeats times and every metric is the median of the repeats.
+    --save writes them as JSON, --baseline compares against a saved run and exits 1 when a metric is
+    worse by more than --threshold AND by more than --noise-ms (latencies up, rps down)
+    run from app/ : python -m benchmarks.bench_load [--requests 500] [--concurrency 16] [--repeats 5] [--save out.json] [--baseline base.json]
+"""
+import argparse, asyncio, json, os, platform, statistics, sys, tempfile, time
+
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+from urllib.parse import urlencode
+
+PASSWORD = "Bench_pass_123"
+LATENCY_METRICS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def configure(url: str):
+    # must run before the app modules are imported, the config getters cache the environment
+    os.environ["POSTGRES_DATABASE_URL"] = url
+    os.environ.setdefault("API_SECRET_KEY", "bench-access-secret")
+    os.environ.setdefault("API_REFRESH_SECRETKEY", "bench-refresh-secret")
+    os.environ.setdefault("API_CSRFKEY", "bench-csrf-secret")
+    # every simulated client is 127.0.0.1: keep the limiter in the path but out of the way
+    os.environ.setdefault("API_RATELIMIT_MAX_REQUESTS", "1000000000")
+
+
+async def call(app, method: str, path: str, headers: Optional[dict] = None, body: bytes = b"") -> tuple[int, bytes]:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"bench")] + [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+        "client": ("127.0.0.1", 5000), "server": ("bench", 80),
+    }
+    received, status, chunks = False, 0, []
+
+    async def receive():
+        nonlocal received
+        if received:
+            await asyncio.Event().wait()  # nothing more to send, wait like a client that stays connected
+        received = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, b"".join(chunks)
+
+
+def as_json(payload: dict) -> tuple[dict, bytes]:
+    return {"content-type": "application/json"}, json.dumps(payload).encode()
+
+
+def as_form(payload: dict) -> tuple[dict, bytes]:
+    return {"content-type": "application/x-www-form-urlencoded"}, urlencode(payload).encode()
+
+
+def percentile(ordered: list[float], p: float) -> float:
+    # nearest rank
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
+
+
+async def scenario(name: str, requests: int, concurrency: int, request: Callable[[int, int], Awaitable[bool]]) -> dict:
+    """`request(client, n)` does one call and says whether the answer was the expected one"""
+    latencies, errors = [], 0
+
+    async def client(index: int):
+        nonlocal errors
+        for n in range(index, requests, concurrency):
+            started = time.perf_counter()
+            ok = await request(index, n)
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(index) for index in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    result = {
+        "requests": requests, "errors": errors, "rps": round(requests / elapsed, 1),
+        **{metric: round(percentile(ordered, float(metric[1:-3])) * 1000, 2) for metric in LATENCY_METRICS}
+    }
+    print(f"{name:<12}: {result['rps']:9.1f} req/s  p50 {result['p50_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f} ms  "
+          f"p99 {result['p99_ms']:8.2f} ms  errors {errors}")
+    return result
+
+
+def median_of(runs: list[dict]) -> dict:
+    """Per scenario the median of every metric over the repeats, errors from the worst repeat"""
+    return {
+        name: {
+            "requests": runs[0][name]["requests"],
+            "errors": max(run[name]["errors"] for run in runs),
+            **{metric: round(statistics.median(run[name][metric] for run in runs), 2) for metric in ("rps", *LATENCY_METRICS)}
+        }
+        for name in runs[0]
+    }
+
+
+async def run(requests: int, concurrency: int, repeats: int) -> list[dict]:
+    from db.session import DatabaseSessionManager
+    from main import create_app
+
+    schema = DatabaseSessionManager()
+    schema.init(replica_urls=[])
+    await schema.create_all()
+    await schema.close()
+
+    app = create_app()
+    runs = []
+    async with app.router.lifespan_context(app):
+        while getattr(app.state, "readiness", None) != "ready":
+            await asyncio.sleep(0.05)
+        for repeat in range(repeats):
+            print(f"run {repeat + 1}/{repeats}")
+            runs.append(await run_once(app, requests, concurrency, repeat))
+    return runs
+
+
+async def run_once(app, requests: int, concurrency: int, repeat: int) -> dict:
+    """One pass of every scenario, `repeat` keeps its usernames apart from the earlier passes"""
+    results = {}
+    users: list[dict] = [None] * max(requests, concurrency)
+
+    async def create_user(index: int, n: int) -> bool:
+        username = f"bench_{repeat}_{n}_{os.getpid()}"
+        headers, body = as_json({"email": f"{username}@example.com", "username": username,
+                                 "password": PASSWORD, "password_confirm": PASSWORD})
+        status, content = await call(app, "POST", "/users", headers, body)
+        if status == 201:
+            users[n] = {"username": username, "user_id": json.loads(content)["user_id"]}
+        return status == 201
+
+    results["create_user"] = await scenario("create_user", max(requests, concurrency), concurrency, create_user)
+    users = [user for user in users if user]
+    if len(users) < concurrency:
+        raise SystemExit(f"only {len(users)} users created, need {concurrency}")
+
+    async def login(index: int, n: int) -> bool:
+        user = users[n % len(users)]
+        status, content = await call(app, "POST", "/login", *as_form({"username": user["username"], "password": PASSWORD}))
+        if status == 200:
+            user["tokens"] = json.loads(content)
+        return status == 200
+
+    # every user logs in at least once, the clients below reuse their tokens
+    results["login"] = await scenario("login", max(requests, len(users)), concurrency, login)
+
+    async def refresh(index: int, n: int) -> bool:
+        user = users[index]
+        status, content = await call(app, "POST", "/refresh-token", *as_json({"refresh_token": user["tokens"]["refresh_token"]}))
+        if status == 200:
+            user["tokens"] = json.loads(content)
+        return status == 200
+
+    results["refresh"] = await scenario("refresh", requests, concurrency, refresh)
+
+    async def read(index: int, n: int) -> bool:
+        user = users[index]
+        headers = {"authorization": f"Bearer {user['tokens']['access_token']}"}
+        status, _ = await call(app, "GET", f"/users/{user['user_id']}", headers)
+        return status == 200
+
+    results["read"] = await scenario("read", requests, concurrency, read)
+    return results
+
+
+def compare(current: dict, baseline: dict, threshold: float, noise_ms: float) -> list[str]:
+    """
+        Human readable regressions, empty when nothing got worse by more than `threshold` (relative)
+        and `noise_ms` (absolute, a 20% jump of a 0.5 ms p50 is scheduler noise, not a regression)
+    """
+    regressions = []
+    concurrency = current["meta"]["concurrency"]
+    for name, base in baseline["scenarios"].items():
+        now = current["scenarios"].get(name)
+        if now is None:
+            continue
+        for metric in LATENCY_METRICS:
+            if base[metric] and now[metric] > base[metric] * (1 + threshold) and now[metric] - base[metric] > noise_ms:
+                regressions.append(f"{name}.{metric}: {base[metric]} -> {now[metric]} (+{now[metric] / base[metric] - 1:.0%})")
+        if base["rps"] and now["rps"] < base["rps"] * (1 - threshold):
+            # the floor in ms per request, with `concurrency` requests in flight (Little's law)
+            slower_ms = concurrency * 1000 / now["rps"] - concurrency * 1000 / base["rps"]
+            if slower_ms > noise_ms:
+                regressions.append(f"{name}.rps: {base['rps']} -> {now['rps']} ({now['rps'] / base['rps'] - 1:.0%})")
+        if now["errors"] > base["errors"]:
+            regressions.append(f"{name}.errors: {base['errors']} -> {now['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500, help="per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--url", default=None, help="defaults to a throwaway aiosqlite file")
+    parser.add_argument("--save", default=None, help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="JSON from an earlier --save to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed regression, 0.10 = 10%%")
+    parser.add_argument("--noise-ms", type=float, default=2.0, help="latency changes under this many ms never count as a regression")
+    parser.add_argument("--repeats", type=int, default=5, help="runs of every scenario, metrics are their medians")
+    args = parser.parse_args()
+
+    configure(args.url or f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    runs = asyncio.run(run(args.requests, args.concurrency, args.repeats))
+    current = {
+        "meta": {
+            "requests": args.requests, "concurrency": args.concurrency, "repeats": args.repeats,
+            "python": platform.python_version(), "at": datetime.now().isoformat(timespec="seconds")
+        },
+        "scenarios": median_of(runs),
+        "runs": runs
+    }
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(current, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(current, json.load(file), args.threshold, args.noise_ms)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        print(f"compared to {args.baseline}: {'FAIL' if regressions else 'OK'} "
+              f"(medians of {args.repeats} runs, threshold {args.threshold:.0%} and {args.noise_ms} ms)")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
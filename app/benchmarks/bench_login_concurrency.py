@@ -0,0 +1,76 @@
+"""
+    Login accounting under concurrency: N parallel wrong-password attempts on one account through
+    UserRepository.begin_login, the final failed_attempts must be exactly min(N, limit) and exactly that
+    many attempts may have received a hash. Then one good login (finish_login) must reset the count.
+    Exits 1 on a wrong count. Defaults to a throwaway aiosqlite file, pass --url for a real postgres
+    run from app/ : python -m benchmarks.bench_login_concurrency [--attempts 1000] [--url postgresql+asyncpg://...]
+"""
+import argparse, asyncio, os, tempfile, time, uuid
+
+from datetime import timedelta
+
+from sqlalchemy import select
+
+from db.cache import RepositoryCache
+from db.repositories.user_repository import UserRepository
+from db.session import DatabaseSessionManager
+from models.orm.users import User, UserRole
+
+
+async def attempt(manager, cache, login: str, max_attempts: int):
+    async with manager.session() as session:
+        return await UserRepository(session, cache).begin_login(login, max_attempts, timedelta(minutes=15))
+
+
+async def failed_attempts(manager, user_id) -> int:
+    async with manager.session() as session:
+        return await session.scalar(select(User.failed_attempts).where(User.user_id == user_id))
+
+
+async def check(manager, cache, attempts: int, max_attempts: int) -> bool:
+    user_id, login = uuid.uuid4(), f"login_{uuid.uuid4().hex[:12]}"
+    async with manager.session() as session:
+        session.add(User(user_id=user_id, email=f"{login}@example.com", username=login, hashed_password="x", role=UserRole.USER))
+        await session.commit()
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(attempt(manager, cache, login, max_attempts) for _ in range(attempts)))
+    elapsed = time.perf_counter() - started
+
+    expected = min(attempts, max_attempts)
+    granted = sum(result is not None for result in results)
+    counted = await failed_attempts(manager, user_id)
+    ok = granted == expected and counted == expected
+    print(f"{attempts} parallel attempts, limit {max_attempts}: {granted} got a hash, failed_attempts={counted}, "
+          f"expected {expected} -> {'OK' if ok else 'WRONG'} ({attempts / elapsed:.0f} attempts/s)")
+
+    async with manager.session() as session:
+        await UserRepository(session, cache).finish_login(user_id)
+    reset = await failed_attempts(manager, user_id)
+    print(f"after finish_login: failed_attempts={reset} -> {'OK' if reset == 0 else 'WRONG'}")
+    return ok and reset == 0
+
+
+async def run(attempts: int, url: str):
+    manager = DatabaseSessionManager()
+    manager.init(url, replica_urls=[])
+    await manager.create_all()
+    cache = RepositoryCache(max_entries=0)
+
+    ok = await check(manager, cache, attempts, max_attempts=attempts * 10)  # no lockout: every increment counts
+    ok &= await check(manager, cache, attempts, max_attempts=5)  # lockout: the count stops at the limit
+    await manager.close()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--attempts", type=int, default=1000)
+    parser.add_argument("--url", default=None)
+    args = parser.parse_args()
+    url = args.url or f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    raise SystemExit(0 if asyncio.run(run(args.attempts, url)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+    Per-request overhead of the security middlewares on a trivial route,
+    pure ASGI (core.middlewares) vs the old BaseHTTPMiddleware implementation
+    run from app/ : python -m benchmarks.bench_middlewares [--requests 20000]
+"""
+import argparse, asyncio, time
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from core.config import APIConfiguration
+from core.middlewares import CustomHeadersMiddleware, DDoSMiddlewareAPP
+from core.ratelimit import InMemoryRateLimitBackend
+
+
+class LegacyDDoSMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app, backend):
+        super().__init__(app)
+        self.backend = backend
+
+    async def dispatch(self, request, call_next):
+        await self.backend.hit(request.client.host)
+        return await call_next(request)
+
+
+class LegacyHeadersMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app, config):
+        super().__init__(app)
+        self.config = config
+
+    async def dispatch(self, request, call_next):
+        response = await call_next(request)
+        response.headers["Strict-Transport-Security"] = f"max-age={self.config.HEADERS_HSTS_MAXAGE}; includeSubDomains; preload"
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-XSS-Protection"] = "1;mode=block;"
+        response.headers["X-Frame-Options"] = "ALLOW"
+        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+        response.headers["Permissions-Policy"] = "geolocation=(self)"
+        response.headers["Access-Control-Allow-Origin"] = "*"
+        response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, proxy-revalidate"
+        response.headers["Content-Security-Policy"] = self.config.HEADERS_CSP
+        return response
+
+
+async def ping(request):
+    return PlainTextResponse("pong")
+
+
+def build(ddos_cls, headers_cls, config) -> Starlette:
+    # huge limit so the limiter never rejects during the run
+    backend = InMemoryRateLimitBackend(max_requests=10**9, window_seconds=60)
+    return Starlette(
+        routes=[Route("/ping", ping)],
+        middleware=[Middleware(ddos_cls, backend=backend), Middleware(headers_cls, config=config)] if ddos_cls else []
+    )
+
+
+async def drive(app, requests: int) -> float:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/ping", "raw_path": b"/ping", "query_string": b"",
+        "root_path": "", "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 5000),
+        "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20_000)
+    args = parser.parse_args()
+
+    config = APIConfiguration()
+    apps = {
+        "no middleware": build(None, None, config),
+        "BaseHTTPMiddleware": build(LegacyDDoSMiddleware, LegacyHeadersMiddleware, config),
+        "pure ASGI": build(DDoSMiddlewareAPP, CustomHeadersMiddleware, config),
+    }
+    results = {name: asyncio.run(drive(app, args.requests)) for name, app in apps.items()}
+
+    base = results["no middleware"]
+    for name, us in results.items():
+        print(f"{name:<20}: {us:8.1f} us/request (+{us - base:.1f} us overhead)")
+
+
+if __name__ == "__main__":
+    main()
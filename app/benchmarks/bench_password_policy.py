@@ -0,0 +1,59 @@
+"""
+    Signup password/username validations per second, compiled policy vs the old regex loop
+    run from app/ : python -m benchmarks.bench_password_policy [--iterations 200000]
+"""
+import argparse, re, time
+
+from core.password_policy import password_policy, username_policy
+
+SIGNUP = {"username": "john_doe_99", "password": "Str0ngPassw0rd!"}
+
+
+def legacy_validate(username: str, password: str):
+    """What UserCreate.validate_username / validate_password used to do"""
+    for reserved in ("admin", "root", "system", "support"):
+        if username.lower() == reserved:
+            raise ValueError("restricted")
+
+    forbidden_patterns = [
+        r"[\'\";]", r"[<>]", r"\s", r"[\\\/]", r"[\{\}\[\]\(\)]",
+        r"(?i)(select|insert|delete|drop|alter|create|exec)",
+        r"(?i)(union|join|having|where)",
+        r"(?i)(script|alert|onerror|onload)",
+        r"\.\.\/",
+    ]
+    if len(password) < 8 or len(password) > 50:
+        raise ValueError("length")
+    for pattern in forbidden_patterns:
+        if re.search(pattern, password):
+            raise ValueError(pattern)
+    requirements = [r"[A-Z]", r"[a-z]", r"[0-9]", r"[!@#$%^&*]"]
+    if sum(bool(re.search(req, password)) for req in requirements) < 3:
+        raise ValueError("requirements")
+
+
+def policy_validate(username: str, password: str):
+    username_policy.validate(username)
+    password_policy.validate(password)
+
+
+def measure(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(SIGNUP["username"], SIGNUP["password"])
+    return iterations / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200_000)
+    args = parser.parse_args()
+
+    legacy = measure(legacy_validate, args.iterations)
+    compiled = measure(policy_validate, args.iterations)
+    print(f"legacy regex loop : {legacy:12,.0f} validations/sec")
+    print(f"compiled policy   : {compiled:12,.0f} validations/sec ({compiled / legacy:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+    Round trips (statements + commits sent to the database) and time per profile write:
+    old select -> setattr -> commit path vs ProfileRepository.create_or_update (one upsert),
+    metadata replace vs merge_metadata, and upsert_many for a batch. Round trips are what matter
+    on a real network, the timings are against a throwaway aiosqlite file
+    run from app/ : python -m benchmarks.bench_profile_upsert [--profiles 2000]
+"""
+import argparse, asyncio, os, tempfile, time, uuid
+
+from sqlalchemy import event, select
+
+from db.cache import RepositoryCache
+from db.repositories.profile_repository import ProfileRepository
+from db.session import DatabaseSessionManager
+from models.orm.users import User, UserProfile, UserRole
+
+
+class RoundTrips:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self.hit)
+        event.listen(engine, "commit", self.hit)
+
+    def hit(self, *args, **kwargs):
+        self.count += 1
+
+
+async def legacy_create_or_update(session, user_id, profile_data: dict):
+    # the previous implementation, minus the cache
+    result = await session.execute(select(UserProfile).where(UserProfile.user_id == user_id))
+    profile = result.scalars().first()
+    if profile:
+        for key, value in profile_data.items():
+            setattr(profile, key, value)
+    else:
+        session.add(UserProfile(user_id=user_id, **profile_data))
+    await session.commit()
+
+
+async def measure(manager, round_trips: RoundTrips, name: str, operation, calls: int):
+    before = round_trips.count
+    started = time.perf_counter()
+    for call in range(calls):
+        async with manager.session() as session:
+            await operation(session, call)
+    elapsed = (time.perf_counter() - started) / calls * 1e6
+    print(f"{name:<36}: {(round_trips.count - before) / calls:5.1f} round trips, {elapsed:8.1f} us per call")
+
+
+async def run(profiles: int):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    manager = DatabaseSessionManager()
+    manager.init(f"sqlite+aiosqlite:///{path}", replica_urls=[])
+    await manager.create_all()
+    cache = RepositoryCache(max_entries=0)
+
+    user_ids = [uuid.uuid4() for _ in range(profiles)]
+    async with manager.session() as session:
+        session.add_all(
+            User(user_id=user_id, email=f"user{i}@example.com", username=f"user_{i}", hashed_password="x", role=UserRole.USER)
+            for i, user_id in enumerate(user_ids)
+        )
+        await session.commit()
+
+    round_trips = RoundTrips(manager._engine.sync_engine)
+    calls = min(profiles, 500)
+    data = lambda call: {"first_name": f"first{call}", "last_name": "last", "metadata_": {"n": call}}
+
+    await measure(manager, round_trips, "select + setattr + commit (insert)", lambda session, call: legacy_create_or_update(session, user_ids[call], data(call)), calls)
+    await measure(manager, round_trips, "select + setattr + commit (update)", lambda session, call: legacy_create_or_update(session, user_ids[call], data(call + 1)), calls)
+    await measure(manager, round_trips, "create_or_update upsert", lambda session, call: ProfileRepository(session, cache).create_or_update(user_ids[call], data(call + 2)), calls)
+    await measure(manager, round_trips, "merge_metadata", lambda session, call: ProfileRepository(session, cache).merge_metadata(user_ids[call], {"seen": True}, remove=["n"]), calls)
+
+    async def batch(session, call):
+        await ProfileRepository(session, cache).upsert_many([
+            {"user_id": user_id, "first_name": "batch", "last_name": "last", "metadata_": {"batch": i}}
+            for i, user_id in enumerate(user_ids)
+        ])
+    await measure(manager, round_trips, f"upsert_many ({profiles} profiles)", batch, 1)
+
+    await manager.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--profiles", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(run(args.profiles))
+
+
+if __name__ == "__main__":
+    main()
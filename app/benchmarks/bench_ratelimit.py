@@ -0,0 +1,42 @@
+"""
+    Rate limiter throughput and memory with a wide botnet (1M distinct client ips)
+    run from app/ : python -m benchmarks.bench_ratelimit [--keys 1000000]
+"""
+import argparse, resource, time
+
+from core.ratelimit import InMemoryRateLimitBackend
+
+
+def rss_mb() -> float:
+    # ru_maxrss is in KiB on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=1_000_000)
+    parser.add_argument("--max-keys", type=int, default=250_000, help="LRU cap of the backend")
+    parser.add_argument("--rounds", type=int, default=2, help="hits per ip")
+    args = parser.parse_args()
+
+    ips = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(args.keys)]
+    backend = InMemoryRateLimitBackend(max_requests=60, window_seconds=60, max_keys=args.max_keys)
+    baseline = rss_mb()
+
+    now = 0.0
+    started = time.perf_counter()
+    for _ in range(args.rounds):
+        for ip in ips:
+            backend.hit_sync(ip, now)
+            now += 1e-6
+    elapsed = time.perf_counter() - started
+
+    total = args.keys * args.rounds
+    print(f"hits           : {total}")
+    print(f"requests/sec   : {total / elapsed:,.0f}")
+    print(f"tracked keys   : {len(backend)}")
+    print(f"rss (peak)     : {rss_mb():.1f} MiB (+{rss_mb() - baseline:.1f} MiB for limiter state)")
+
+
+if __name__ == "__main__":
+    main()
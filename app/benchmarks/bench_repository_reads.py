@@ -0,0 +1,86 @@
+"""
+    Memory held per 10k users and queries issued: full ORM entities (with / without eager loaded profile)
+    vs UserRepository.read projections (plain dicts, UserPublic columns only), against a throwaway aiosqlite file.
+    Memory is what tracemalloc still sees allocated while the result (and the session) is alive
+    run from app/ : python -m benchmarks.bench_repository_reads [--users 10000]
+"""
+import argparse, asyncio, gc, os, tempfile, time, tracemalloc, uuid
+
+from sqlalchemy import event, select
+
+from db.cache import RepositoryCache
+from db.repositories.user_repository import PROFILE_LOADERS, UserRepository
+from db.session import DatabaseSessionManager
+from models.orm.users import User, UserProfile, UserRole
+
+
+async def orm_users(session, user_ids, strategy=None):
+    stmt = select(User).where(User.user_id.in_(user_ids))
+    if strategy:
+        stmt = stmt.options(PROFILE_LOADERS[strategy](User.profile))
+    result = await session.execute(stmt)
+    return result.scalars().unique().all()
+
+
+async def measure(manager, name: str, read, user_ids: list):
+    queries = 0
+
+    def count(*args):
+        nonlocal queries
+        queries += 1
+
+    engine = manager._engine.sync_engine
+    event.listen(engine, "before_cursor_execute", count)
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    async with manager.session() as session:
+        rows = await read(session, user_ids)
+        elapsed = time.perf_counter() - started
+        held, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert len(rows) == len(user_ids)
+    event.remove(engine, "before_cursor_execute", count)
+    per_10k = held / len(user_ids) * 10_000 / 1024 / 1024
+    print(f"{name:<34}: {per_10k:7.2f} MB per 10k rows, {queries} queries, {elapsed * 1000:8.1f} ms")
+
+
+async def run(users: int):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    manager = DatabaseSessionManager()
+    manager.init(f"sqlite+aiosqlite:///{path}", replica_urls=[])
+    await manager.create_all()
+
+    user_ids = [uuid.uuid4() for _ in range(users)]
+    async with manager.session() as session:
+        session.add_all(
+            User(user_id=user_id, email=f"user{i}@example.com", username=f"user_{i}", hashed_password="x" * 120, role=UserRole.USER)
+            for i, user_id in enumerate(user_ids)
+        )
+        await session.flush()
+        session.add_all(
+            UserProfile(user_id=user_id, first_name=f"first{i}", last_name="last", metadata_={"i": i})
+            for i, user_id in enumerate(user_ids)
+        )
+        await session.commit()
+
+    cache = RepositoryCache(max_entries=0)
+    await measure(manager, "ORM User", lambda session, ids: orm_users(session, ids), user_ids)
+    await measure(manager, "ORM User + selectinload(profile)", lambda session, ids: orm_users(session, ids, "selectin"), user_ids)
+    await measure(manager, "ORM User + joinedload(profile)", lambda session, ids: orm_users(session, ids, "joined"), user_ids)
+    await measure(manager, "read UserPublic", lambda session, ids: UserRepository(session, cache).read(ids), user_ids)
+    await measure(manager, "read UserPublic + profile selectin", lambda session, ids: UserRepository(session, cache).read(ids, profile="selectin"), user_ids)
+    await measure(manager, "read UserPublic + profile joined", lambda session, ids: UserRepository(session, cache).read(ids, profile="joined"), user_ids)
+
+    await manager.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10_000)
+    args = parser.parse_args()
+    asyncio.run(run(args.users))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+    Per-query Python overhead of the repository lookups: the select() built on every call
+    (old code) vs the module level statements (USER_BY_ID / USER_BY_EMAIL / PROFILE_BY_USER_ID).
+    Runs against a throwaway aiosqlite file so the numbers are mostly SQLAlchemy, not the network
+    run from app/ : python -m benchmarks.bench_repository_statements [--iterations 5000]
+"""
+import argparse, asyncio, os, tempfile, time, uuid
+
+from sqlalchemy import select
+
+from db.repositories.profile_repository import PROFILE_BY_USER_ID
+from db.repositories.user_repository import USER_BY_EMAIL, USER_BY_ID
+from db.session import DatabaseSessionManager
+from models.orm.users import User, UserProfile, UserRole
+
+
+async def measure(session, build, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        statement, params = build()
+        result = await session.execute(statement, params)
+        result.scalars().first()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+async def run(iterations: int):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    manager = DatabaseSessionManager()
+    manager.init(f"sqlite+aiosqlite:///{path}", replica_urls=[])
+    await manager.create_all()
+
+    user_id, email = uuid.uuid4(), "bench@example.com"
+    async with manager.session() as session:
+        session.add(User(user_id=user_id, email=email, username="bench_user", hashed_password="x", role=UserRole.USER))
+        await session.flush()
+        session.add(UserProfile(user_id=user_id, first_name="first", last_name="last"))
+        await session.commit()
+
+    cases = {
+        "user by id": (
+            lambda: (select(User).where(User.user_id == user_id), None),
+            lambda: (USER_BY_ID, {"user_id": user_id}),
+        ),
+        "user by email": (
+            lambda: (select(User).where(User.email == email), None),
+            lambda: (USER_BY_EMAIL, {"email": email}),
+        ),
+        "profile by user": (
+            lambda: (select(UserProfile).where(UserProfile.user_id == user_id), None),
+            lambda: (PROFILE_BY_USER_ID, {"user_id": user_id}),
+        ),
+    }
+    async with manager.session() as session:
+        for name, (per_call, prebuilt) in cases.items():
+            # warm the compiled cache for both shapes first
+            await measure(session, per_call, 50), await measure(session, prebuilt, 50)
+            old = await measure(session, per_call, iterations)
+            new = await measure(session, prebuilt, iterations)
+            print(f"{name:<16}: built per call {old:8.1f} us, prebuilt {new:8.1f} us ({old / new:.2f}x)")
+
+    await manager.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(run(args.iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+    UserPublic response cost, old create_user path (model_validate + FastAPI's response_model
+    validation + jsonable_encoder + json.dumps), one validate_python(from_attributes) + dump_json,
+    and SchemaJSONResponse (trusted rows copied out, no validation), for 1 and 1000 rows
+    run from app/ : python -m benchmarks.bench_responses [--iterations 2000]
+"""
+import argparse, json, time, uuid
+
+from datetime import datetime
+from types import SimpleNamespace
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from core.responses import SchemaJSONResponse
+from models.orm.users import UserRole
+from models.schemas.user import UserPublic
+
+
+def orm_row(i: int):
+    # quacks like a loaded User row
+    return SimpleNamespace(
+        user_id=uuid.uuid4(), email=f"user{i}@example.com", username=f"user_{i}",
+        role=UserRole.USER, is_active=True, created_at=datetime.now(), hashed_password="x" * 100
+    )
+
+
+def legacy(content):
+    adapter = TypeAdapter(list[UserPublic]) if isinstance(content, list) else TypeAdapter(UserPublic)
+    if isinstance(content, list):
+        validated = [UserPublic.model_validate(row) for row in content]
+    else:
+        validated = UserPublic.model_validate(content)
+    # FastAPI validates the returned value against response_model again before encoding
+    revalidated = adapter.validate_python(validated, from_attributes=True)
+    return json.dumps(jsonable_encoder(revalidated)).encode()
+
+
+ONE, MANY = TypeAdapter(UserPublic), TypeAdapter(list[UserPublic])
+
+def validated(content):
+    adapter = MANY if isinstance(content, list) else ONE
+    return adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+
+
+def fast(content):
+    return SchemaJSONResponse(content, UserPublic).body
+
+
+def measure(fn, content, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(content)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    payloads = {"single object": orm_row(0), "1000-row list": [orm_row(i) for i in range(1000)]}
+    for name, content in payloads.items():
+        iterations = args.iterations if name == "single object" else max(1, args.iterations // 100)
+        assert json.loads(fast(content)) == json.loads(legacy(content))
+        old, checked, new = (measure(fn, content, iterations) for fn in (legacy, validated, fast))
+        print(f"{name:<14}: legacy {old:10.1f} us, validate + dump {checked:10.1f} us, "
+              f"SchemaJSONResponse {new:10.1f} us ({old / new:.1f}x, {checked / new:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
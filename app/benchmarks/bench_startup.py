@@ -0,0 +1,117 @@
+"""
+    Cold start cost: `python -X importtime` for importing main + create_app(), and wall time from
+    process start to the first response (one in-process ASGI request, no server, no lifespan so no db).
+    Both are also measured for the bare framework imports (fastapi, pydantic, sqlalchemy, jose) and
+    the budgets apply to what the app adds on top of that floor: the floor alone is 0.5s on a fast
+    laptop and well over a second on a small CI runner, only the part above it is ours to keep small.
+    Exits 1 when either median is over its budget, or the first response is not a 200, so it can gate CI
+    run from app/ : python -m benchmarks.bench_startup [--runs 5] [--max-import-ms 400] [--max-first-response-ms 600]
+"""
+import argparse, os, statistics, subprocess, sys, time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BUILD_APP = "import main; main.create_app()"
+# what any app on this stack pays before its own first line runs
+FRAMEWORK = "import fastapi, fastapi.security, pydantic, sqlalchemy.ext.asyncio, sqlalchemy.orm, jose.jwt"
+
+FIRST_RESPONSE = """
+import asyncio, main
+
+async def first_response(path):
+    app = main.create_app()
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"localhost")], "client": ("127.0.0.1", 1), "server": ("localhost", 80)
+    }
+    await app(scope, receive, send)
+    return sent[0]["status"]
+
+print(asyncio.run(first_response(%r)))
+"""
+
+
+def import_times(runs: int, code: str = BUILD_APP) -> tuple[float, list[tuple[float, str]]]:
+    """Median total import time (ms) and the slowest top level imports of the last run"""
+    totals, top_level = [], []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=APP_DIR, capture_output=True, text=True, check=True
+        )
+        total, top_level = 0, []
+        for line in result.stderr.splitlines():
+            # "import time:       self [us] |  cumulative | imported package"
+            if not line.startswith("import time:") or "[us]" in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            total += int(self_us)
+            if not name.startswith("  "):  # one space = imported directly by the -c code
+                top_level.append((int(cumulative_us) / 1000, name.strip()))
+        totals.append(total / 1000)
+    return statistics.median(totals), sorted(top_level, reverse=True)
+
+
+def interpreter_start(runs: int, code: str = "pass") -> float:
+    """Wall time of `python -c <code>`, bare interpreter by default"""
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=APP_DIR, check=True)
+        durations.append((time.perf_counter() - started) * 1000)
+    return statistics.median(durations)
+
+
+def first_response_times(runs: int, path: str) -> tuple[float, str]:
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-c", FIRST_RESPONSE % path],
+            cwd=APP_DIR, capture_output=True, text=True, check=True
+        )
+        durations.append((time.perf_counter() - started) * 1000)
+        status = result.stdout.strip()
+    return statistics.median(durations), status
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/openapi.json")
+    parser.add_argument("--max-import-ms", type=float, default=400, help="over the framework imports")
+    parser.add_argument("--max-first-response-ms", type=float, default=600, help="over the framework start")
+    args = parser.parse_args()
+
+    baseline = interpreter_start(args.runs)
+    framework_ms = interpreter_start(args.runs, FRAMEWORK)
+    framework_import_ms, _ = import_times(args.runs, FRAMEWORK)
+    import_ms, top_level = import_times(args.runs)
+    first_response_ms, status = first_response_times(args.runs, args.path)
+    app_import_ms, app_first_response_ms = import_ms - framework_import_ms, first_response_ms - framework_ms
+
+    print("slowest imports (cumulative):")
+    for cumulative_ms, name in top_level[:10]:
+        print(f"  {cumulative_ms:8.1f} ms  {name}")
+    print(f"bare interpreter : {baseline:8.1f} ms")
+    print(f"framework        : {framework_ms:8.1f} ms start, {framework_import_ms:8.1f} ms imports")
+    print(f"imports          : {import_ms:8.1f} ms, app adds {app_import_ms:8.1f} ms (budget {args.max_import_ms} ms)")
+    print(f"first response   : {first_response_ms:8.1f} ms, app adds {app_first_response_ms:8.1f} ms "
+          f"(budget {args.max_first_response_ms} ms), {args.path} -> {status}")
+
+    over = app_import_ms > args.max_import_ms or app_first_response_ms > args.max_first_response_ms
+    print("OVER BUDGET" if over else "FAILED" if status != "200" else "OK")
+    raise SystemExit(1 if over or status != "200" else 0)
+
+
+if __name__ == "__main__":
+    main()
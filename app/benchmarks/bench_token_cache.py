@@ -0,0 +1,43 @@
+"""
+    verify_access_token cost per request at several cache hit ratios
+    run from app/ : python -m benchmarks.bench_token_cache [--requests 20000]
+"""
+import argparse, os, random, time
+
+from datetime import timedelta
+
+os.environ.setdefault("API_SECRET_KEY", "bench-secret")
+os.environ.setdefault("API_REFRESH_SECRETKEY", "bench-refresh-secret")
+
+from core import security
+
+
+def run(hit_ratio: float, requests: int) -> float:
+    make = lambda: security._generate_token(
+        payload={"type": "access"}, secret_key=security.api_config.API_SECRET_KEY,
+        algorithm=security.api_config.API_ALGORITHM, expires_delta=timedelta(minutes=15), subject="bench"
+    )
+    warm = [make() for _ in range(100)]
+    calls = [random.choice(warm) if random.random() < hit_ratio else make() for _ in range(requests)]
+
+    security.access_token_cache.clear()
+    for token in warm:
+        security.verify_access_token(token)
+
+    started = time.perf_counter()
+    for token in calls:
+        security.verify_access_token(token, is_revoked=lambda claims: False)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20_000)
+    args = parser.parse_args()
+
+    for hit_ratio in (0.0, 0.5, 0.9, 0.99):
+        print(f"hit ratio {hit_ratio:4.0%}: {run(hit_ratio, args.requests):7.1f} us/verification")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+    Write-behind coalescing: N point/login events spread over a few users, one UPDATE + commit per event
+    vs UserCounterBuffer (statements per flush should be ~1 whatever N is). Also checks the totals
+    that reached the table, exits 1 when they are wrong. Throwaway aiosqlite file by default, --url for postgres
+    run from app/ : python -m benchmarks.bench_write_behind [--events 20000] [--users 500]
+"""
+import argparse, asyncio, os, random, tempfile, time, uuid
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, select, update
+
+from db.cache import RepositoryCache
+from db.session import DatabaseSessionManager
+from db.write_behind import UserCounterBuffer
+from models.orm.users import User, UserRole
+
+
+class Statements:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self.hit)
+
+    def hit(self, *args):
+        self.count += 1
+
+
+async def run(events: int, users: int, url: str) -> bool:
+    manager = DatabaseSessionManager()
+    manager.init(url, replica_urls=[])
+    await manager.create_all()
+
+    user_ids = [uuid.uuid4() for _ in range(users)]
+    async with manager.session() as session:
+        session.add_all(
+            User(user_id=user_id, email=f"{user_id.hex}@example.com", username=user_id.hex[:20], hashed_password="x", role=UserRole.USER, point=0)
+            for user_id in user_ids
+        )
+        await session.commit()
+
+    rng = random.Random(7)
+    base = datetime.now()
+    stream = [(rng.choice(user_ids), rng.randint(1, 5), base + timedelta(seconds=rng.randint(0, 3600))) for _ in range(events)]
+    statements = Statements(manager._engine.sync_engine)
+
+    # one UPDATE + commit per event, a slice is enough to get the rate
+    direct = stream[:min(events, 2000)]
+    before, started = statements.count, time.perf_counter()
+    for user_id, delta, _ in direct:
+        async with manager.session() as session:
+            await session.execute(update(User).where(User.user_id == user_id).values(point=User.point + delta))
+            await session.commit()
+    direct_rate = len(direct) / (time.perf_counter() - started)
+    print(f"UPDATE per event : {(statements.count - before) / len(direct):6.2f} statements/event, {direct_rate:9.0f} events/s")
+
+    async with manager.session() as session:
+        await session.execute(update(User).values(point=0, last_login=None))
+        await session.commit()
+
+    buffer = UserCounterBuffer(manager.session, flush_interval=3600, max_pending=users + 1, cache=RepositoryCache(max_entries=0))
+    flushes, before, started = 0, statements.count, time.perf_counter()
+    for index, (user_id, delta, at) in enumerate(stream, 1):
+        buffer.add_points(user_id, delta)
+        buffer.touch_login(user_id, at)
+        if index % (events // 10 or 1) == 0:
+            await buffer.flush()
+            flushes += 1
+    if len(buffer):
+        await buffer.flush()
+        flushes += 1
+    buffered_rate = events / (time.perf_counter() - started)
+    print(f"write-behind     : {(statements.count - before) / flushes:6.2f} statements/flush over {flushes} flushes, {buffered_rate:9.0f} events/s")
+
+    expected_points, expected_login = {}, {}
+    for user_id, delta, at in stream:
+        expected_points[user_id] = expected_points.get(user_id, 0) + delta
+        expected_login[user_id] = max(expected_login.get(user_id, at), at)
+    async with manager.session() as session:
+        rows = (await session.execute(select(User.user_id, User.point, User.last_login))).all()
+    wrong = [row for row in rows if row.point != expected_points.get(row.user_id, 0) or row.last_login != expected_login.get(row.user_id)]
+    print(f"totals           : {'OK' if not wrong else f'{len(wrong)} users WRONG'}")
+
+    await manager.close()
+    return not wrong
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--url", default=None)
+    args = parser.parse_args()
+    url = args.url or f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    raise SystemExit(0 if asyncio.run(run(args.events, args.users, url)) else 1)
+
+
+if __name__ == "__main__":
+    main()
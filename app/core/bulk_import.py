@@ -0,0 +1,173 @@
+import asyncio, csv, json, uuid
+
+from datetime import datetime
+from typing import AsyncIterator, Optional, Union
+
+from pydantic import ValidationError
+
+from core.exceptions import AppExceptionHandler
+from core.hashing import PasswordHashingService
+from db.repositories.user_repository import UserRepository
+from models.orm.users import UserRole
+from models.schemas.user import UserCreate
+
+# rows per multi-row INSERT, also the number of passwords hashed per round
+BULK_BATCH_SIZE = 1000
+# API_BULK_MAX_LINE_BYTES
+MAX_LINE_BYTES = 16384
+
+
+class _TooLong:
+    def __repr__(self):
+        return "TOO_LONG"
+
+# a line over the limit, stands in for the line (iter_lines) and for the record (iter_records)
+TOO_LONG = _TooLong()
+
+
+def _decode(line: bytes) -> Optional[str]:
+    try:
+        return line.rstrip(b"\r").decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int = MAX_LINE_BYTES) -> AsyncIterator[Union[str, None, _TooLong]]:
+    """
+        Split a byte stream into text lines without holding more than one chunk + `max_line_bytes`.
+        A longer line is dropped up to its newline and comes out as TOO_LONG, one that isn't utf-8 as None
+    """
+    pending, skipping = b"", False
+    async for chunk in chunks:
+        *lines, pending = (pending + chunk).split(b"\n")
+        for line in lines:
+            if skipping or len(line) > max_line_bytes:
+                skipping = False
+                yield TOO_LONG
+            else:
+                yield _decode(line)
+        if len(pending) > max_line_bytes:
+            pending, skipping = b"", True
+    if skipping:
+        yield TOO_LONG
+    elif pending:
+        yield _decode(pending)
+
+
+async def iter_records(chunks: AsyncIterator[bytes], content_type: str,
+                       max_line_bytes: int = MAX_LINE_BYTES) -> AsyncIterator[Union[dict, None, _TooLong]]:
+    """
+        NDJSON by default, CSV (first line = header) for text/csv. Unparseable lines come out as None,
+        lines over `max_line_bytes` as TOO_LONG (a header over it ends the CSV, its columns are unknown)
+    """
+    lines = iter_lines(chunks, max_line_bytes)
+
+    if content_type.startswith("text/csv"):
+        header = None
+        async for line in lines:
+            if line is TOO_LONG or line is None:
+                yield line
+                if header is None:
+                    return
+                continue
+            if not line.strip():
+                continue
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            yield dict(zip(header, values)) if len(values) == len(header) else None
+        return
+
+    async for line in lines:
+        if line is TOO_LONG or line is None:
+            yield line
+            continue
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield record if isinstance(record, dict) else None
+
+
+class BulkUserImporter:
+    """
+        Validate -> hash (in parallel on the hashing pool) -> multi-row insert, one batch at a time.
+        Yields one report entry per input row as soon as its batch is done, so memory only
+        depends on the batch size and never on the size of the upload
+    """
+    def __init__(self, session_factory, hasher: PasswordHashingService, batch_size: int = BULK_BATCH_SIZE,
+                 max_line_bytes: int = MAX_LINE_BYTES):
+        self.session_factory = session_factory
+        self.hasher = hasher
+        self.batch_size = batch_size
+        self.max_line_bytes = max_line_bytes
+        # don't queue more hashes than the pool accepts, the rest of the batch waits here
+        self._hash_slots = asyncio.Semaphore(hasher.max_workers)
+
+    async def _hash(self, password: str) -> str:
+        async with self._hash_slots:
+            return await self.hasher.hash(password)
+
+    async def _flush(self, batch: list[tuple[int, UserCreate]]) -> list[dict]:
+        hashes = await asyncio.gather(*(self._hash(user.password) for _, user in batch), return_exceptions=True)
+
+        now = datetime.now()
+        report, users, profiles = [], [], []
+        for (row, user), hashed in zip(batch, hashes):
+            if isinstance(hashed, (AppExceptionHandler, ValueError)):
+                report.append({"row": row, "status": "error", "errors": [str(hashed)]})
+                continue
+            if isinstance(hashed, BaseException):
+                raise hashed
+
+            user_id = uuid.uuid4()
+            users.append({
+                "user_id": user_id, "email": user.email, "username": user.username,
+                "hashed_password": hashed, "role": UserRole.USER, "is_active": True,
+                "is_verified": False, "point": 0, "failed_attempts": 0,
+                "created_at": now, "modified_at": now
+            })
+            profiles.append({"user_id": user_id, "first_name": "", "last_name": ""})
+            report.append({"row": row, "user_id": user_id})
+
+        async with self.session_factory() as session:
+            inserted = await UserRepository(session).create_many(users, profiles)
+
+        for entry in report:
+            if "user_id" not in entry:
+                continue
+            if entry["user_id"] in inserted:
+                entry.update(status="created", user_id=str(entry["user_id"]))
+            else:
+                entry.update(status="duplicate", errors=["username or email already exists"])
+                del entry["user_id"]
+        return report
+
+    async def run(self, records: AsyncIterator[Union[dict, None, _TooLong]]) -> AsyncIterator[dict]:
+        batch: list[tuple[int, UserCreate]] = []
+        row = 0
+        async for record in records:
+            row += 1
+            if record is TOO_LONG:
+                yield {"row": row, "status": "invalid", "code": 413, "errors": [f"row longer than {self.max_line_bytes} bytes"]}
+                continue
+            if record is None:
+                yield {"row": row, "status": "invalid", "errors": ["malformed row"]}
+                continue
+            try:
+                batch.append((row, UserCreate.model_validate(record)))
+            except ValidationError as e:
+                yield {"row": row, "status": "invalid", "errors": [error["msg"] for error in e.errors()]}
+                continue
+
+            if len(batch) >= self.batch_size:
+                for entry in await self._flush(batch):
+                    yield entry
+                batch = []
+
+        if batch:
+            for entry in await self._flush(batch):
+                yield entry
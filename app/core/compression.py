@@ -0,0 +1,229 @@
+import re, zlib
+
+from typing import Callable, Iterable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.config import APPConfig, get_app_config
+
+try:
+    import brotli
+except ImportError:  # optional, pip install brotli
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional, pip install zstandard
+    zstandard = None
+
+
+# already compressed (images, archives, fonts...) or too small to win anything are left alone
+COMPRESSIBLE_TYPES = re.compile(
+    r"^(text/|application/(json|[\w.+-]+\+json|x-ndjson|javascript|xml|[\w.+-]+\+xml)|image/svg\+xml)"
+)
+# a few static, rarely changing documents, their compressed bytes are kept per codec
+STATIC_PATHS = frozenset(("/openapi.json",))
+
+
+class _Stream:
+    """Incremental compressor, flush() ends a block (the bytes so far are decodable), flush(final=True) ends the stream"""
+    def compress(self, data: bytes) -> bytes: ...
+    def flush(self, final: bool = False) -> bytes: ...
+
+
+class Codec:
+    """One content-coding at a fixed level"""
+    def __init__(self, name: str, level: int, compressor: Callable[[int], _Stream]):
+        self.name = name
+        self.level = level
+        self._compressor = compressor
+
+    def compressor(self) -> _Stream:
+        return self._compressor(self.level)
+
+    def compress(self, body: bytes) -> bytes:
+        stream = self.compressor()
+        return stream.compress(body) + stream.flush(final=True)
+
+
+class _ZlibStream(_Stream):
+    def __init__(self, level: int):
+        self._stream = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 = gzip container
+
+    def compress(self, data: bytes) -> bytes:
+        return self._stream.compress(data)
+
+    def flush(self, final: bool = False) -> bytes:
+        return self._stream.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _BrotliStream(_Stream):
+    def __init__(self, level: int):
+        self._stream = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._stream.process(data)
+
+    def flush(self, final: bool = False) -> bytes:
+        return self._stream.finish() if final else self._stream.flush()
+
+
+class _ZstdStream(_Stream):
+    def __init__(self, level: int):
+        self._stream = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._stream.compress(data)
+
+    def flush(self, final: bool = False) -> bytes:
+        return self._stream.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH if final else zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+
+def available_codecs(config: Optional[APPConfig] = None) -> list[Codec]:
+    """Codecs this process can serve, in server preference order (used to break q-value ties)"""
+    config = config or get_app_config()
+    codecs = []
+    if zstandard is not None:
+        codecs.append(Codec("zstd", config.APP_COMPRESSION_ZSTD_LEVEL, _ZstdStream))
+    if brotli is not None:
+        codecs.append(Codec("br", config.APP_COMPRESSION_BROTLI_LEVEL, _BrotliStream))
+    codecs.append(Codec("gzip", config.APP_COMPRESSION_GZIP_LEVEL, _ZlibStream))
+    return codecs
+
+
+def parse_accept_encoding(header: str) -> dict[str, float]:
+    """`gzip;q=0.8, br, *;q=0` -> {"gzip": 0.8, "br": 1.0, "*": 0.0}, malformed q-values count as 0"""
+    weights = {}
+    for item in header.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+    return weights
+
+
+def negotiate(header: Optional[str], codecs: Iterable[Codec]) -> Optional[Codec]:
+    """Highest q wins, ties go to the earlier codec in `codecs`, None = send identity"""
+    if not header:
+        return None
+    weights = parse_accept_encoding(header)
+    wildcard = weights.get("*", 0.0)
+    best, best_q = None, 0.0
+    for codec in codecs:
+        q = weights.get(codec.name, wildcard)
+        if q > best_q:
+            best, best_q = codec, q
+    return best
+
+
+class CompressionMiddleware:
+    """
+        Replaces GZipMiddleware. Decides per response: only compressible content types, only bodies of
+        at least `minimum_size` (known up front for single-message responses), never over an existing
+        Content-Encoding, codec picked from Accept-Encoding q-values (zstd / br when installed, gzip always).
+        Streaming responses are compressed chunk by chunk with a sync flush, the client gets every chunk
+        as soon as the app sends it. Bodies of STATIC_PATHS are compressed once per codec and reused
+    """
+    def __init__(self, app: ASGIApp, minimum_size: Optional[int] = None, codecs: Optional[list[Codec]] = None,
+                 static_paths: Iterable[str] = STATIC_PATHS, config: Optional[APPConfig] = None):
+        config = config or get_app_config()
+        self.app = app
+        self.minimum_size = config.APP_COMPRESSION_MIN_SIZE if minimum_size is None else minimum_size
+        self.codecs = codecs if codecs is not None else available_codecs(config)
+        self.static_paths = frozenset(static_paths)
+        self._static: dict[tuple[str, str], tuple[bytes, bytes]] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            return await self.app(scope, receive, send)
+
+        codec = negotiate(Headers(scope=scope).get("accept-encoding"), self.codecs)
+        if codec is None:
+            return await self.app(scope, receive, send)
+
+        responder = _CompressionResponder(self, codec, scope["path"], send)
+        await self.app(scope, receive, responder)
+
+    def compress_static(self, path: str, codec: Codec, body: bytes) -> bytes:
+        key = (path, codec.name)
+        cached = self._static.get(key)
+        if cached is not None and cached[0] == body:
+            return cached[1]
+        compressed = codec.compress(body)
+        self._static[key] = (body, compressed)
+        return compressed
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, codec: Codec, path: str, send: Send):
+        self.middleware = middleware
+        self.codec = codec
+        self.path = path
+        self.send = send
+        self.start: Optional[Message] = None
+        self.stream: Optional[_Stream] = None
+        self.passthrough = False
+
+    async def __call__(self, message: Message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            headers = Headers(raw=message.get("headers", ()))
+            self.passthrough = (
+                message["status"] in (204, 304) or message["status"] < 200
+                or "content-encoding" in headers
+                or not COMPRESSIBLE_TYPES.match(headers.get("content-type", ""))
+            )
+            return
+
+        if message["type"] != "http.response.body":
+            return await self.send(message)
+
+        if self.passthrough:
+            if self.start is not None:
+                start, self.start = self.start, None
+                await self.send(start)
+            return await self.send(message)
+
+        body, more_body = message.get("body", b""), message.get("more_body", False)
+        if self.start is not None:
+            start, self.start = self.start, None
+            if not more_body:
+                # whole body in one message: size is known, compress in one go (or from the static cache)
+                if len(body) < self.middleware.minimum_size:
+                    self.passthrough = True
+                    await self.send(start)
+                    return await self.send(message)
+                if self.path in self.middleware.static_paths:
+                    compressed = self.middleware.compress_static(self.path, self.codec, body)
+                else:
+                    compressed = self.codec.compress(body)
+                await self.send(self._encoded(start, len(compressed)))
+                return await self.send({"type": "http.response.body", "body": compressed})
+            self.stream = self.codec.compressor()
+            await self.send(self._encoded(start, None))
+
+        chunk = self.stream.compress(body) + self.stream.flush(final=not more_body)
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    def _encoded(self, start: Message, length: Optional[int]) -> Message:
+        start.setdefault("headers", [])
+        headers = MutableHeaders(scope=start)
+        headers["Content-Encoding"] = self.codec.name
+        headers.add_vary_header("Accept-Encoding")
+        if length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(length)
+        # ETag is left as is: core.conditional tags name the row version, not the bytes, and If-Match
+        # (strong comparison) has to keep accepting the tag a client got from a compressed GET
+        return start
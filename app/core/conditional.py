@@ -0,0 +1,74 @@
+import hashlib
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+# Validators for conditional requests (ETag / If-None-Match / If-Match).
+# Rows with a version column get `"<version>.<schema>"`: the version (updated_at in microseconds) is
+# readable back, so an If-Match can become a compare-and-swap in the UPDATE and an If-None-Match can
+# be answered from a version-only query. The schema part keeps two representations of one row apart.
+# Rows without a version use a hash of the serialized body.
+
+# Cache-Control for every response carrying one of these ETags: the representation is per user, only
+# the client may keep it, and it has to revalidate (If-None-Match -> 304) before reusing it
+REVALIDATE = "private, no-cache"
+
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_EPOCH_NAIVE = datetime(1970, 1, 1)
+_schema_tags: dict[Any, str] = {}
+
+
+def _schema_tag(schema: Any) -> str:
+    tag = _schema_tags.get(schema)
+    if tag is None:
+        shape = f"{schema.__name__}:{','.join(sorted(schema.model_fields))}"
+        tag = _schema_tags[schema] = hashlib.blake2b(shape.encode(), digest_size=4).hexdigest()
+    return tag
+
+
+def version_etag(version: datetime, schema: Any) -> str:
+    # exact integer microseconds, a float timestamp would not survive the round trip
+    if version.tzinfo is not None:
+        prefix, micros = "z", (version - _EPOCH_UTC) // timedelta(microseconds=1)
+    else:
+        prefix, micros = "n", (version - _EPOCH_NAIVE) // timedelta(microseconds=1)
+    return f'"{prefix}{micros:x}.{_schema_tag(schema)}"'
+
+
+def etag_version(etag: str, schema: Any) -> Optional[datetime]:
+    """The version a version_etag() of `schema` was made from, None for anything else"""
+    value = etag.strip()
+    if value.startswith("W/") or len(value) < 4 or value[0] != '"' or value[-1] != '"':
+        return None
+    version, _, tag = value[1:-1].partition(".")
+    if tag != _schema_tag(schema) or version[:1] not in ("z", "n"):
+        return None
+    try:
+        micros = timedelta(microseconds=int(version[1:], 16))
+    except ValueError:
+        return None
+    return (_EPOCH_UTC if version[0] == "z" else _EPOCH_NAIVE) + micros
+
+
+def content_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def _tags(header: str) -> list[str]:
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def none_match(header: Optional[str], etag: str) -> bool:
+    """True when If-None-Match matches (answer 304), weak comparison as RFC 9110 asks for"""
+    if not header:
+        return False
+    tags = _tags(header)
+    return "*" in tags or etag.removeprefix("W/") in (tag.removeprefix("W/") for tag in tags)
+
+
+def match_versions(header: str, schema: Any) -> Optional[list[datetime]]:
+    """The versions an If-Match accepts, None for `*` (any existing row)"""
+    tags = _tags(header)
+    if "*" in tags:
+        return None
+    return [version for version in (etag_version(tag, schema) for tag in tags) if version is not None]
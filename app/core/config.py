@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
 from typing import Literal, Optional
+from functools import lru_cache
 from dotenv import load_dotenv
 import os
 
@@ -7,6 +8,14 @@ import os
 load_dotenv()
 
 
+@lru_cache
+def _read_description(path: str = "description.txt") -> str:
+    if not os.path.exists(path):
+        return ""
+    with open(path) as description:
+        return description.read()
+
+
 class APPConfig(BaseModel):
     APP_ENVIRONMENT: Literal['dev', 'staging', 'prod'] = Field(default_factory=lambda: os.getenv("APPLICATION_ENVIRONMENT", "dev"))
     APP_HOST: str = Field(default_factory=lambda: os.getenv("APPLICATION_HOST", "localhost"))
@@ -15,15 +24,33 @@ class APPConfig(BaseModel):
     APP_SSLCERT: Optional[str] = Field(default_factory=lambda: os.getenv("APPLICATION_SSLCERT_PATH"))
     APP_SSLPEM: Optional[str] = Field(default_factory=lambda: os.getenv("APPLICATION_SSLPEM"))
 
+    # Production server (serve.py)
+    APP_WORKERS: int = Field(default_factory=lambda: int(os.getenv("APPLICATION_WORKERS", 0)))  # 0 = cpu count
+    APP_MAX_REQUESTS: int = Field(default_factory=lambda: int(os.getenv("APPLICATION_MAX_REQUESTS", 0)))  # recycle a worker after N requests, 0 = never
+    APP_GRACEFUL_TIMEOUT: int = Field(default_factory=lambda: int(os.getenv("APPLICATION_GRACEFUL_TIMEOUT", 30)))  # seconds to drain connections
+    APP_SHARED_STATE: bool = Field(default_factory=lambda: os.getenv("APPLICATION_SHARED_STATE", "true").lower() == "true")  # rate limits / revocations in shared memory
+
+    # Response compression (core/compression.py), brotli / zstd are used when installed
+    APP_COMPRESSION_MIN_SIZE: int = Field(default_factory=lambda: int(os.getenv("APPLICATION_COMPRESSION_MIN_SIZE", 1024)))  # bytes, smaller bodies go out as is
+    APP_COMPRESSION_GZIP_LEVEL: int = Field(default_factory=lambda: int(os.getenv("APPLICATION_COMPRESSION_GZIP_LEVEL", 6)))  # 1-9
+    APP_COMPRESSION_BROTLI_LEVEL: int = Field(default_factory=lambda: int(os.getenv("APPLICATION_COMPRESSION_BROTLI_LEVEL", 4)))  # 0-11, >5 is too slow per request
+    APP_COMPRESSION_ZSTD_LEVEL: int = Field(default_factory=lambda: int(os.getenv("APPLICATION_COMPRESSION_ZSTD_LEVEL", 3)))  # 1-22
+
     # Metadata
     APP_APINAME: Optional[str] = Field(default_factory=lambda: os.getenv("WEBAPI_NAME", "FastAPI Application"))
     APP_API_DEFAULT_PATH: Optional[str] = Field(default_factory=lambda: os.getenv("API_DEFAULT_PATH", "/api"))
     
     # Load API description from file if exists
-    APP_API_DESC: str = Field(default_factory=lambda: open("description.txt").read() if os.path.exists("description.txt") else "")
+    APP_API_DESC: str = Field(default_factory=_read_description)
     API_VERSION: Optional[str] = Field(default_factory=lambda: os.getenv("API_VERSION", "1.0.0"))
     API_DOCS_ENABLE: bool = Field(default_factory=lambda: os.getenv("API_DOCS_ENABLE", "true").lower() == "true")
 
+    # Signup policy (see core/password_policy.py)
+    API_PASSWORD_MIN_LENGTH: int = Field(default_factory=lambda: int(os.getenv("API_PASSWORD_MIN_LENGTH", 8)))
+    API_PASSWORD_MAX_LENGTH: int = Field(default_factory=lambda: int(os.getenv("API_PASSWORD_MAX_LENGTH", 50)))
+    API_PASSWORD_MIN_REQUIRED: int = Field(default_factory=lambda: int(os.getenv("API_PASSWORD_MIN_REQUIRED", 3)))  # of upper/lower/digit/special
+    API_RESTRICTED_USERNAMES: list[str] = Field(default_factory=lambda: os.getenv("API_RESTRICTED_USERNAMES", "admin,root,system,support").split(","))
+
     # Monitoring
     API_PROMETHEUS: bool = Field(default_factory=lambda: os.getenv("API_PROMETHEUS", "false").lower() == "true")
 
@@ -39,11 +66,43 @@ class APIConfiguration(BaseModel):
     API_CSRF_EXPIRES_DAYS: int = Field(default_factory=lambda: int(os.getenv("API_CSRF_EXPIRES_DAYS", 2)))
     API_SESSION_ID_EXPIRES: int = Field(default_factory=lambda: int(os.getenv("API_SESSION_ID_EXPIRES", 1)))  # 1 day
 
+    # Login lockout, enforced by the UPDATE in UserRepository.begin_login
+    API_LOGIN_MAX_ATTEMPTS: int = Field(default_factory=lambda: int(os.getenv("API_LOGIN_MAX_ATTEMPTS", 5)))
+    API_LOGIN_LOCKOUT_MINUTES: int = Field(default_factory=lambda: int(os.getenv("API_LOGIN_LOCKOUT_MINUTES", 15)))
+
+    # Per client ip rate limit, DDoSMiddlewareAPP (core/middlewares.py)
+    API_RATELIMIT_ENABLE: bool = Field(default_factory=lambda: os.getenv("API_RATELIMIT_ENABLE", "true").lower() == "true")
+    API_RATELIMIT_MAX_REQUESTS: int = Field(default_factory=lambda: int(os.getenv("API_RATELIMIT_MAX_REQUESTS", 60)))  # per window
+    API_RATELIMIT_WINDOW_SECONDS: int = Field(default_factory=lambda: int(os.getenv("API_RATELIMIT_WINDOW_SECONDS", 60)))
+    API_RATELIMIT_BLOCK_SECONDS: int = Field(default_factory=lambda: int(os.getenv("API_RATELIMIT_BLOCK_SECONDS", 60)))
+
+    API_TOKEN_CACHE_SIZE: int = Field(default_factory=lambda: int(os.getenv("API_TOKEN_CACHE_SIZE", 10000)))  # 0 disables the cache
+
+    # Password hashing (argon2 worker pool)
+    API_HASHER_EXECUTOR: Literal['thread', 'process'] = Field(default_factory=lambda: os.getenv("API_HASHER_EXECUTOR", "thread"))
+    API_HASHER_WORKERS: int = Field(default_factory=lambda: int(os.getenv("API_HASHER_WORKERS", 0)))  # 0 = cpu count
+    API_HASHER_QUEUE_SIZE: int = Field(default_factory=lambda: int(os.getenv("API_HASHER_QUEUE_SIZE", 64)))
+
+    # Bulk import (POST /users:bulk), a longer NDJSON / CSV line is rejected for that row only
+    API_BULK_MAX_LINE_BYTES: int = Field(default_factory=lambda: int(os.getenv("API_BULK_MAX_LINE_BYTES", 16384)))
+
     # Header settings
     HEADERS_HTTP_ONLY: bool = Field(default_factory=lambda: os.getenv("HEADERS_HTTP_ONLY", "true").lower() == "true")
     HEADERS_DEFAULT_PATH: str = Field(default_factory=lambda: os.getenv("HEADERS_DEFAULT_PATH", "/"))
     HEADERS_SAMESITE: str = Field(default_factory=lambda: os.getenv("HEADERS_SAMESITE", "Lax"))
     HEADERS_TOKEN_MAGAGE: int = Field(default_factory=lambda: int(os.getenv("HEADERS_TOKEN_MAXAGE", 86400)))  # 1 day
+    HEADERS_HSTS_MAXAGE: int = Field(default_factory=lambda: int(os.getenv("HEADERS_HSTS_MAXAGE", 31536000)))  # 1 year
+    HEADERS_CSP: str = Field(default_factory=lambda: os.getenv("HEADERS_CSP") or (
+        "default-src 'self';"
+        "script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; "
+        "style-src 'self' 'unsafe-inline'; "
+        "img-src 'self' data:; "
+        "font-src 'self'; "
+        "connect-src 'self'; "
+        "frame-ancestors 'none'; "
+        "form-action 'self'; "
+        "base-uri 'self';"
+    ))
 
 
 class MongoDBConfiguration(BaseModel):
@@ -76,10 +135,62 @@ class PostgresqlConfiguration(BaseModel):
     DATABASE_ECHO: bool = Field(default_factory=lambda: os.getenv("POSTGRES_ECHO", "false").lower() == "true")
     DATABASE_SSLMODE: str = Field(default_factory=lambda: os.getenv("POSTGRES_SSLMODE", "prefer"))
 
+    # asyncpg prepared statements, PGBOUNCER mode turns both caches off and uses unique
+    # statement names so transaction pooling never sees a statement from another client
+    DATABASE_STATEMENT_CACHE_SIZE: int = Field(default_factory=lambda: int(os.getenv("POSTGRES_STATEMENT_CACHE_SIZE", 100)))
+    DATABASE_STATEMENT_CACHE_LIFETIME: int = Field(default_factory=lambda: int(os.getenv("POSTGRES_STATEMENT_CACHE_LIFETIME", 300)))  # seconds
+    DATABASE_PGBOUNCER: bool = Field(default_factory=lambda: os.getenv("POSTGRES_PGBOUNCER", "false").lower() == "true")
+
+    # Pool / statement metrics and slow query log
+    DATABASE_INSTRUMENTATION: bool = Field(default_factory=lambda: os.getenv("POSTGRES_INSTRUMENTATION", "true").lower() == "true")
+    DATABASE_SLOW_QUERY_MS: float = Field(default_factory=lambda: float(os.getenv("POSTGRES_SLOW_QUERY_MS", 500)))
+
+    # Read replicas, comma separated urls, reads fall back to the primary when none is usable
+    DATABASE_REPLICA_URLS: list[str] = Field(default_factory=lambda: [url.strip() for url in os.getenv("POSTGRES_REPLICA_URLS", "").split(",") if url.strip()])
+    DATABASE_REPLICA_MAX_LAG: float = Field(default_factory=lambda: float(os.getenv("POSTGRES_REPLICA_MAX_LAG", 5)))  # seconds
+    DATABASE_REPLICA_CHECK_INTERVAL: float = Field(default_factory=lambda: float(os.getenv("POSTGRES_REPLICA_CHECK_INTERVAL", 5)))  # seconds
+    DATABASE_STICKY_SECONDS: float = Field(default_factory=lambda: float(os.getenv("POSTGRES_STICKY_SECONDS", 5)))  # reads stay on primary after a write
+
+    # Repository read-through cache
+    DATABASE_CACHE_SIZE: int = Field(default_factory=lambda: int(os.getenv("POSTGRES_CACHE_SIZE", 10000)))
+    DATABASE_CACHE_TTL: int = Field(default_factory=lambda: int(os.getenv("POSTGRES_CACHE_TTL", 60)))  # seconds
+    DATABASE_CACHE_SYNC_INTERVAL: float = Field(default_factory=lambda: float(os.getenv("POSTGRES_CACHE_SYNC_INTERVAL", 0.05)))  # seconds a peer worker may still serve a dropped entry
+
+    # Write-behind buffer for User.point / last_login (db/write_behind.py)
+    DATABASE_WRITE_BEHIND_INTERVAL: float = Field(default_factory=lambda: float(os.getenv("POSTGRES_WRITE_BEHIND_INTERVAL", 1)))  # seconds
+    DATABASE_WRITE_BEHIND_MAX_PENDING: int = Field(default_factory=lambda: int(os.getenv("POSTGRES_WRITE_BEHIND_MAX_PENDING", 10000)))  # users, flush early past this
+
+    # Username / email availability bloom filter (db/availability.py)
+    DATABASE_AVAILABILITY_CAPACITY: int = Field(default_factory=lambda: int(os.getenv("POSTGRES_AVAILABILITY_CAPACITY", 1_000_000)))  # users before a rebuild resizes it
+    DATABASE_AVAILABILITY_ERROR_RATE: float = Field(default_factory=lambda: float(os.getenv("POSTGRES_AVAILABILITY_ERROR_RATE", 0.001)))  # share of misses that still query the db
+    DATABASE_AVAILABILITY_SYNC_INTERVAL: float = Field(default_factory=lambda: float(os.getenv("POSTGRES_AVAILABILITY_SYNC_INTERVAL", 5)))  # seconds, picks up other workers' signups
+
     # Optional debugging or development switches
     USE_ASYNC_DRIVER: bool = Field(default_factory=lambda: os.getenv("POSTGRES_USE_ASYNC", "false").lower() == "true")
 
-    def sqlalchemy_url(self) -> str:
+    def _driver_url(self, url: str) -> str:
         if self.USE_ASYNC_DRIVER:
-            return self.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
-        return self.DATABASE_URL
\ No newline at end of file
+            return url.replace("postgresql://", "postgresql+asyncpg://")
+        return url
+
+    def sqlalchemy_url(self) -> str:
+        return self._driver_url(self.DATABASE_URL)
+
+    def replica_urls(self) -> list[str]:
+        return [self._driver_url(url) for url in self.DATABASE_REPLICA_URLS]
+
+
+# Shared instances, built on first use instead of at import (keeps `import main` cheap)
+@lru_cache
+def get_app_config() -> APPConfig:
+    return APPConfig()
+
+
+@lru_cache
+def get_api_config() -> APIConfiguration:
+    return APIConfiguration()
+
+
+@lru_cache
+def get_db_config() -> PostgresqlConfiguration:
+    return PostgresqlConfiguration()
@@ -35,6 +35,24 @@ class AppException:
             context = {"message": "Invalid credentials"}
             super().__init__(status_code, context)
 
+    class Forbidden(AppExceptionHandler):
+        def __init__(self):
+            status_code = status.HTTP_403_FORBIDDEN
+            context = {"message": "Not enough permissions"}
+            super().__init__(status_code, context)
+
+    class ServiceUnavailable(AppExceptionHandler):
+        def __init__(self, message: str = "Service temporarily unavailable"):
+            status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+            context = {"message": message}
+            super().__init__(status_code, context)
+
+    class PreconditionFailed(AppExceptionHandler):
+        def __init__(self, message: str = "The resource changed, fetch it again and retry"):
+            status_code = status.HTTP_412_PRECONDITION_FAILED
+            context = {"message": message}
+            super().__init__(status_code, context)
+
     # Add another (Postpone for now)
 
 
@@ -0,0 +1,136 @@
+import asyncio, os, time
+
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Literal, NamedTuple, Optional
+
+from core.exceptions import AppException
+
+if TYPE_CHECKING:
+    from argon2 import PasswordHasher
+
+# one hasher per process, worker processes build their own on first call,
+# argon2 itself is only imported then (it pulls in cffi, noticeable on cold start)
+_hasher: Optional["PasswordHasher"] = None
+
+
+def _get_hasher() -> "PasswordHasher":
+    global _hasher
+    if _hasher is None:
+        from argon2 import PasswordHasher
+        _hasher = PasswordHasher(hash_len=64)
+    return _hasher
+
+
+# Worker functions (module level so they can be pickled for a process pool)
+def hash_password(plain_password: str) -> str:
+    return _get_hasher().hash(plain_password)
+
+
+def verify_password(hashed_password: str, plain_password: str) -> tuple[bool, Optional[str]]:
+    """Returns (is_valid, new_hash), new_hash is only set when the stored hash parameters are outdated"""
+    from argon2 import exceptions
+
+    hasher = _get_hasher()
+    try:
+        hasher.verify(hashed_password, plain_password)
+    except (exceptions.VerificationError, exceptions.InvalidHashError):
+        return False, None
+
+    if hasher.check_needs_rehash(hashed_password):
+        return True, hasher.hash(plain_password)
+    return True, None
+
+
+class VerifyResult(NamedTuple):
+    valid: bool
+    new_hash: Optional[str] = None  # persist this when set (transparent rehash on login)
+
+
+class _OperationStats:
+    __slots__ = ("calls", "rejected", "total_seconds", "max_seconds")
+
+    def __init__(self):
+        self.calls = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def observe(self, seconds: float):
+        self.calls += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "avg_ms": self.total_seconds / self.calls * 1000 if self.calls else 0.0,
+            "max_ms": self.max_seconds * 1000,
+        }
+
+
+class PasswordHashingService:
+    """
+        Runs Argon2 off the event loop on a bounded worker pool.
+        At most `max_workers + queue_size` calls may be in flight, anything above
+        is rejected right away with 503 instead of piling up behind the pool
+    """
+    def __init__(self, executor: Literal["thread", "process"] = "thread",
+                 max_workers: Optional[int] = None, queue_size: int = 64):
+        self.executor_kind = executor
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_in_flight = self.max_workers + queue_size
+        self.in_flight = 0
+        self.stats = {"hash": _OperationStats(), "verify": _OperationStats()}
+        self._executor: Optional[Executor] = None
+
+    @classmethod
+    def from_config(cls, config) -> "PasswordHashingService":
+        return cls(
+            executor=config.API_HASHER_EXECUTOR,
+            max_workers=config.API_HASHER_WORKERS or None,
+            queue_size=config.API_HASHER_QUEUE_SIZE
+        )
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="argon2")
+        return self._executor
+
+    async def _run(self, operation: str, fn, *args):
+        stats = self.stats[operation]
+        if self.in_flight >= self.max_in_flight:
+            stats.rejected += 1
+            raise AppException.ServiceUnavailable("Password hashing is saturated, try again later")
+
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.in_flight -= 1
+            stats.observe(time.perf_counter() - started)
+
+    async def hash(self, plain_password: str) -> str:
+        if not plain_password or len(plain_password) < 8:
+            raise ValueError("Password must be at least 8 characters long")
+        return await self._run("hash", hash_password, plain_password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> VerifyResult:
+        return VerifyResult(*await self._run("verify", verify_password, hashed_password, plain_password))
+
+    def metrics(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            **{operation: stats.as_dict() for operation, stats in self.stats.items()}
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
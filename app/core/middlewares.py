@@ -1,99 +1,125 @@
-import asyncio, time, re
+import math, re
 
 from fastapi.security import OAuth2PasswordBearer
 from starlette import status
 from starlette.exceptions import HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
-from starlette.responses import Response, JSONResponse
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from collections import defaultdict, deque
 from typing import Optional
+
+from core.config import APIConfiguration, get_api_config
+from core.ratelimit import RateLimitBackend, InMemoryRateLimitBackend, SharedMemoryRateLimitBackend
+from core.shared_state import RATELIMIT_SEGMENT, shared_segment
 #from itsdangerous import
 
 
-class DDoSMiddlewareAPP(BaseHTTPMiddleware):
-    def __init__(self, app, max_requests: int = 60, window_seconds: int = 60, block_seconds: int = 60):
+class DDoSMiddlewareAPP:
+    def __init__(self, app: ASGIApp, max_requests: int = 60, window_seconds: int = 60, block_seconds: int = 60,
+                 backend: Optional[RateLimitBackend] = None):
         """
             Mitigate DDoS Attack just on application layer
-            better to use Redis
+            workers under serve.py share their counters through shared memory by default,
+            pass a RedisRateLimitBackend to share them between hosts
         """
-        super().__init__(app)
-        self.max_requests = max_requests
-        self.window_seconds = window_seconds
-        self.block_seconds = block_seconds
-        
-        self.requests = defaultdict(deque)
-        self.blocked_ips = []
-        self.lock = asyncio.Lock()
-
-    async def dispatch(self, request, call_next):
-        ip = request.client.host
-        now = time.time()
-
-        async with self.lock:
-            # unbound ip address
-            if ip in self.blocked_ips and now >= self.blocked_ips[ip]:
-                del self.blocked_ips[ip]
-
-            # if blocked
-            if ip in self.blocked_ips:
-                # can use the HTML or whatever you want
-                # but now i only implement jsonresponse
-                return JSONResponse({"detail": "Too Many Request. Try again later after 10 minutes"}, status_code=status.HTTP_429_TOO_MANY_REQUESTS)
-            
-            self.requests[ip].append(now)
-
-            # remove timestamp older than window
-            while self.requests[ip] and self.requests[ip][0] < now - self.window_seconds:
-                self.requests[ip].popleft()
-
-            if len(self.requests[ip]) > self.max_requests:
-                self.blocked_ips[ip] = now + self.block_seconds
-                return JSONResponse({"detail": "Rate Limit exceeded, your access temporary being held/ban for several minutes"}, status_code=status.HTTP_429_TOO_MANY_REQUESTS)
-
-        return await super().dispatch(request, call_next)
-    
-
-
-class CustomHeadersMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-
-        response.headers["Strict-Transport-Security"] = f"max-age=31536000; includeSubDomains; preload"
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers['X-XSS-Protection'] = "1;mode=block;"
-        response.headers['X-Frame-Options'] = "ALLOW"
-        response.headers['Referrer-Policy'] = "strict-origin-when-cross-origin"
-        response.headers['geolocation=(self)']
-        response.headers['Access-Control-Allow-Origin'] = "*"
-        response.headers['Cache-Control'] = "no-store, no-cache, must-revalidate, proxy-revalidate"
-
-        csp = (
-            "default-src 'self';"
-            "script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; "
-            "style-src 'self' 'unsafe-inline'; "
-            "img-src 'self' data:; "
-            "font-src 'self'; "
-            "connect-src 'self'; "
-            "frame-ancestors 'none'; "
-            "form-action 'self'; "
-            "base-uri 'self';"
-        )
-        
-        response.headers['Content-Security-Policy'] = csp
-
-        return response
+        self.app = app
+        segment = None if backend is not None else shared_segment(*RATELIMIT_SEGMENT)
+        if segment is not None:
+            backend = SharedMemoryRateLimitBackend(
+                segment,
+                max_requests=max_requests,
+                window_seconds=window_seconds,
+                block_seconds=block_seconds
+            )
+        if backend is None:
+            # not `backend or ...`: an in-memory backend has a __len__, empty it is falsy
+            backend = InMemoryRateLimitBackend(
+                max_requests=max_requests,
+                window_seconds=window_seconds,
+                block_seconds=block_seconds
+            )
+        self.backend = backend
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        client = scope.get("client")
+        result = await self.backend.hit(client[0] if client else "unknown")
+
+        if not result.allowed:
+            # can use the HTML or whatever you want
+            # but now i only implement jsonresponse
+            response = JSONResponse(
+                {"detail": "Rate Limit exceeded, your access temporary being held/ban for several minutes"},
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={"Retry-After": str(math.ceil(result.retry_after))}
+            )
+            return await response(scope, receive, send)
+
+        await self.app(scope, receive, send)
+
+
+# security headers a route's own value takes precedence over
+ROUTE_HEADERS = frozenset((b"cache-control",))
+
+
+def build_security_headers(config: Optional[APIConfiguration] = None) -> list[tuple[bytes, bytes]]:
+    """Encode the security header block once, it's appended as-is to every response"""
+    config = config or get_api_config()
+    headers = {
+        "Strict-Transport-Security": f"max-age={config.HEADERS_HSTS_MAXAGE}; includeSubDomains; preload",
+        "X-Content-Type-Options": "nosniff",
+        "X-XSS-Protection": "1;mode=block;",
+        "X-Frame-Options": "ALLOW",
+        "Referrer-Policy": "strict-origin-when-cross-origin",
+        "Permissions-Policy": "geolocation=(self)",
+        "Access-Control-Allow-Origin": "*",
+        "Cache-Control": "no-store, no-cache, must-revalidate, proxy-revalidate",  # unless the route set its own
+        "Content-Security-Policy": config.HEADERS_CSP,
+    }
+    return [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()]
+
+
+class CustomHeadersMiddleware:
+    def __init__(self, app: ASGIApp, config: Optional[APIConfiguration] = None):
+        self.app = app
+        block = build_security_headers(config)
+        # replaced on every response, except the ones a route may choose itself (ETag'd reads
+        # send `private, no-cache`, no-store would keep clients from ever revalidating)
+        self.header_block = [header for header in block if header[0] not in ROUTE_HEADERS]
+        self.default_block = [header for header in block if header[0] in ROUTE_HEADERS]
+        self.header_names = frozenset(name for name, _ in self.header_block)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_with_headers(message: Message):
+            # only the start message is touched, body chunks go straight through
+            if message["type"] == "http.response.start":
+                names = self.header_names
+                headers = [header for header in message.get("headers", ()) if header[0].lower() not in names]
+                present = {name.lower() for name, _ in headers}
+                headers.extend(self.header_block)
+                headers.extend(header for header in self.default_block if header[0] not in present)
+                message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
 
 
 class CustomOAuth2Middleware(OAuth2PasswordBearer):
-    def __init__(self, tokenUrl: str = "", auto_err: bool = True):
-        super().__init__(tokenUrl=tokenUrl, auto_error=auto_err)
+    def __init__(self, tokenUrl: str = "", auto_error: bool = True):
+        super().__init__(tokenUrl=tokenUrl, auto_error=auto_error)
 
-    async def __call__(self, request):
-        auth_header = Optional[str] = request.headers.get("Authorization")
+    async def __call__(self, request: Request):
+        auth_header: Optional[str] = request.headers.get("Authorization")
 
         if not auth_header:
+            if not self.auto_error:
+                return None
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing Authorization access, do authentication", headers={"WWW-Authenticate": "Bearer"})
         
         # validate format Bearer <token>
@@ -0,0 +1,166 @@
+import re, sys, threading, time, uuid
+
+from array import array
+from collections import Counter as StackCounter
+from typing import Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.metrics import Counter, Gauge, registry
+
+
+class LatencyHistogram:
+    """
+        HDR-style log-linear histogram of microseconds in one fixed array:
+        exact below 128us, then 64 linear sub-buckets per power of two (~1.6% error).
+        Memory is fixed by `max_value_us` (60s -> ~1.4k counters, ~11KB) whatever the traffic
+    """
+    SUB_BITS = 6
+    SUB_COUNT = 1 << SUB_BITS  # 64
+    LINEAR_LIMIT = SUB_COUNT * 2  # 128
+
+    def __init__(self, max_value_us: int = 60_000_000):
+        self.max_value_us = max_value_us
+        self.counts = array("Q", [0]) * (self._index(max_value_us) + 1)
+        self.total = 0
+        self.max_seen = 0
+
+    def _index(self, value: int) -> int:
+        if value < self.LINEAR_LIMIT:
+            return value
+        shift = value.bit_length() - self.SUB_BITS - 1
+        return self.LINEAR_LIMIT + (shift - 1) * self.SUB_COUNT + (value >> shift) - self.SUB_COUNT
+
+    def _value(self, index: int) -> int:
+        """Middle of the bucket at `index`"""
+        if index < self.LINEAR_LIMIT:
+            return index
+        shift, sub = divmod(index - self.LINEAR_LIMIT, self.SUB_COUNT)
+        shift += 1
+        return ((sub + self.SUB_COUNT) << shift) + (1 << shift) // 2
+
+    def record(self, value_us: int):
+        value_us = min(max(int(value_us), 0), self.max_value_us)
+        self.counts[self._index(value_us)] += 1
+        self.total += 1
+        if value_us > self.max_seen:
+            self.max_seen = value_us
+
+    def percentile(self, percent: float) -> int:
+        if not self.total:
+            return 0
+        target = max(1, round(self.total * percent / 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._value(index), self.max_seen)
+        return self.max_seen
+
+
+REPORTED_PERCENTILES = (50, 90, 95, 99, 99.9)
+route_latency: dict[str, LatencyHistogram] = {}
+
+
+def _route_percentiles() -> dict:
+    return {
+        (route, str(percent / 100)): histogram.percentile(percent) / 1e6
+        for route, histogram in route_latency.items() for percent in REPORTED_PERCENTILES
+    }
+
+
+request_latency = registry.register(Gauge(
+    "http_request_duration_seconds", "Request latency percentiles per route (HDR histogram)",
+    ("route", "quantile"), callback=_route_percentiles
+))
+request_total = registry.register(Counter("http_requests_total", "Requests per route and status", ("route", "status")))
+
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,128}$")
+
+
+class RequestTimingMiddleware:
+    """
+        Pure ASGI: gives every request an X-Request-ID (kept from the client when sane),
+        sets X-Response-Time (time to headers) and records the full duration per route template
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        if request_id is None or not _REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        scope.setdefault("state", {})["request_id"] = request_id
+        status_code = 500
+
+        async def send_with_timing(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                message["headers"] = [
+                    *message.get("headers", ()),
+                    (b"x-request-id", request_id.encode("latin-1")),
+                    (b"x-response-time", f"{elapsed_ms:.2f}ms".encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            # route template, never the raw path, keeps the number of histograms bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            histogram = route_latency.get(route)
+            if histogram is None:
+                histogram = route_latency[route] = LatencyHistogram()
+            histogram.record((time.perf_counter() - started) * 1e6)
+            request_total.inc(labels=(route, str(status_code)))
+
+
+class SamplingProfiler:
+    """
+        Statistical profiler for a live worker: a side thread samples the stack of the
+        target thread (the event loop) every `interval` seconds and counts collapsed stacks,
+        output is the `a;b;c count` format flamegraph.pl / speedscope read
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def profile(self, thread_id: int, seconds: float, interval: float = 0.005) -> str:
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        try:
+            stacks: StackCounter = StackCounter()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                frame = sys._current_frames().get(thread_id)
+                if frame is not None:
+                    stacks[self._collapse(frame)] += 1
+                time.sleep(interval)
+            return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def _collapse(frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+
+profiler = SamplingProfiler()
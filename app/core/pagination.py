@@ -0,0 +1,22 @@
+import base64, json
+
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+
+def encode_cursor(created_at: datetime, user_id: UUID) -> str:
+    """Opaque keyset cursor, clients must hand it back untouched"""
+    raw = json.dumps([created_at.isoformat(), str(user_id)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[tuple[datetime, UUID]]:
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, user_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), UUID(user_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
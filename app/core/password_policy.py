@@ -0,0 +1,113 @@
+import re, string
+
+from typing import Iterable, Optional
+
+from core.config import APPConfig, get_app_config
+
+# Declarative rules, name -> what it matches
+FORBIDDEN_CHARACTERS = {
+    "sql_injection_chars": "'\";",
+    "xml_chars": "<>",
+    "whitespace": "".join(chr(code) for code in range(0x3001) if chr(code).isspace()),
+    "path_chars": "\\/",
+    "code_block_chars": "{}[]()",
+}
+FORBIDDEN_PATTERNS = {
+    "sql_keyword": r"select|insert|delete|drop|alter|create|exec",
+    "sql_clause": r"union|join|having|where",
+    "script_keyword": r"script|alert|onerror|onload",
+    "directory_traversal": r"\.\./",
+}
+REQUIRED_CLASSES = {
+    "uppercase": string.ascii_uppercase,
+    "lowercase": string.ascii_lowercase,
+    "digit": string.digits,
+    "special": "!@#$%^&*",
+}
+
+
+class PasswordPolicy:
+    """
+        All rules compiled into one scanner: character rules are a single str.translate table
+        (every char -> code of its class), multi-char rules are one alternation run on the casefolded password.
+        `violations` reports everything that is wrong instead of stopping at the first rule
+    """
+    # private use area, never valid in a password anyway
+    _CODE_BASE = 0xF0000
+
+    def __init__(self, min_length: int = 8, max_length: int = 50, min_required: int = 3,
+                 forbidden_characters: dict = FORBIDDEN_CHARACTERS, forbidden_patterns: dict = FORBIDDEN_PATTERNS,
+                 required_classes: dict = REQUIRED_CLASSES):
+        self.min_length = min_length
+        self.max_length = max_length
+        self.min_required = min_required
+        self.required_classes = tuple(required_classes)
+
+        self._table: dict[int, Optional[str]] = {}
+        self._code_names: dict[str, str] = {}
+        rules = [*forbidden_characters.items(), *required_classes.items()]
+        for index, (name, chars) in enumerate(rules):
+            code = chr(self._CODE_BASE + index)
+            self._code_names[code] = name
+            self._table.update({ord(char): code for char in chars})
+        # a literal code char in the input must not pass for a class
+        self._table.update({ord(code): None for code in self._code_names})
+
+        self._forbidden_characters = frozenset(forbidden_characters)
+        self._code_items = tuple(self._code_names.items())
+        # patterns are written lowercase, casefolding once is much cheaper than re.IGNORECASE
+        self._patterns = re.compile(
+            "|".join(f"(?P<{name}>{pattern})" for name, pattern in forbidden_patterns.items())
+        ) if forbidden_patterns else None
+
+    @classmethod
+    def from_config(cls, config: APPConfig) -> "PasswordPolicy":
+        return cls(
+            min_length=config.API_PASSWORD_MIN_LENGTH,
+            max_length=config.API_PASSWORD_MAX_LENGTH,
+            min_required=config.API_PASSWORD_MIN_REQUIRED
+        )
+
+    def violations(self, password: str) -> list[str]:
+        errors = []
+        if len(password) < self.min_length:
+            errors.append(f"must be at least {self.min_length} characters")
+        if len(password) > self.max_length:
+            errors.append(f"can't be more than {self.max_length} characters")
+
+        classes = password.translate(self._table)
+        present = {name for code, name in self._code_items if code in classes}
+        errors.extend(f"contains forbidden characters ({name})" for name in sorted(present & self._forbidden_characters))
+
+        if self._patterns is not None:
+            matched = {match.lastgroup for match in self._patterns.finditer(password.casefold())}
+            errors.extend(f"contains forbidden pattern ({name})" for name in sorted(matched))
+
+        if sum(name in present for name in self.required_classes) < self.min_required:
+            errors.append(f"must contain at least {self.min_required} of : {', '.join(self.required_classes)}")
+        return errors
+
+    def validate(self, password: str) -> str:
+        errors = self.violations(password)
+        if errors:
+            raise ValueError("Password " + "; ".join(errors))
+        return password
+
+
+class UsernamePolicy:
+    def __init__(self, restricted: Iterable[str]):
+        self.restricted = frozenset(name.lower() for name in restricted)
+
+    @classmethod
+    def from_config(cls, config: APPConfig) -> "UsernamePolicy":
+        return cls(config.API_RESTRICTED_USERNAMES)
+
+    def validate(self, username: str) -> str:
+        if username.lower() in self.restricted:
+            raise ValueError(f"Username : '{username}' is restricted")
+        return username
+
+
+# compiled once at import, shared by every schema
+password_policy = PasswordPolicy.from_config(get_app_config())
+username_policy = UsernamePolicy.from_config(get_app_config())
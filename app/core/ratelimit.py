@@ -0,0 +1,212 @@
+import hashlib, struct, threading, time, zlib
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    retry_after: float = 0.0  # seconds until the key may try again
+
+
+class RateLimitBackend(ABC):
+    """
+        GCRA (generic cell rate algorithm) limiter
+        every key only keeps a "theoretical arrival time" + block deadline,
+        so state per key is O(1) no matter how many requests it makes
+    """
+    def __init__(self, max_requests: int = 60, window_seconds: int = 60, block_seconds: int = 60):
+        self.max_requests = max_requests
+        self.window_seconds = float(window_seconds)
+        self.block_seconds = float(block_seconds)
+        # time between two requests at the steady rate
+        self.emission_interval = self.window_seconds / max_requests
+
+    @abstractmethod
+    async def hit(self, key: str, now: Optional[float] = None) -> RateLimitResult:
+        ...
+
+    async def close(self):
+        pass
+
+
+class _Shard:
+    __slots__ = ("lock", "entries")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> (tat, blocked_until), ordered from least to most recently used
+        self.entries: "OrderedDict[str, tuple[float, float]]" = OrderedDict()
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """
+        Process local backend, keys are spread over lock-striped shards so
+        concurrent hits on different keys never wait on each other.
+        Idle keys are dropped (TTL) and each shard is capped (LRU) so memory stays bounded
+    """
+    # how many idle entries one hit is allowed to sweep, keeps the cost amortized O(1)
+    SWEEP_PER_HIT = 2
+
+    def __init__(self, max_requests: int = 60, window_seconds: int = 60, block_seconds: int = 60,
+                 shards: int = 64, max_keys: int = 250_000):
+        super().__init__(max_requests, window_seconds, block_seconds)
+        self.shards = [_Shard() for _ in range(shards)]
+        self.max_keys_per_shard = max(1, max_keys // shards)
+
+    def _shard(self, key: str) -> _Shard:
+        return self.shards[zlib.crc32(key.encode()) % len(self.shards)]
+
+    def __len__(self) -> int:
+        return sum(len(shard.entries) for shard in self.shards)
+
+    def hit_sync(self, key: str, now: Optional[float] = None) -> RateLimitResult:
+        now = time.monotonic() if now is None else now
+        shard = self._shard(key)
+
+        with shard.lock:
+            entries = shard.entries
+            tat, blocked_until = entries.pop(key, (now, 0.0))
+
+            if blocked_until > now:
+                entries[key] = (tat, blocked_until)
+                return RateLimitResult(False, blocked_until - now)
+
+            tat = max(tat, now)
+            new_tat = tat + self.emission_interval
+            if new_tat - now > self.window_seconds:
+                # over the limit, hold the key for block_seconds
+                blocked_until = now + self.block_seconds
+                entries[key] = (tat, blocked_until)
+                result = RateLimitResult(False, self.block_seconds)
+            else:
+                entries[key] = (new_tat, 0.0)
+                result = RateLimitResult(True)
+
+            # TTL: a key whose tat and block are both in the past is the same as a fresh key
+            for _ in range(self.SWEEP_PER_HIT):
+                oldest_key, (oldest_tat, oldest_block) = next(iter(entries.items()))
+                if oldest_tat > now or oldest_block > now:
+                    break
+                del entries[oldest_key]
+
+            # LRU: hard cap per shard
+            while len(entries) > self.max_keys_per_shard:
+                entries.popitem(last=False)
+
+        return result
+
+    async def hit(self, key: str, now: Optional[float] = None) -> RateLimitResult:
+        return self.hit_sync(key, now)
+
+
+class SharedMemoryRateLimitBackend(RateLimitBackend):
+    """
+        Counters shared by every worker on the host through a SharedSegment (see serve.py).
+        The segment is a fixed table of 8-slot groups, a key lives in the group picked by its
+        fingerprint and only that group is locked. When a group is full the slot that went idle
+        first is reused, so memory never grows and a stale key costs nothing.
+        Times are wall clock (time.time), monotonic clocks are not comparable across processes
+    """
+    SLOT = struct.Struct("<Qdd")  # fingerprint (0 = empty), tat, blocked_until
+    GROUP_SLOTS = 8
+
+    def __init__(self, segment, max_requests: int = 60, window_seconds: int = 60, block_seconds: int = 60):
+        super().__init__(max_requests, window_seconds, block_seconds)
+        self.segment = segment
+        self.group_size = self.SLOT.size * self.GROUP_SLOTS
+        self.groups = segment.size // self.group_size
+
+    @staticmethod
+    def _fingerprint(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+    def hit_sync(self, key: str, now: Optional[float] = None) -> RateLimitResult:
+        now = time.time() if now is None else now
+        fingerprint = self._fingerprint(key)
+        group = fingerprint % self.groups
+        slot_struct = self.SLOT
+
+        with self.segment.lock(group) as buffer:
+            offset, victim, victim_idle_at = None, 0, None
+            for slot in range(self.GROUP_SLOTS):
+                slot_offset = group * self.group_size + slot * slot_struct.size
+                slot_fingerprint, slot_tat, slot_blocked = slot_struct.unpack_from(buffer, slot_offset)
+                if slot_fingerprint == fingerprint:
+                    offset, tat, blocked_until = slot_offset, slot_tat, slot_blocked
+                    break
+                idle_at = max(slot_tat, slot_blocked)
+                if victim_idle_at is None or idle_at < victim_idle_at:
+                    victim, victim_idle_at = slot_offset, idle_at
+            else:
+                offset, tat, blocked_until = victim, now, 0.0
+
+            if blocked_until > now:
+                return RateLimitResult(False, blocked_until - now)
+
+            tat = max(tat, now)
+            new_tat = tat + self.emission_interval
+            if new_tat - now > self.window_seconds:
+                blocked_until = now + self.block_seconds
+                slot_struct.pack_into(buffer, offset, fingerprint, tat, blocked_until)
+                return RateLimitResult(False, self.block_seconds)
+
+            slot_struct.pack_into(buffer, offset, fingerprint, new_tat, 0.0)
+            return RateLimitResult(True)
+
+    async def hit(self, key: str, now: Optional[float] = None) -> RateLimitResult:
+        return self.hit_sync(key, now)
+
+    async def close(self):
+        self.segment.close()
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """
+        Shared backend speaking the Redis protocol, the GCRA step runs as one Lua script
+        so it's atomic across workers. Keys carry a PEXPIRE so idle clients are evicted by Redis.
+        `client` is anything exposing redis-py's asyncio `eval` (redis.asyncio.Redis, fakeredis, ...)
+    """
+    SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local window = tonumber(ARGV[3])
+local block = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tat', 'blk')
+local tat = tonumber(state[1]) or now
+local blk = tonumber(state[2]) or 0
+if blk > now then
+    return {0, tostring(blk - now)}
+end
+if tat < now then tat = now end
+local new_tat = tat + interval
+if new_tat - now > window then
+    blk = now + block
+    redis.call('HSET', KEYS[1], 'tat', tostring(tat), 'blk', tostring(blk))
+    redis.call('PEXPIRE', KEYS[1], math.ceil(math.max(tat, blk) - now))
+    return {0, tostring(block)}
+end
+redis.call('HSET', KEYS[1], 'tat', tostring(new_tat), 'blk', '0')
+redis.call('PEXPIRE', KEYS[1], math.ceil(new_tat - now))
+return {1, '0'}
+"""
+
+    def __init__(self, client, max_requests: int = 60, window_seconds: int = 60, block_seconds: int = 60,
+                 prefix: str = "ratelimit:"):
+        super().__init__(max_requests, window_seconds, block_seconds)
+        self.client = client
+        self.prefix = prefix
+
+    async def hit(self, key: str, now: Optional[float] = None) -> RateLimitResult:
+        # everything is sent in milliseconds so PEXPIRE gets whole numbers
+        now = time.time() if now is None else now
+        allowed, retry_after = await self.client.eval(
+            self.SCRIPT, 1, self.prefix + key,
+            now * 1000, self.emission_interval * 1000,
+            self.window_seconds * 1000, self.block_seconds * 1000
+        )
+        return RateLimitResult(bool(int(allowed)), float(retry_after) / 1000)
+
+    async def close(self):
+        await self.client.aclose()
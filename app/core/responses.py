@@ -0,0 +1,98 @@
+from collections.abc import Mapping
+from typing import Any, Optional, get_args
+
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import to_json
+from starlette.background import BackgroundTask
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+try:
+    import orjson
+except ImportError:  # optional, pydantic-core's encoder is the fallback
+    orjson = None
+
+
+def json_dumps(content: Any) -> bytes:
+    """UUID / datetime / Enum aware JSON straight to bytes"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return to_json(content)
+
+
+_adapters: dict[Any, TypeAdapter] = {}
+
+def _adapter(schema) -> TypeAdapter:
+    adapter = _adapters.get(schema)
+    if adapter is None:
+        adapter = _adapters[schema] = TypeAdapter(schema)
+    return adapter
+
+
+_fields: dict[Any, Optional[tuple]] = {}
+
+def _nests_model(annotation) -> bool:
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return True
+    return any(_nests_model(arg) for arg in get_args(annotation))
+
+def _trusted_fields(schema) -> Optional[tuple]:
+    """
+        (field name, attribute name) pairs to copy a row into `schema`'s JSON shape without validating it,
+        None when a field is itself a model (those go through validate_python). Cached per schema
+    """
+    if schema not in _fields:
+        fields = schema.model_fields
+        _fields[schema] = None if any(_nests_model(field.annotation) for field in fields.values()) else tuple(
+            (name, field.validation_alias if isinstance(field.validation_alias, str) else name)
+            for name, field in fields.items()
+        )
+    return _fields[schema]
+
+
+class FastJSONResponse(JSONResponse):
+    """Drop-in JSONResponse rendering through orjson / pydantic-core instead of the stdlib json"""
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content)
+
+
+class SchemaJSONResponse(JSONResponse):
+    """
+        Serialize ORM rows / repository dicts (or a list of them) as `schema`. They come from our own
+        database and were validated on the way in, so the schema's fields are copied out and dumped
+        as is (validating EmailStr & co again costs ~100x the dump).
+        Returning it from a route skips FastAPI's response_model pass, keep response_model
+        on the decorator for the OpenAPI docs only. e.g. SchemaJSONResponse(db_user, UserPublic)
+    """
+    def __init__(self, content: Any, schema: Any, status_code: int = 200,
+                 headers: Optional[dict] = None, background: Optional[BackgroundTask] = None):
+        self.many = isinstance(content, (list, tuple))
+        self.schema = schema
+        super().__init__(content, status_code=status_code, headers=headers, background=background)
+
+    def render(self, content: Any) -> bytes:
+        fields = _trusted_fields(self.schema)
+        if fields is None or isinstance(content, BaseModel) or (self.many and any(isinstance(row, BaseModel) for row in content)):
+            adapter = _adapter(list[self.schema] if self.many else self.schema)
+            if isinstance(content, BaseModel):
+                return adapter.dump_json(content)
+            return adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+
+        def row(item):
+            if isinstance(item, Mapping):
+                return {name: item[attr] for name, attr in fields}
+            return {name: getattr(item, attr) for name, attr in fields}
+        return json_dumps([row(item) for item in content] if self.many else row(content))
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+        StreamingResponse that doesn't watch `receive` for a disconnect,
+        the body iterator itself is still reading the request body (e.g. bulk uploads)
+    """
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,255 @@
+import asyncio, bisect, hashlib, heapq, logging, math, struct, time
+
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from models.schemas.token import TokenBlacklist
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Plain bit-array bloom filter, k positions are derived from one blake2b digest (double hashing)"""
+    def __init__(self, capacity: int = 10_000, error_rate: float = 0.001):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationBackend(ABC):
+    """Where workers exchange revoked tokens, every entry gets a monotonically increasing cursor"""
+    @abstractmethod
+    async def publish(self, entry: TokenBlacklist):
+        ...
+
+    @abstractmethod
+    async def fetch_since(self, cursor: int) -> tuple[list[TokenBlacklist], int]:
+        """Entries published after `cursor` and the new cursor"""
+        ...
+
+    @abstractmethod
+    async def claim(self, entry: TokenBlacklist) -> bool:
+        """Publish unless this jti was already published, atomic: exactly one caller gets True"""
+        ...
+
+
+class InMemoryRevocationBackend(RevocationBackend):
+    """
+        Single process backend (tests / one worker), share one instance between stores to simulate workers.
+        Entries keep their cursor, expired ones are dropped once the log doubled since the last compaction
+        (a store ignores expired entries anyway), so memory follows the tokens that are still valid
+    """
+    MIN_COMPACT = 1024
+
+    def __init__(self):
+        self._log: list[tuple[int, TokenBlacklist]] = []  # (cursor, entry), cursor ascending
+        self._jtis: set[str] = set()
+        self._count = 0
+        self._compact_at = self.MIN_COMPACT
+
+    async def publish(self, entry: TokenBlacklist):
+        self._log.append((self._count, entry))
+        self._jtis.add(entry.jti)
+        self._count += 1
+        if len(self._log) >= self._compact_at:
+            self.compact()
+
+    async def claim(self, entry: TokenBlacklist) -> bool:
+        if entry.jti in self._jtis:
+            return False
+        await self.publish(entry)  # no suspension point before the jti is in _jtis
+        return True
+
+    def compact(self, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        self._log = [(cursor, entry) for cursor, entry in self._log if entry.exp.timestamp() > now]
+        self._jtis = {entry.jti for _, entry in self._log}
+        self._compact_at = max(self.MIN_COMPACT, 2 * len(self._log))
+
+    async def fetch_since(self, cursor: int) -> tuple[list[TokenBlacklist], int]:
+        start = bisect.bisect_left(self._log, cursor, key=lambda item: item[0])
+        return [entry for _, entry in self._log[start:]], self._count
+
+
+class SharedMemoryRevocationBackend(RevocationBackend):
+    """
+        Workers on one host exchange revocations through a ring log in a SharedSegment (see serve.py):
+        a u64 count of everything ever published, then fixed size (jti, exp) records.
+        A store that falls more than `capacity` entries behind skips to the oldest one still kept
+    """
+    HEADER = struct.Struct("<Q")
+    RECORD = struct.Struct("<64sd")  # jti are uuid4 strings, 64 bytes is plenty
+
+    def __init__(self, segment):
+        self.segment = segment
+        self.capacity = (segment.size - self.HEADER.size) // self.RECORD.size
+
+    def _offset(self, index: int) -> int:
+        return self.HEADER.size + (index % self.capacity) * self.RECORD.size
+
+    def _append(self, buffer, entry: TokenBlacklist):
+        count, = self.HEADER.unpack_from(buffer, 0)
+        self.RECORD.pack_into(buffer, self._offset(count), entry.jti.encode(), entry.exp.timestamp())
+        self.HEADER.pack_into(buffer, 0, count + 1)
+
+    async def publish(self, entry: TokenBlacklist):
+        with self.segment.lock(0) as buffer:
+            self._append(buffer, entry)
+
+    async def claim(self, entry: TokenBlacklist) -> bool:
+        # the jti field is NUL padded to 64 bytes, a hit must start on a record boundary
+        needle = self.RECORD.pack(entry.jti.encode(), 0.0)[:64]
+        end = self.HEADER.size + self.capacity * self.RECORD.size
+        with self.segment.lock(0) as buffer:
+            position = buffer.find(needle, self.HEADER.size, end)
+            while position != -1:
+                if (position - self.HEADER.size) % self.RECORD.size == 0:
+                    return False
+                position = buffer.find(needle, position + 1, end)
+            self._append(buffer, entry)
+        return True
+
+    async def fetch_since(self, cursor: int) -> tuple[list[TokenBlacklist], int]:
+        with self.segment.lock(0) as buffer:
+            count, = self.HEADER.unpack_from(buffer, 0)
+            records = [
+                self.RECORD.unpack_from(buffer, self._offset(index))
+                for index in range(max(cursor, count - self.capacity), count)
+            ]
+        entries = [
+            TokenBlacklist(jti=jti.rstrip(b"\0").decode(), exp=datetime.fromtimestamp(exp))
+            for jti, exp in records
+        ]
+        return entries, count
+
+
+class TokenRevocationStore:
+    """
+        Logout support without a DB lookup per request.
+        The bloom filter answers "definitely not revoked" for almost every token,
+        only probable hits go to the exact jti -> exp map. Entries leave the map once
+        the token itself expires and the filter is rebuilt in the background so it stays small
+    """
+    def __init__(self, backend: Optional[RevocationBackend] = None, capacity: int = 10_000,
+                 error_rate: float = 0.001, sync_interval: float = 1.0):
+        self.backend = backend or InMemoryRevocationBackend()
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self._min_capacity = capacity
+        self._capacity = capacity
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._revoked: Dict[str, float] = {}
+        self._expiry_heap: list[tuple[float, str]] = []
+        self._stale = 0  # expired entries still set in the bloom filter
+        self._cursor = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    @staticmethod
+    def _timestamp(exp) -> float:
+        return exp.timestamp() if isinstance(exp, datetime) else float(exp)
+
+    def _add_local(self, jti: str, exp: float):
+        if exp <= time.time() or jti in self._revoked:
+            return
+        self._revoked[jti] = exp
+        heapq.heappush(self._expiry_heap, (exp, jti))
+        self._bloom.add(jti)
+        if len(self._revoked) > self._capacity:
+            self.rebuild()
+
+    async def revoke(self, jti: str, exp):
+        exp = self._timestamp(exp)
+        self._add_local(jti, exp)
+        await self.backend.publish(TokenBlacklist(jti=jti, exp=datetime.fromtimestamp(exp)))
+
+    async def claim(self, jti: str, exp) -> bool:
+        """
+            Single use tokens (refresh rotation): True for the first caller only. Locally the check and
+            the mark happen with no await in between, the backend repeats it atomically for the other
+            workers. A jti that fell out of the shared ring is still caught by the synced local map
+        """
+        if self.is_revoked(jti):
+            return False
+        exp = self._timestamp(exp)
+        self._add_local(jti, exp)
+        return await self.backend.claim(TokenBlacklist(jti=jti, exp=datetime.fromtimestamp(exp)))
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        if not jti or jti not in self._bloom:
+            return False
+        exp = self._revoked.get(jti)
+        return exp is not None and exp > time.time()
+
+    def is_revoked_claims(self, claims: Dict) -> bool:
+        """Shape expected by verify_access_token(is_revoked=...)"""
+        return self.is_revoked(claims.get("jti"))
+
+    def expire(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        removed = 0
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            _, jti = heapq.heappop(self._expiry_heap)
+            if self._revoked.pop(jti, None) is not None:
+                removed += 1
+        self._stale += removed
+        return removed
+
+    def rebuild(self):
+        """Fresh filter sized for what is still revoked, drops the bits of expired jtis"""
+        self._capacity = max(self._min_capacity, len(self._revoked) * 2)
+        bloom = BloomFilter(self._capacity, self.error_rate)
+        for jti in self._revoked:
+            bloom.add(jti)
+        self._bloom = bloom
+        self._stale = 0
+
+    def load(self, entries: Iterable[TokenBlacklist]):
+        for entry in entries:
+            self._add_local(entry.jti, self._timestamp(entry.exp))
+
+    async def sync(self):
+        entries, self._cursor = await self.backend.fetch_since(self._cursor)
+        self.load(entries)
+        self.expire()
+        # rebuild once expired entries make up a good part of the filter
+        if self._stale and self._stale >= len(self._revoked):
+            self.rebuild()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sync()
+            except Exception:
+                logger.exception("token revocation sync failed")
+            await asyncio.sleep(self.sync_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
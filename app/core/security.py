@@ -1,4 +1,4 @@
-import uuid, jwt, argon2
+import uuid, jwt
 
 from starlette import status
 from starlette.exceptions import HTTPException
@@ -6,43 +6,66 @@ from starlette.requests import Request
 from starlette.responses import Response
 from fastapi import Depends
 
-from typing import Optional, Annotated, Dict
+from typing import Callable, Optional, Annotated, Dict
 from jose import jwt, JWTError
 from itsdangerous import URLSafeSerializer, BadSignature, SignatureExpired
 from jwt.exceptions import ExpiredSignatureError, InvalidTokenError, InvalidSignatureError
-from argon2 import PasswordHasher, exceptions
 from datetime import datetime, timedelta
 
 # load configuration
-from core.config import APIConfiguration
+from core.config import get_api_config
 from core.middlewares import CustomOAuth2Middleware
-
-api_config = APIConfiguration()
-security_hasher = PasswordHasher(hash_len=64) # Argon2 Hasher
+from core.hashing import PasswordHashingService, _get_hasher
+from core.metrics import Gauge, registry
+from core.token_cache import VerifiedTokenCache
+from core.revocation import SharedMemoryRevocationBackend, TokenRevocationStore
+from core.shared_state import REVOCATION_SEGMENT, shared_segment
+
+api_config = get_api_config()
+hashing_service = PasswordHashingService.from_config(api_config) # off-loop Argon2
+hashing_gauge = registry.register(Gauge(
+    "password_hashing_in_flight", "Argon2 calls running or queued, and the limit above which they get 503", ("measure",),
+    callback=lambda: {("in_flight",): hashing_service.in_flight, ("max_in_flight",): hashing_service.max_in_flight}
+))
+hashing_operations = registry.register(Gauge(
+    "password_hashing_operations", "Hash / verify calls, rejections (503) and latency in ms", ("operation", "measure"),
+    callback=lambda: {
+        (operation, measure): value
+        for operation, stats in hashing_service.stats.items() for measure, value in stats.as_dict().items()
+    }
+))
 oauth2_schemes = CustomOAuth2Middleware(tokenUrl=api_config.HEADERS_DEFAULT_PATH)
+_revocation_segment = shared_segment(*REVOCATION_SEGMENT)
+revocation_store = TokenRevocationStore( # logout / revoked jti, shared by the workers under serve.py
+    backend=SharedMemoryRevocationBackend(_revocation_segment) if _revocation_segment else None
+)
+access_token_cache = VerifiedTokenCache(
+    max_entries=api_config.API_TOKEN_CACHE_SIZE,
+    max_ttl_seconds=api_config.API_ACCESS_EXPIRES_MINUTES * 60
+)
 
 # Password hashing and verification
+# sync versions block the caller, from async handlers use `hashing_service`
 def create_hashed_password(plain_password: str) -> str:
     """Securely hash a password using Argon2"""
+    import argon2  # argon2/cffi load on first use, not at app import
+
     if not plain_password or len(plain_password) < 8:
         raise ValueError("Password must be at least 8 characters long")
     
     try:
-        return security_hasher.hash(plain_password)
+        return _get_hasher().hash(plain_password)
     except argon2.exceptions.HashingError as e:
         raise ValueError(f"Password hashing failed: {str(e)}")
 
 
 def verify_hashed_password(input_password: str, hashed_password: str) -> bool:
     """Verify a password against its Argon2 hash"""
+    import argon2
+
     try:
-        security_hasher.verify(hashed_password, input_password)
-        
-        # Check if rehash is needed (if parameters have changed)
-        if security_hasher.check_needs_rehash(hashed_password):
-            return False
-            
-        return True
+        # an outdated hash is still a valid password, hashing_service.verify also returns the rehash
+        return _get_hasher().verify(hashed_password, input_password)
     except argon2.exceptions.InvalidHashError:
         return False
     except argon2.exceptions.VerifyMismatchError:
@@ -75,10 +98,10 @@ def _generate_token(payload: Dict[str, str], secret_key: str = "", algorithm: st
 
 # Access Token & Refresh TOken 
 async def create_access_token(payload: Dict[str, str], subject: Optional[str] = None) -> str:
-    return _generate_token(payload=payload, secret_key=api_config.API_SECRET_KEY, algorithm=api_config.API_ALGORITHM, expires_delta=timedelta(minutes=int(api_config.API_ACCESS_EXPIRES_MINUTES)))
+    return _generate_token(payload=payload, secret_key=api_config.API_SECRET_KEY, algorithm=api_config.API_ALGORITHM, expires_delta=timedelta(minutes=int(api_config.API_ACCESS_EXPIRES_MINUTES)), subject=subject)
 
-async def create_refresh_token(payload: Dict[str, str], subkect: Optional[str] = None) -> str:
-    return _generate_token(payload=payload, secret_key=api_config.API_REFRESH_SECRETKEY, algorithm=api_config.API_ALGORITHM, expires_delta=timedelta(days=int(api_config.API_REFRESH_EXPIRES_DAYS)))
+async def create_refresh_token(payload: Dict[str, str], subject: Optional[str] = None) -> str:
+    return _generate_token(payload=payload, secret_key=api_config.API_REFRESH_SECRETKEY, algorithm=api_config.API_ALGORITHM, expires_delta=timedelta(days=int(api_config.API_REFRESH_EXPIRES_DAYS)), subject=subject)
 
 # Verify Access & Refresh Token 
 def _verify_token(token: str, secret_key: str, algorithm: str) -> Dict:
@@ -92,8 +115,18 @@ def _verify_token(token: str, secret_key: str, algorithm: str) -> Dict:
     except InvalidTokenError:
         raise ValueError("Invalid Token error")
     
-def verify_access_token(token: str) -> Dict:
-    return _verify_token(token=token, secret_key=api_config.API_SECRET_KEY, algorithm=api_config.API_ALGORITHM)
+def verify_access_token(token: str, is_revoked: Optional[Callable[[Dict], bool]] = None) -> Dict:
+    """Verify an access token, claims are served from `access_token_cache` when seen before.
+    `is_revoked` runs on every call, cache hit or not"""
+    payload = access_token_cache.get(token) if access_token_cache.max_entries else None
+    if payload is None:
+        payload = _verify_token(token=token, secret_key=api_config.API_SECRET_KEY, algorithm=api_config.API_ALGORITHM)
+        if access_token_cache.max_entries:
+            access_token_cache.put(token, payload)
+
+    if is_revoked is not None and is_revoked(payload):
+        raise ValueError("Token has been revoked")
+    return payload
 
 def verify_refresh_token(token: str) -> Dict:
     return _verify_token(token=token, secret_key=api_config.API_REFRESH_SECRETKEY, algorithm=api_config.API_ALGORITHM)
\ No newline at end of file
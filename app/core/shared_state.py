@@ -0,0 +1,57 @@
+import mmap, os, threading
+
+from contextlib import contextmanager
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # no POSIX record locks (Windows), every worker keeps process-local state
+    fcntl = None
+
+# Set by serve.py to a directory under /dev/shm, every worker maps the same files from it
+SHARED_STATE_ENV = "APP_SHARED_STATE_DIR"
+LOCK_STRIPES = 64
+
+# name, size in bytes
+RATELIMIT_SEGMENT = ("ratelimit", 262_144 * 24)  # 24 byte slots, ~6MB
+REVOCATION_SEGMENT = ("revocation", 8 + 65_536 * 72)  # ring of 65k revocations, ~4.5MB
+CACHE_SEGMENT = ("cache", 8 + 16_384 * 272)  # ring of 16k invalidated cache keys, ~4.5MB
+
+
+class SharedSegment:
+    """
+        Fixed size memory mapped file shared by all workers of one server.
+        lock(region) takes a POSIX byte-range lock on `region`, so workers only wait on each
+        other when they touch the same region. Record locks are per process, a striped
+        thread lock keeps threads of one worker out of each other's way as well
+    """
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            # growing to the same size twice is harmless, no need to coordinate who creates it
+            os.ftruncate(self._fd, size)
+        self.buffer = mmap.mmap(self._fd, size)
+        self._thread_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+    @contextmanager
+    def lock(self, region: int):
+        with self._thread_locks[region % LOCK_STRIPES]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, region)
+            try:
+                yield self.buffer
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, region)
+
+    def close(self):
+        self.buffer.close()
+        os.close(self._fd)
+
+
+def shared_segment(name: str, size: int) -> Optional[SharedSegment]:
+    """The named segment when running under serve.py with shared state on, else None"""
+    directory = os.getenv(SHARED_STATE_ENV)
+    if not directory or fcntl is None:
+        return None
+    return SharedSegment(os.path.join(directory, name), size)
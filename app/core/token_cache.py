@@ -0,0 +1,69 @@
+import hashlib, threading, time
+
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class VerifiedTokenCache:
+    """
+        LRU of already verified JWT claims, keyed by a digest of the token (the raw token is never kept).
+        An entry never outlives the token's own `exp`, so a cache hit can't resurrect an expired token.
+        Revocation is NOT cached, callers still have to check it on every hit
+    """
+    def __init__(self, max_entries: int = 10_000, max_ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.max_ttl_seconds = max_ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[bytes, tuple[Dict, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: str) -> Optional[Dict]:
+        key = self._key(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return dict(entry[0])
+
+    def put(self, token: str, claims: Dict):
+        expires_at = claims.get("exp")
+        if not isinstance(expires_at, (int, float)):
+            return
+        if self.max_ttl_seconds is not None:
+            expires_at = min(expires_at, time.time() + self.max_ttl_seconds)
+
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (dict(claims), float(expires_at))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
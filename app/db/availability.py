@@ -0,0 +1,187 @@
+import asyncio, logging, math
+
+from datetime import datetime, timedelta
+from typing import AsyncContextManager, Awaitable, Callable, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import get_db_config
+from core.metrics import Counter, Gauge, registry
+from core.revocation import BloomFilter
+from models.orm.users import User
+
+logger = logging.getLogger(__name__)
+
+# rows fetched per round trip by the startup scan
+SCAN_BATCH_ROWS = 10_000
+# delta syncs look back this far past the last seen updated_at: a transaction that started earlier
+# (postgres now() = transaction start) can commit after the previous sync already ran
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+def normalize_username(username: str) -> str:
+    return username.strip()
+
+
+def normalize_email(email: str) -> str:
+    # same form EmailStr stores: domain lowercased, local part untouched
+    local, _, domain = email.strip().rpartition("@")
+    return f"{local}@{domain.lower()}" if local else email.strip()
+
+
+class AvailabilityIndex:
+    """
+        Bloom filter over every username and email in tb_users, so an availability check that
+        misses (the common case while someone types a new name) never reaches the database.
+        A hit is only "probably taken", the caller confirms it with an exact query.
+        Loaded by a streaming scan at startup, local creates / renames are added right after their
+        commit, writes from other workers come in with a delta scan on updated_at every `sync_interval`.
+        Old names stay set after a rename (a bloom filter can't delete), they only cost an exact query;
+        the filter is rebuilt once more keys went in than it was sized for.
+        Until the first load finished every check counts as a probable hit (correct, just not faster)
+    """
+    def __init__(self, session_factory: Optional[Callable[[], AsyncContextManager[AsyncSession]]] = None,
+                 capacity: int = 1_000_000, error_rate: float = 0.001, sync_interval: float = 5.0):
+        self.session_factory = session_factory
+        self.capacity = capacity  # users, each one is 2 keys
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self._bloom: Optional[BloomFilter] = None
+        self._keys = 0
+        self._key_capacity = 0
+        self._watermark: Optional[datetime] = None
+        self._loading = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._bloom is not None
+
+    def _add(self, bloom: BloomFilter, username: Optional[str], email: Optional[str]) -> int:
+        """Number of keys that were not set yet, delta scans see most rows again and must not inflate the count"""
+        added = 0
+        for key in ("u:" + normalize_username(username) if username else None,
+                    "e:" + normalize_email(email) if email else None):
+            if key is not None and key not in bloom:
+                bloom.add(key)
+                added += 1
+        return added
+
+    def add(self, username: Optional[str] = None, email: Optional[str] = None):
+        """Call after the commit that created / renamed the user"""
+        if self._bloom is not None:
+            self._keys += self._add(self._bloom, username, email)
+
+    def might_have_username(self, username: str) -> bool:
+        return self._bloom is None or "u:" + normalize_username(username) in self._bloom
+
+    def might_have_email(self, email: str) -> bool:
+        return self._bloom is None or "e:" + normalize_email(email) in self._bloom
+
+    async def is_available(self, might_have: Callable[[str], bool], exact: Callable[[str], Awaitable[bool]], value: str) -> bool:
+        """
+            `might_have` = might_have_username / might_have_email, `exact` = the matching UserRepository
+            *_taken query, only awaited on a probable hit
+        """
+        if not might_have(value):
+            availability_checks.inc(labels=("miss",))
+            return True
+        taken = await exact(value)
+        availability_checks.inc(labels=("taken" if taken else "false_positive",))
+        return not taken
+
+    async def _scan(self, bloom: BloomFilter, since: Optional[datetime] = None) -> tuple[int, Optional[datetime]]:
+        stmt = select(User.username, User.email, User.updated_at)
+        if since is not None:
+            stmt = stmt.where(User.updated_at >= since)
+        keys, watermark = 0, None
+        async with self.session_factory() as session:
+            result = await session.stream(stmt.execution_options(yield_per=SCAN_BATCH_ROWS))
+            async for username, email, updated_at in result:
+                keys += self._add(bloom, username, email)
+                if watermark is None or updated_at > watermark:
+                    watermark = updated_at
+        return keys, watermark
+
+    async def load(self) -> int:
+        """Full rebuild from the table, the old filter keeps answering until the new one is swapped in"""
+        async with self._loading:
+            async with self.session_factory() as session:
+                users = await session.scalar(select(func.count()).select_from(User))
+            key_capacity = 2 * max(self.capacity, users * 2)  # 2 keys per user, room for at least twice the table
+            bloom = BloomFilter(key_capacity, self.error_rate)
+            keys, watermark = await self._scan(bloom)
+
+            self._bloom, self._keys, self._key_capacity = bloom, keys, key_capacity
+            self._watermark = watermark
+            logger.info("availability index loaded: %d keys, %.1f KiB", keys, len(bloom.bits) / 1024)
+            return keys
+
+    async def sync(self) -> int:
+        """Add what other workers wrote since the last scan, returns the number of keys added"""
+        if self._bloom is None:
+            return await self.load()
+        if self._keys > self._key_capacity:
+            return await self.load()
+        async with self._loading:
+            since = self._watermark - SYNC_OVERLAP if self._watermark is not None else None
+            keys, watermark = await self._scan(self._bloom, since)
+            self._keys += keys
+            if watermark is not None and (self._watermark is None or watermark > self._watermark):
+                self._watermark = watermark
+            return keys
+
+    def stats(self) -> dict:
+        """Memory held and the false positive rate expected at the current fill"""
+        if self._bloom is None:
+            return {"loaded": False}
+        bloom = self._bloom
+        expected = (1 - math.exp(-bloom.hash_count * self._keys / bloom.size)) ** bloom.hash_count
+        return {
+            "loaded": True, "keys": self._keys, "capacity": self._key_capacity,
+            "bytes": len(bloom.bits), "hash_count": bloom.hash_count, "expected_fp_rate": expected
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sync()
+            except Exception:
+                logger.exception("availability index sync failed, retrying in %ss", self.sync_interval)
+            await asyncio.sleep(self.sync_interval)
+
+    def start(self):
+        if self.session_factory is None:
+            from db.session import session_manager
+            self.session_factory = session_manager.session
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+db_config = get_db_config()
+availability_index = AvailabilityIndex(
+    capacity=db_config.DATABASE_AVAILABILITY_CAPACITY,
+    error_rate=db_config.DATABASE_AVAILABILITY_ERROR_RATE,
+    sync_interval=db_config.DATABASE_AVAILABILITY_SYNC_INTERVAL
+)
+
+index_gauge = registry.register(Gauge(
+    "availability_index", "Availability bloom filter: keys set, bytes held, expected false positive rate", ("measure",),
+    callback=lambda: {
+        (name,): value for name, value in availability_index.stats().items() if name in ("keys", "bytes", "expected_fp_rate")
+    }
+))
+# probable hit that the exact query found free = false positive, observed rate = false_positive / (miss + false_positive)
+availability_checks = registry.register(Counter(
+    "availability_checks_total", "Availability lookups by outcome (miss = answered by the filter alone)", ("result",)
+))
@@ -0,0 +1,320 @@
+import asyncio, logging, struct, time
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from core.config import get_db_config
+from core.shared_state import CACHE_SEGMENT, shared_segment
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+# invalidation of every key, sent when a worker may have missed some (see SharedMemoryCacheBackend)
+ALL_KEYS = "*"
+
+
+class CacheBackend(ABC):
+    """
+        Optional second level shared by every worker + the channel used to tell
+        the other workers to drop their local copies. Values are plain column dicts,
+        a network backend (Redis, memcached, ...) is expected to serialize them itself
+    """
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float):
+        ...
+
+    @abstractmethod
+    async def delete(self, keys: Iterable[str]):
+        ...
+
+    @abstractmethod
+    async def publish_invalidation(self, keys: list[str]):
+        ...
+
+    @abstractmethod
+    def subscribe(self) -> AsyncIterator[list[str]]:
+        ...
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """Shared backend for one process, give the same instance to several RepositoryCache to act as workers"""
+    def __init__(self):
+        self._values: dict[str, tuple[Any, float]] = {}
+        self._subscribers: list[asyncio.Queue] = []
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._values.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return entry[0]
+
+    async def set(self, key: str, value: Any, ttl: float):
+        self._values[key] = (value, time.monotonic() + ttl)
+
+    async def delete(self, keys: Iterable[str]):
+        for key in keys:
+            self._values.pop(key, None)
+
+    async def publish_invalidation(self, keys: list[str]):
+        for queue in self._subscribers:
+            queue.put_nowait(keys)
+
+    async def subscribe(self) -> AsyncIterator[list[str]]:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.append(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers.remove(queue)
+
+
+class SharedMemoryCacheBackend(CacheBackend):
+    """
+        Workers on one host (serve.py) tell each other which keys to drop through a ring log in a
+        SharedSegment: a u64 count of every key ever published, then fixed size key records.
+        Values are not shared, every worker keeps its own LRU, so get / set / delete have nothing to do.
+        A subscriber polls the count every `poll_interval`, the window in which another worker can still
+        answer from a dropped entry. One that fell more than `capacity` keys behind drops everything
+    """
+    HEADER = struct.Struct("<Q")
+    RECORD = struct.Struct("<H270s")  # length + key, "user:email:" + the longest email fits
+
+    def __init__(self, segment, poll_interval: float = 0.05):
+        self.segment = segment
+        self.poll_interval = poll_interval
+        self.capacity = (segment.size - self.HEADER.size) // self.RECORD.size
+
+    def _offset(self, index: int) -> int:
+        return self.HEADER.size + (index % self.capacity) * self.RECORD.size
+
+    async def get(self, key: str) -> Optional[Any]:
+        return None
+
+    async def set(self, key: str, value: Any, ttl: float):
+        pass
+
+    async def delete(self, keys: Iterable[str]):
+        pass
+
+    async def publish_invalidation(self, keys: list[str]):
+        encoded = [key.encode() for key in keys]
+        if any(len(key) > self.RECORD.size - 2 for key in encoded):
+            encoded = [ALL_KEYS.encode()]
+        with self.segment.lock(0) as buffer:
+            count, = self.HEADER.unpack_from(buffer, 0)
+            for key in encoded:
+                self.RECORD.pack_into(buffer, self._offset(count), len(key), key)
+                count += 1
+            self.HEADER.pack_into(buffer, 0, count)
+
+    def count(self) -> int:
+        with self.segment.lock(0) as buffer:
+            return self.HEADER.unpack_from(buffer, 0)[0]
+
+    def fetch_since(self, cursor: int) -> tuple[list[str], int]:
+        with self.segment.lock(0) as buffer:
+            count, = self.HEADER.unpack_from(buffer, 0)
+            if count - cursor > self.capacity:
+                return [ALL_KEYS], count
+            records = [self.RECORD.unpack_from(buffer, self._offset(index)) for index in range(cursor, count)]
+        return [key[:length].decode() for length, key in records], count
+
+    async def subscribe(self) -> AsyncIterator[list[str]]:
+        # the local cache starts empty, what was published before has nothing to drop
+        cursor = self.count()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            keys, cursor = self.fetch_since(cursor)
+            if keys:
+                yield keys
+
+
+class RepositoryCache:
+    """
+        Read-through cache in front of the repositories: local LRU with TTL, then the
+        optional shared backend, then the loader (the actual query).
+        Concurrent misses on the same key share one load (single flight).
+        A load that an invalidation of its key overtook is returned to its callers but not stored:
+        it may have read the row before the write that invalidated it committed
+    """
+    def __init__(self, max_entries: int = 10_000, ttl_seconds: float = 60.0, backend: Optional[CacheBackend] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple[Any, float]]" = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._listener: Optional[asyncio.Task] = None
+        # generation = number of invalidations so far; key -> generation of its last drop,
+        # only kept while loads are running (a load compares it with the generation it started at)
+        self.generation = 0
+        self._dropped: dict[str, int] = {}
+        self._dropped_all = -1
+        self._loads = 0
+
+    def _get_local(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        if entry[1] <= time.monotonic():
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def _set_local(self, key: str, value: Any):
+        self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def dropped_since(self, key: str, generation: int) -> bool:
+        return max(self._dropped.get(key, -1), self._dropped_all) > generation
+
+    async def set(self, key: str, value: Any, since: Optional[int] = None):
+        """`since` = the generation read before loading `value`, nothing is stored when `key` was dropped after it"""
+        if since is not None and self.dropped_since(key, since):
+            return
+        self._set_local(key, value)
+        if self.backend is not None:
+            await self.backend.set(key, value, self.ttl_seconds)
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = self._get_local(key)
+        if value is not _MISSING:
+            return value
+        if self.backend is not None:
+            value = await self.backend.get(key)
+            if value is not None:
+                self._set_local(key, value)
+                return value
+        return None
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Optional[Any]]], store: bool = True) -> Optional[Any]:
+        """`store=False` (a replica read, it may be older than the last invalidation) only reads the cache"""
+        value = await self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        if not store:
+            return await loader()
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        since = self.generation
+        self._loads += 1
+        try:
+            value = await loader()
+            if value is not None:
+                await self.set(key, value, since)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            # nobody may be waiting, don't let asyncio complain about it
+            future.exception()
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            self._loads -= 1
+            if not self._loads:
+                self._dropped.clear()
+                self._dropped_all = -1
+
+    def discard_local(self, keys: Iterable[str]):
+        keys = list(keys)
+        self.generation += 1
+        if ALL_KEYS in keys:
+            self._entries.clear()
+            self._inflight.clear()
+            if self._loads:
+                self._dropped_all = self.generation
+            return
+        for key in keys:
+            self._entries.pop(key, None)
+            # callers from now on start a new load instead of joining one that may be stale
+            self._inflight.pop(key, None)
+            if self._loads:
+                self._dropped[key] = self.generation
+
+    async def invalidate(self, *keys: str):
+        """Drop keys here, in the shared backend and (through the backend) in every other worker"""
+        keys = [key for key in keys if key]
+        self.discard_local(keys)
+        if self.backend is not None and keys:
+            await self.backend.delete(keys)
+            await self.backend.publish_invalidation(keys)
+
+    async def _listen(self):
+        while True:
+            try:
+                async for keys in self.backend.subscribe():
+                    self.discard_local(keys)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("cache invalidation listener failed, resubscribing")
+                await asyncio.sleep(1)
+
+    def start(self):
+        if self.backend is not None and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+# column snapshot <-> ORM instance, only plain column values are cached (never relationships)
+def snapshot(instance, exclude: Iterable[str] = ()) -> dict:
+    """`exclude` = column keys that must not be cached, they stay unloaded on the attached instance"""
+    return {
+        attr.key: getattr(instance, attr.key) for attr in inspect(type(instance)).column_attrs
+        if attr.key not in exclude
+    }
+
+
+async def attach(session: AsyncSession, model, data: dict):
+    """
+        Turn a cached snapshot back into a persistent instance of `session` without a query.
+        Columns the snapshot left out are unloaded, touching one would lazy load (an error under
+        AsyncSession): read them with their own statement
+    """
+    instance = model(**data)
+    make_transient_to_detached(instance)
+    return await session.merge(instance, load=False)
+
+
+db_config = get_db_config()
+_cache_segment = shared_segment(*CACHE_SEGMENT)
+# shared by every repository of this worker, invalidations reach the other workers under serve.py
+repository_cache = RepositoryCache(
+    max_entries=db_config.DATABASE_CACHE_SIZE,
+    ttl_seconds=db_config.DATABASE_CACHE_TTL,
+    backend=SharedMemoryCacheBackend(_cache_segment, db_config.DATABASE_CACHE_SYNC_INTERVAL) if _cache_segment else None
+)
@@ -0,0 +1,123 @@
+import logging, re, time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from core.metrics import Counter, Gauge, Histogram, registry
+
+logger = logging.getLogger("db.slow_query")
+
+# Budget: the execute hooks + histogram observe must stay under ~10us per statement
+# (checked by benchmarks/bench_db_instrumentation.py), so statements are normalized
+# once and the result is memoized by the raw SQL string
+MAX_STATEMENT_LABELS = 500
+
+_pools: dict[str, "InstrumentedAsyncAdaptedQueuePool"] = {}
+
+
+def _pool_stats() -> dict:
+    return {(name, "in_use"): pool.checkedout() for name, pool in _pools.items()} | \
+           {(name, "overflow"): max(pool.overflow(), 0) for name, pool in _pools.items()} | \
+           {(name, "idle"): pool.checkedin() for name, pool in _pools.items()}
+
+
+checkout_wait = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ("pool",),
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+))
+checkout_timeouts = registry.register(Counter(
+    "db_pool_checkout_timeouts_total", "Checkouts that failed (pool exhausted / timeout)", ("pool",)
+))
+pool_connections = registry.register(Gauge(
+    "db_pool_connections", "Pooled connections by state", ("pool", "state"), callback=_pool_stats
+))
+statement_latency = registry.register(Histogram(
+    "db_statement_duration_seconds", "Statement execution time by normalized SQL", ("statement",)
+))
+slow_statements = registry.register(Counter(
+    "db_slow_statements_total", "Statements slower than the slow query threshold", ("statement",)
+))
+
+
+class InstrumentedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """QueuePool that times how long a checkout waited (there is no pool event before a checkout)"""
+    pool_name = "primary"
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.pool_name = self.pool_name
+        _pools[self.pool_name] = pool
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            checkout_timeouts.inc(labels=(self.pool_name,))
+            raise
+        checkout_wait.observe(time.perf_counter() - started, (self.pool_name,))
+        return connection
+
+
+_BIND_LIST = re.compile(r"(\$\d+|\?|%s|%\(\w+\)s|:\w+)(\s*,\s*(\$\d+|\?|%s|%\(\w+\)s|:\w+))+")
+_NUMBER = re.compile(r"\b\d+\b")
+_SPACES = re.compile(r"\s+")
+_normalized: dict[str, str] = {}
+
+
+def normalize_statement(statement: str) -> str:
+    """Label for a statement: one line, expanded IN lists collapsed, bind markers / numbers unified"""
+    label = _normalized.get(statement)
+    if label is None:
+        if len(_normalized) >= MAX_STATEMENT_LABELS:
+            return "other"
+        label = _SPACES.sub(" ", statement).strip()
+        label = _BIND_LIST.sub("?, ...", label)
+        label = _NUMBER.sub("?", label)[:200]
+        _normalized[statement] = label
+    return label
+
+
+def instrument_engine(engine: Engine, name: str = "primary", slow_query_ms: float = 500):
+    """Attach the cursor hooks to a (sync) engine, for an AsyncEngine pass `engine.sync_engine`"""
+    slow_query_seconds = slow_query_ms / 1000
+    if isinstance(engine.pool, InstrumentedAsyncAdaptedQueuePool):
+        engine.pool.pool_name = name
+        _pools[name] = engine.pool
+
+    # dialect level hooks wrap exactly the DBAPI call and cost one dispatch each, a pair of
+    # before/after_cursor_execute listeners puts the Connection on its slower evented path (~15us
+    # per statement on a small runner, more than the whole budget). Returning True tells SQLAlchemy
+    # the statement was executed, the dialect's own do_execute* still does it
+    dialect = engine.dialect
+
+    def observe(statement: str, started: float):
+        elapsed = time.perf_counter() - started
+        label = normalize_statement(statement)
+        statement_latency.observe(elapsed, (label,))
+        if elapsed >= slow_query_seconds:
+            slow_statements.inc(labels=(label,))
+            logger.warning("slow query %.1fms: %s", elapsed * 1000, label)
+
+    @event.listens_for(engine, "do_execute")
+    def do_execute(cursor, statement, parameters, context):
+        started = time.perf_counter()
+        dialect.do_execute(cursor, statement, parameters, context)
+        observe(statement, started)
+        return True
+
+    @event.listens_for(engine, "do_executemany")
+    def do_executemany(cursor, statement, parameters, context):
+        started = time.perf_counter()
+        dialect.do_executemany(cursor, statement, parameters, context)
+        observe(statement, started)
+        return True
+
+    @event.listens_for(engine, "do_execute_no_params")
+    def do_execute_no_params(cursor, statement, context):
+        started = time.perf_counter()
+        dialect.do_execute_no_params(cursor, statement, context)
+        observe(statement, started)
+        return True
@@ -0,0 +1,24 @@
+"""composite index for keyset pagination of users
+
+Revision ID: 0001_users_created_at_index
+Revises:
+"""
+from alembic import op
+
+revision = "0001_users_created_at_index"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_tb_users_created_at_user_id",
+        "tb_users",
+        ["created_at", "user_id"],
+        schema="auth"
+    )
+
+
+def downgrade():
+    op.drop_index("ix_tb_users_created_at_user_id", table_name="tb_users", schema="auth")
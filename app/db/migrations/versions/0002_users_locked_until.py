@@ -0,0 +1,25 @@
+"""login lockout deadline on users
+
+Revision ID: 0002_users_locked_until
+Revises: 0001_users_created_at_index
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+revision = "0002_users_locked_until"
+down_revision = "0001_users_created_at_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "tb_users",
+        sa.Column("locked_until", sa.DateTime(), nullable=True, comment="Login refused until then, set when failed_attempts reaches the limit"),
+        schema="auth"
+    )
+
+
+def downgrade():
+    op.drop_column("tb_users", "locked_until", schema="auth")
@@ -0,0 +1,21 @@
+"""server default for users.modified_at
+
+Revision ID: 0003_users_modified_at_default
+Revises: 0002_users_locked_until
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+revision = "0003_users_modified_at_default"
+down_revision = "0002_users_locked_until"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.alter_column("tb_users", "modified_at", server_default=sa.func.now(), schema="auth")
+
+
+def downgrade():
+    op.alter_column("tb_users", "modified_at", server_default=None, schema="auth")
@@ -0,0 +1,24 @@
+"""index on users.updated_at for the availability index's incremental scans
+
+Revision ID: 0004_users_updated_at_index
+Revises: 0003_users_modified_at_default
+"""
+from alembic import op
+
+revision = "0004_users_updated_at_index"
+down_revision = "0003_users_modified_at_default"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_tb_users_updated_at",
+        "tb_users",
+        ["updated_at"],
+        schema="auth"
+    )
+
+
+def downgrade():
+    op.drop_index("ix_tb_users_updated_at", table_name="tb_users", schema="auth")
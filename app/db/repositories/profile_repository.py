@@ -1,31 +1,126 @@
-from typing import Optional
+from typing import Iterable, Optional
 from uuid import UUID
 
-from sqlalchemy import select
+from sqlalchemy import JSON, Text, bindparam, func, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.orm.users import UserProfile
+from db.cache import RepositoryCache, repository_cache, snapshot, attach
+from db.session import on_replica
+from models.orm.users import UserProfile
+
+
+# built once, see USER_BY_ID in user_repository.py
+PROFILE_BY_USER_ID = select(UserProfile).where(UserProfile.user_id == bindparam("user_id"))
+
+
+# postgres caps one statement at 32767 bind parameters, batches are cut to fit
+MAX_BIND_PARAMS = 32_767
+
+
+def profile_key(user_id: UUID) -> str:
+    return f"profile:{user_id}"
+
+
+def _columns(profile_data: dict) -> dict:
+    """attribute names (metadata_) -> table column keys (metadata)"""
+    attrs = UserProfile.__mapper__.column_attrs
+    return {attrs[key].columns[0].key: value for key, value in profile_data.items()}
+
 
 class ProfileRepository:
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, cache: Optional[RepositoryCache] = None):
         self.session = session
+        self.cache = cache or repository_cache
+        # see UserRepository.store
+        self.store = not on_replica(session)
+
+    async def _load(self, user_id: UUID) -> Optional[dict]:
+        result = await self.session.execute(PROFILE_BY_USER_ID, {"user_id": user_id})
+        profile = result.scalars().first()
+        return snapshot(profile) if profile is not None else None
 
     async def get_by_user_id(self, user_id: UUID) -> Optional[UserProfile]:
-        result = await self.session.execute(
-            select(UserProfile).where(UserProfile.user_id == user_id)
+        data = await self.cache.get_or_load(profile_key(user_id), lambda: self._load(user_id), self.store)
+        return await attach(self.session, UserProfile, data) if data is not None else None
+    
+    def _upsert(self, rows: list[dict]):
+        """INSERT ... ON CONFLICT (user_id) DO UPDATE SET <every given column> = excluded.<column>"""
+        dialect_insert = postgresql.insert if self.session.bind.dialect.name == "postgresql" else sqlite.insert
+        stmt = dialect_insert(UserProfile).values(rows)
+        updated = [key for key in rows[0] if key != "user_id"]
+        return stmt.on_conflict_do_update(
+            index_elements=[UserProfile.user_id],
+            set_={key: stmt.excluded[key] for key in updated}
         )
 
-        return result.scalars().first()
-    
     async def create_or_update(self, user_id: UUID, profile_data: dict) -> Optional[UserProfile]:
-        profile = await self.get_by_user_id(user_id=user_id)
-        if profile:
-            for key, value in profile_data.items():
-                setattr(profile, key, value)
+        """One round trip upsert, no read first and no window between the read and the write"""
+        if not profile_data:
+            return await self.get_by_user_id(user_id)
 
+        stmt = self._upsert([{"user_id": user_id, **_columns(profile_data)}])
+        result = await self.session.execute(
+            stmt.returning(UserProfile),
+            execution_options={"populate_existing": True}
+        )
+        profile = result.scalars().one()
+
+        await self.session.commit()
+        await self.cache.invalidate(profile_key(user_id))
+        return profile
+
+    async def upsert_many(self, profiles: list[dict]) -> int:
+        """
+            Batch create_or_update, rows are (attribute name -> value) dicts with the same keys,
+            one statement per MAX_BIND_PARAMS worth of values. Returns how many rows were written.
+            A user_id given more than once is written once with its last row: postgres refuses an
+            ON CONFLICT DO UPDATE that hits the same row twice in one statement
+        """
+        if not profiles:
+            return 0
+
+        rows = list({row["user_id"]: row for row in map(_columns, profiles)}.values())
+        per_statement = max(1, MAX_BIND_PARAMS // len(rows[0]))
+        written = []
+        for start in range(0, len(rows), per_statement):
+            result = await self.session.execute(
+                self._upsert(rows[start:start + per_statement]).returning(UserProfile.user_id)
+            )
+            written.extend(result.scalars().all())
+
+        await self.session.commit()
+        await self.cache.invalidate(*(profile_key(user_id) for user_id in written))
+        return len(written)
+
+    async def merge_metadata(self, user_id: UUID, patch: dict, remove: Iterable[str] = ()) -> Optional[dict]:
+        """
+            metadata = (metadata || :patch) - :remove, computed by the database in one UPDATE ... RETURNING,
+            concurrent patches touching different keys don't overwrite each other.
+            Returns the new document, None when the user has no profile
+        """
+        remove = list(remove)
+        current = UserProfile.metadata_
+        if self.session.bind.dialect.name == "postgresql":
+            merged = func.coalesce(current, literal({}, postgresql.JSONB)).op("||", return_type=postgresql.JSONB)(
+                literal(patch, postgresql.JSONB)
+            )
+            if remove:
+                merged = merged.op("-", return_type=postgresql.JSONB)(literal(remove, postgresql.ARRAY(Text)))
         else:
-            profile = UserProfile(user_id=user_id, **profile_data)
-            self.session.add(profile)
+            # sqlite stand-in, json_patch is a (recursive) merge patch, close enough for tests
+            merged = func.json_patch(func.coalesce(current, "{}"), literal(patch, JSON), type_=JSON)
+            if remove:
+                merged = func.json_remove(merged, *(f'$."{key}"' for key in remove), type_=JSON)
+
+        result = await self.session.execute(
+            update(UserProfile)
+            .where(UserProfile.user_id == user_id)
+            .values({UserProfile.metadata_: merged})
+            .returning(UserProfile.metadata_)
+        )
+        document = result.scalar_one_or_none()
 
         await self.session.commit()
-        return profile
\ No newline at end of file
+        await self.cache.invalidate(profile_key(user_id))
+        return document
@@ -1,30 +1,220 @@
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Iterable, Literal, NamedTuple, Optional
 from uuid import UUID
 
-from sqlalchemy import select, update
+from sqlalchemy import Text, bindparam, case, func, inspect, or_, select, type_coerce, update, insert, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+
+from core.exceptions import AppException
+from db.availability import availability_index
+from db.cache import RepositoryCache, repository_cache, snapshot, attach
+from db.session import on_replica
+from models.orm.users import User, UserProfile, UserRole
+from models.schemas.user import UserCreate, UserPublic, UserUpdate
+
+
+# Login / counter bookkeeping doesn't change what clients see, keeping updated_at (the ETag version,
+# core/conditional.py) as it is stops its onupdate from invalidating every ETag after a login
+KEEP_VERSION = {User.updated_at: User.updated_at}
+
+# Hot queries built once, SQLAlchemy memoizes their cache key so every call
+# goes straight to the compiled-statement cache (no construct + cache key per call)
+USER_BY_ID = select(User).where(User.user_id == bindparam("user_id"))
+USER_BY_EMAIL = select(User).where(User.email == bindparam("email"))
+USER_VERSION = select(User.updated_at).where(User.user_id == bindparam("user_id"))
+USER_PASSWORD_HASH = select(User.hashed_password).where(User.user_id == bindparam("user_id"))
+
+# kept out of every cache level (a shared backend, a dump of the process): credentials and the
+# lockout state are only read by the statements that decide on them (begin_login, password_hash)
+UNCACHED_COLUMNS = frozenset(("hashed_password", "failed_attempts", "locked_until"))
+USERNAME_TAKEN = select(User.user_id).where(User.username == bindparam("username")).limit(1)
+EMAIL_TAKEN = select(User.user_id).where(User.email == bindparam("email")).limit(1)
+
+
+PROFILE_LOADERS = {"selectin": selectinload, "joined": joinedload}
+ProfileStrategy = Literal["selectin", "joined"]
+
+_projections: dict[tuple, tuple] = {}
+
+
+def projection(schema: Any, model: Any) -> tuple:
+    """
+        The mapped columns of `model` a pydantic `schema` reads (matched by field name) + the primary key,
+        `None` = every column. Cached per (schema, model)
+    """
+    columns = _projections.get((schema, model))
+    if columns is None:
+        mapper = inspect(model)
+        fields = None if schema is None else set(schema.model_fields)
+        columns = _projections[(schema, model)] = tuple(
+            getattr(model, attr.key) for attr in mapper.column_attrs
+            if fields is None or attr.key in fields or attr.columns[0].primary_key
+        )
+    return columns
+
+
+def _sqlite_texts(version: datetime) -> tuple[str, ...]:
+    exact = version.strftime("%Y-%m-%d %H:%M:%S.%f")
+    return (version.strftime("%Y-%m-%d %H:%M:%S"), exact) if not version.microsecond else (exact,)
+
+
+class LoginAttempt(NamedTuple):
+    user_id: UUID
+    hashed_password: str
+    failed_attempts: int  # counting the attempt in progress
+
+
+def user_id_key(user_id: UUID) -> str:
+    return f"user:id:{user_id}"
+
+def user_email_key(email: str) -> str:
+    # points to the user_id, the row itself only lives under user_id_key
+    return f"user:email:{email}"
 
-from app.models.orm.users import User
-from app.models.schemas.user import UserCreate, UserUpdate
 
 class UserRepository:
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, cache: Optional[RepositoryCache] = None):
         self.session = session
+        self.cache = cache or repository_cache
+        # a replica may not have replayed the write behind an invalidation yet, its rows never fill the cache
+        self.store = not on_replica(session)
 
-    async def get_by_id(self, user_id: UUID) -> Optional[User]:
-        result = await self.session.execute(
-            select(User).where(User.user_id == user_id)
-        )
+    async def _load_one(self, statement, params: dict) -> Optional[dict]:
+        # populate_existing: an instance already in this session (e.g. before an UPDATE) gets the fresh row
+        result = await self.session.execute(statement, params, execution_options={"populate_existing": True})
+        user = result.scalars().first()
+        return snapshot(user, UNCACHED_COLUMNS) if user is not None else None
 
-        return result.scalars().first()
+    async def get_by_id(self, user_id: UUID) -> Optional[User]:
+        data = await self.cache.get_or_load(user_id_key(user_id), lambda: self._load_one(USER_BY_ID, {"user_id": user_id}),
+                                           self.store)
+        return await attach(self.session, User, data) if data is not None else None
     
+    async def get_version(self, user_id: UUID) -> Optional[datetime]:
+        """Only the row version (updated_at), enough to answer an If-None-Match without loading the row"""
+        result = await self.session.execute(USER_VERSION, {"user_id": user_id})
+        return result.scalar_one_or_none()
+
+    async def password_hash(self, user_id: UUID) -> Optional[str]:
+        """Always from the database, instances from get_by_id / get_by_mail don't carry it"""
+        return await self.session.scalar(USER_PASSWORD_HASH, {"user_id": user_id})
+
     async def get_by_mail(self, email: str) -> Optional[User]:
+        async def load_user_id():
+            since = self.cache.generation
+            data = await self._load_one(USER_BY_EMAIL, {"email": email})
+            if data is None:
+                return None
+            if self.store:
+                await self.cache.set(user_id_key(data["user_id"]), data, since)
+            return data["user_id"]
+
+        user_id = await self.cache.get_or_load(user_email_key(email), load_user_id, self.store)
+        if user_id is None:
+            return None
+
+        user = await self.get_by_id(user_id)
+        if user is None or user.email != email:
+            # stale pointer (email changed on another worker), go to the DB once
+            await self.cache.invalidate(user_email_key(email))
+            data = await self._load_one(USER_BY_EMAIL, {"email": email})
+            return await attach(self.session, User, data) if data is not None else None
+        return user
+    
+    async def get_with_profile(self, user_id: UUID, strategy: ProfileStrategy = "selectin") -> Optional[User]:
+        """
+            ORM User with `profile` already loaded, so touching it never lazy loads (which under
+            AsyncSession is an implicit IO error). selectin = 2 small queries, joined = 1 LEFT JOIN
+        """
         result = await self.session.execute(
-            select(User).where(User.email == email)
+            select(User).where(User.user_id == user_id).options(PROFILE_LOADERS[strategy](User.profile))
         )
+        return result.scalars().unique().first()
+
+    async def read(self, user_ids: Iterable[UUID], schema: Any = UserPublic,
+                   profile: Optional[ProfileStrategy] = None, profile_schema: Any = None,
+                   extra: tuple = ()) -> list[dict]:
+        """
+            Read only path: only the columns `schema` needs (never hashed_password for UserPublic),
+            returned as plain dicts, nothing goes into the identity map.
+            `profile` adds a "profile" dict (None when missing) with the columns of `profile_schema`
+            (all by default): "joined" in the same query, "selectin" with one extra IN query.
+            `extra` = more User attributes to load on top of the schema's (e.g. User.updated_at for an ETag)
+        """
+        user_ids = list(user_ids)
+        if not user_ids:
+            return []
+
+        user_columns = projection(schema, User) + tuple(extra)
+        profile_columns = projection(profile_schema, UserProfile) if profile else ()
+        stmt = select(*(column.label(column.key) for column in user_columns)).where(User.user_id.in_(user_ids))
+        if profile == "joined":
+            stmt = stmt.add_columns(
+                *(column.label(f"profile__{column.key}") for column in profile_columns)
+            ).outerjoin(UserProfile, UserProfile.user_id == User.user_id)
+
+        result = await self.session.execute(stmt)
+        if profile != "joined":
+            rows = [dict(row) for row in result.mappings()]
+        else:
+            rows = []
+            for row in result.mappings():
+                user = {column.key: row[column.key] for column in user_columns}
+                user["profile"] = {column.key: row[f"profile__{column.key}"] for column in profile_columns} \
+                    if row["profile__user_id"] is not None else None
+                rows.append(user)
+
+        if profile == "selectin" and rows:
+            result = await self.session.execute(
+                select(*(column.label(column.key) for column in profile_columns))
+                .where(UserProfile.user_id.in_([row["user_id"] for row in rows]))
+            )
+            profiles = {row["user_id"]: dict(row) for row in result.mappings()}
+            for row in rows:
+                row["profile"] = profiles.get(row["user_id"])
+        return rows
+
+    async def read_one(self, user_id: UUID, schema: Any = UserPublic,
+                       profile: Optional[ProfileStrategy] = None, profile_schema: Any = None,
+                       extra: tuple = ()) -> Optional[dict]:
+        if profile is None:
+            # a cached snapshot has every column but UNCACHED_COLUMNS, project it instead of querying
+            cached = await self.cache.get(user_id_key(user_id))
+            columns = projection(schema, User) + tuple(extra)
+            if cached is not None and all(column.key in cached for column in columns):
+                return {column.key: cached[column.key] for column in columns}
+        rows = await self.read([user_id], schema, profile, profile_schema, extra)
+        return rows[0] if rows else None
+
+    async def username_taken(self, username: str) -> bool:
+        return await self.session.scalar(USERNAME_TAKEN, {"username": username}) is not None
+
+    async def email_taken(self, email: str) -> bool:
+        return await self.session.scalar(EMAIL_TAKEN, {"email": email}) is not None
+
+    async def stream_page(self, limit: int, after: Optional[tuple[datetime, UUID]] = None,
+                          role: Optional[UserRole] = None, is_active: Optional[bool] = None) -> AsyncIterator:
+        """
+            Keyset (seek) page ordered by (created_at, user_id) newest first,
+            rows are yielded as the driver fetches them instead of as one list
+        """
+        stmt = select(
+            User.user_id, User.email, User.username, User.role, User.is_active, User.created_at
+        ).order_by(User.created_at.desc(), User.user_id.desc()).limit(limit)
+
+        if after is not None:
+            stmt = stmt.where(tuple_(User.created_at, User.user_id) < tuple_(*after))
+        if role is not None:
+            stmt = stmt.where(User.role == role)
+        if is_active is not None:
+            stmt = stmt.where(User.is_active == is_active)
+
+        result = await self.session.stream(stmt)
+        async for row in result:
+            yield row
 
-        return result.scalars().first()
-    
     async def create(self, user_data: UserCreate, hashed_password: str) -> User:
         user = User(
             email=user_data.email,
@@ -35,14 +225,132 @@ class UserRepository:
 
         self.session.add(user)
         await self.session.commit()
+        await self.cache.invalidate(user_email_key(user.email))
+        availability_index.add(user.username, user.email)
         return user
     
-    async def update(self, user_id: UUID, update_data = UserUpdate) -> Optional[User]:
-        await self.session.execute(
+    async def create_many(self, users: list[dict], profiles: list[dict]) -> set[UUID]:
+        """
+            Multi-row insert of users + their profiles in one transaction.
+            Rows colliding with an existing username/email are skipped,
+            returns the user_ids that were actually inserted
+        """
+        if not users:
+            return set()
+
+        dialect = self.session.bind.dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+            stmt = dialect_insert(User).values(users).on_conflict_do_nothing()
+        else:
+            stmt = insert(User).values(users)
+
+        result = await self.session.execute(stmt.returning(User.user_id))
+        inserted = set(result.scalars().all())
+
+        profiles = [profile for profile in profiles if profile["user_id"] in inserted]
+        if profiles:
+            await self.session.execute(insert(UserProfile).values(profiles))
+
+        await self.session.commit()
+        await self.cache.invalidate(*(user_email_key(user["email"]) for user in users if user["user_id"] in inserted))
+        for user in users:
+            if user["user_id"] in inserted:
+                availability_index.add(user["username"], user["email"])
+        return inserted
+
+    async def begin_login(self, login: str, max_attempts: int, lockout: timedelta,
+                          now: Optional[datetime] = None) -> Optional[LoginAttempt]:
+        """
+            First half of a login, one UPDATE ... RETURNING that counts the attempt as failed up front
+            (a lockout that ran out starts the count over), locks the account when the count reaches
+            `max_attempts` and hands back the hash to verify. Concurrent attempts can't lose an increment
+            nor slip past the limit. None = unknown login, inactive or locked account.
+            Commits, so no connection is held while the caller runs argon2
+        """
+        now = now or datetime.now()
+        attempts = case((User.locked_until <= now, 1), else_=User.failed_attempts + 1)
+        result = await self.session.execute(
             update(User)
-            .where(User.user_id == user_id)
-            .values(**update_data.model_dump(exclude_unset=True))
+            .where(
+                or_(User.email == login, User.username == login),
+                User.is_active.is_(True),
+                or_(User.locked_until.is_(None), User.locked_until <= now)
+            )
+            .values({
+                User.failed_attempts: attempts,
+                User.locked_until: case((attempts >= max_attempts, now + lockout), else_=None),
+                **KEEP_VERSION
+            })
+            .returning(User.user_id, User.hashed_password, User.failed_attempts)
+            .execution_options(synchronize_session=False)
+        )
+        row = result.first()
+        await self.session.commit()
+        return LoginAttempt(*row) if row is not None else None
+
+    async def finish_login(self, user_id: UUID, new_hash: Optional[str] = None):
+        """
+            Second half, only once the password verified: reset the count, store a rehash.
+            last_login goes through the write-behind buffer (db/write_behind.py), the caller stamps it
+        """
+        values = {User.failed_attempts: 0, User.locked_until: None, **KEEP_VERSION}
+        if new_hash is not None:
+            values[User.hashed_password] = new_hash
+
+        await self.session.execute(
+            update(User).where(User.user_id == user_id).values(values)
+            .execution_options(synchronize_session=False)
         )
+        await self.session.commit()
+        # nothing to invalidate: none of these columns is cached (UNCACHED_COLUMNS) and the version stays
+
+    @staticmethod
+    def _new_version(sqlite: bool):
+        # the sqlite stand-in's CURRENT_TIMESTAMP has whole seconds, two writes within one second would
+        # share a version (and an ETag): stamp UTC with microseconds from here instead
+        return datetime.now(timezone.utc).replace(tzinfo=None) if sqlite else func.now()
+
+    async def update(self, user_id: UUID, update_data = UserUpdate, if_match: Optional[list[datetime]] = None,
+                     hashed_password: Optional[str] = None) -> Optional[User]:
+        """
+            `if_match` = the versions (updated_at) the client last saw, the UPDATE only applies when the
+            row is still at one of them (compare-and-swap in the WHERE), otherwise PreconditionFailed
+        """
+        values = {
+            key: value for key, value in update_data.model_dump(exclude_unset=True, exclude={"current_password", "new_password"}).items()
+            if value is not None
+        }
+        if hashed_password is not None:
+            values["hashed_password"] = hashed_password
+        previous = await self.cache.get(user_id_key(user_id))
+
+        sqlite = self.session.bind.dialect.name == "sqlite"
+        stmt = update(User).where(User.user_id == user_id)
+        if if_match is not None:
+            if not if_match:
+                raise AppException.PreconditionFailed()
+            if sqlite:
+                # the stored text is exact, a server default has no fraction and a bound datetime always
+                # renders one: accept both spellings of each version, nothing coarser
+                stmt = stmt.where(type_coerce(User.updated_at, Text).in_(
+                    [text for version in if_match for text in _sqlite_texts(version)]
+                ))
+            else:
+                stmt = stmt.where(User.updated_at.in_(if_match))
+        # nothing to change still bumps the version, the client asked for a write
+        values = {**values, "updated_at": self._new_version(sqlite)}
+        stmt = stmt.values(**values)
+        result = await self.session.execute(stmt.returning(User.user_id))
+        if result.first() is None and if_match is not None:
+            await self.session.rollback()
+            raise AppException.PreconditionFailed()
 
         await self.session.commit()
-        return await self.get_by_id(user_id)
\ No newline at end of file
+        await self.cache.invalidate(
+            user_id_key(user_id),
+            user_email_key(previous["email"]) if previous else None,
+            user_email_key(values["email"]) if values.get("email") else None
+        )
+        availability_index.add(values.get("username"), values.get("email"))
+        return await self.get_by_id(user_id)
@@ -1,39 +1,98 @@
+import asyncio, hashlib, logging, time, uuid
+
+from collections import OrderedDict
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Iterable, Optional
 
+from fastapi import Request
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import (
-    AsyncSession, create_async_engine, 
+    AsyncEngine, AsyncSession, create_async_engine,
     async_sessionmaker
 )
-from sqlalchemy.orm import declarative_base
-from sqlalchemy.pool import QueuePool
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from core.config import PostgresqlConfiguration, get_db_config
+from db.instrumentation import InstrumentedAsyncAdaptedQueuePool, instrument_engine
+from models.orm.base import Base
+
+logger = logging.getLogger(__name__)
 
-from core.config import PostgresqlConfiguration
 
-# DB Configuration
-Base = declarative_base()
+class ReplicaState:
+    """One read replica: its engine, how many sessions are open on it and whether it can be used"""
+    def __init__(self, url: str, engine: AsyncEngine):
+        self.url = url
+        self.engine = engine
+        self.sessionmaker = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, class_=AsyncSession)
+        self.outstanding = 0
+        self.healthy = True
+        self.lag_seconds = 0.0
+
 
 class DatabaseSessionManager:
-    def __init__(self):
+    def __init__(self, config: Optional[PostgresqlConfiguration] = None):
+        self.config = config
         self._engine = None
         self._sessionmanager = None
+        self.replicas: list[ReplicaState] = []
+        # client key -> until when its reads must stay on the primary (read-your-writes)
+        self._sticky: "OrderedDict[str, float]" = OrderedDict()
+        self._monitor: Optional[asyncio.Task] = None
+
+    def _create_engine(self, db_url: str, name: str = "primary") -> AsyncEngine:
+        url = make_url(db_url)
+        instrumented = self.config.DATABASE_INSTRUMENTATION
+        if url.get_backend_name() == "sqlite":
+            # local stand-in (tests/benchmarks), sqlite has no schemas
+            engine = create_async_engine(
+                db_url,
+                echo=self.config.DATABASE_ECHO,
+                execution_options={"schema_translate_map": {"auth": None}}
+            )
+        else:
+            engine = self._create_pg_engine(db_url, InstrumentedAsyncAdaptedQueuePool if instrumented else AsyncAdaptedQueuePool)
+
+        if instrumented:
+            instrument_engine(engine.sync_engine, name=name, slow_query_ms=self.config.DATABASE_SLOW_QUERY_MS)
+        return engine
 
-    def init(self, db_url: str):
-        self._engine = create_async_engine(
-            db_url,
-            poolclass=QueuePool,
-            pool_size=PostgresqlConfiguration.DATABASE_POOL_SIZE, # typically 0-30,
-            max_overflow=PostgresqlConfiguration.DATABASE_MAX_OVERFLOW,
+    def _create_pg_engine(self, db_url: str, poolclass) -> AsyncEngine:
+        url = make_url(db_url)
+        connect_args = {
+            "timeout": self.config.DATABASE_TIMEOUT,
+            "server_settings": {
+                "application_name": "app"
+            }
+        }
+
+        if url.get_driver_name() == "asyncpg":
+            if self.config.DATABASE_PGBOUNCER:
+                connect_args["statement_cache_size"] = 0
+                connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+                statement_cache_size = 0
+            else:
+                connect_args["statement_cache_size"] = self.config.DATABASE_STATEMENT_CACHE_SIZE
+                connect_args["max_cached_statement_lifetime"] = self.config.DATABASE_STATEMENT_CACHE_LIFETIME
+                statement_cache_size = self.config.DATABASE_STATEMENT_CACHE_SIZE
+            # SQLAlchemy's own prepared statement cache on top of asyncpg's
+            url = url.update_query_dict({"prepared_statement_cache_size": str(statement_cache_size)})
+
+        return create_async_engine(
+            url,
+            poolclass=poolclass,
+            pool_size=self.config.DATABASE_POOL_SIZE, # typically 0-30,
+            max_overflow=self.config.DATABASE_MAX_OVERFLOW,
             pool_pre_ping=True, # reconnect automatically
             pool_recycle=3500, # recycle connection every hour
-            echo=PostgresqlConfiguration.DATABASE_ECHO, # set into database configuration
-            connect_args={
-                "timeout": 30,
-                "server_settings": {
-                    "application_name": "app"
-                }
-            }
+            echo=self.config.DATABASE_ECHO, # set into database configuration
+            connect_args=connect_args
         )
+
+    def init(self, db_url: Optional[str] = None, replica_urls: Optional[list[str]] = None):
+        self.config = self.config or get_db_config()
+        self._engine = self._create_engine(db_url or self.config.sqlalchemy_url())
         self._sessionmanager = async_sessionmaker(
             bind=self._engine,
             autoflush=False,
@@ -41,7 +100,63 @@ class DatabaseSessionManager:
             class_=AsyncSession
         )
 
+        replica_urls = self.config.replica_urls() if replica_urls is None else replica_urls
+        self.replicas = [
+            ReplicaState(url, self._create_engine(url, name=f"replica{index}"))
+            for index, url in enumerate(replica_urls)
+        ]
+
+    async def prewarm(self, statements: Iterable[tuple] = ()) -> int:
+        """
+            Open DATABASE_POOL_SIZE connections on the primary and every replica and run the
+            warm-up statements ((statement, params) pairs) on each, so the first requests after a
+            deploy don't pay for connect/TLS/auth nor for preparing the hot statements.
+            Only the primary can fail it: reads fall back to the primary, so a replica that can't
+            be warmed is marked unhealthy (the monitor brings it back) instead of raising
+        """
+        statements = [(text("SELECT 1"), {}), *statements]
+        warmed = await self._prewarm_engine(self._engine, statements, self._prewarm_count(self._engine))
+        for replica in self.replicas:
+            try:
+                warmed += await self._prewarm_engine(replica.engine, statements, self._prewarm_count(replica.engine))
+            except Exception as exc:
+                logger.warning("read replica %s failed to warm up (%s), marked unhealthy",
+                               replica.engine.url.render_as_string(hide_password=True), exc)
+                replica.healthy = False
+        return warmed
+
+    def _prewarm_count(self, engine: AsyncEngine) -> int:
+        return 1 if engine.dialect.name == "sqlite" else self.config.DATABASE_POOL_SIZE
+
+    @staticmethod
+    async def _prewarm_engine(engine: AsyncEngine, statements: list[tuple], count: int) -> int:
+        opened, all_open = 0, asyncio.Event()
+
+        async def warm():
+            nonlocal opened
+            try:
+                async with engine.connect() as connection:
+                    for statement, params in statements:
+                        await connection.execute(statement, params)
+                    await connection.rollback()
+                    opened += 1
+                    if opened == count:
+                        all_open.set()
+                    # hold on to it, otherwise the pool hands the same connection to the next task
+                    await all_open.wait()
+            except BaseException:
+                all_open.set()
+                raise
+
+        await asyncio.gather(*(warm() for _ in range(count)))
+        return opened
+
     async def close(self):
+        await self.stop_monitor()
+        for replica in self.replicas:
+            await replica.engine.dispose()
+        self.replicas = []
+
         if self._engine is not None:
             await self._engine.dispose()
             self._engine = None
@@ -52,7 +167,7 @@ class DatabaseSessionManager:
     async def connect(self) -> AsyncGenerator[AsyncSession, None]:
         if self._engine is None:
             raise Exception("[Postgresql Error] - DatabaseSessionManager is not initialized")
-        
+
         async with self._engine.begin() as connection:
             try:
                 yield connection
@@ -61,11 +176,14 @@ class DatabaseSessionManager:
                 raise
 
     @asynccontextmanager
-    async def session(self) -> AsyncGenerator[AsyncSession, None]:
+    async def session(self, sticky_key: Optional[str] = None) -> AsyncGenerator[AsyncSession, None]:
+        """Primary session, if `sticky_key` is given a commit pins that client's reads to the primary for a while"""
         if self._sessionmanager is None:
             raise Exception("[Postgresql Error] - DatabaseSessionmanager is not initialized")
 
         session = self._sessionmanager()
+        if sticky_key is not None:
+            event.listen(session.sync_session, "after_commit", lambda _: self.mark_written(sticky_key))
         try:
             yield session
         except Exception as e:
@@ -74,9 +192,85 @@ class DatabaseSessionManager:
         finally:
             await session.close()
 
+    # Read replicas
+    def mark_written(self, sticky_key: str):
+        now = time.monotonic()
+        self._sticky[sticky_key] = now + self.config.DATABASE_STICKY_SECONDS
+        self._sticky.move_to_end(sticky_key)
+        # entries are in expiry order, drop the ones that ran out
+        while self._sticky and next(iter(self._sticky.values())) <= now:
+            self._sticky.popitem(last=False)
+
+    def is_sticky(self, sticky_key: Optional[str]) -> bool:
+        return sticky_key is not None and self._sticky.get(sticky_key, 0.0) > time.monotonic()
+
+    def pick_replica(self) -> Optional[ReplicaState]:
+        """Least outstanding requests among the healthy replicas, None = use the primary"""
+        candidates = [replica for replica in self.replicas if replica.healthy]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda replica: replica.outstanding)
+
+    @asynccontextmanager
+    async def read_session(self, sticky_key: Optional[str] = None) -> AsyncGenerator[AsyncSession, None]:
+        """Session for read only work, on a replica unless none is usable or the client just wrote"""
+        replica = None if self.is_sticky(sticky_key) else self.pick_replica()
+        if replica is None:
+            async with self.session() as session:
+                yield session
+            return
+
+        replica.outstanding += 1
+        session = replica.sessionmaker(info={"replica": True})
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            replica.outstanding -= 1
+            await session.close()
+
+    async def check_replicas(self):
+        for replica in self.replicas:
+            try:
+                async with replica.engine.connect() as connection:
+                    if replica.engine.dialect.name == "postgresql":
+                        # caught up replica = 0 even if the primary has been idle for a while
+                        lag = await connection.scalar(text(
+                            "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                            "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+                        ))
+                    else:
+                        lag = await connection.scalar(text("SELECT 0"))
+                replica.lag_seconds = float(lag or 0)
+                replica.healthy = replica.lag_seconds <= self.config.DATABASE_REPLICA_MAX_LAG
+            except Exception:
+                logger.warning("read replica %s is unreachable", replica.engine.url.render_as_string(hide_password=True))
+                replica.healthy = False
+
+    async def _run_monitor(self):
+        while True:
+            await self.check_replicas()
+            await asyncio.sleep(self.config.DATABASE_REPLICA_CHECK_INTERVAL)
+
+    def start_monitor(self):
+        if self.replicas and self._monitor is None:
+            self._monitor = asyncio.create_task(self._run_monitor())
+
+    async def stop_monitor(self):
+        if self._monitor is not None:
+            self._monitor.cancel()
+            try:
+                await self._monitor
+            except asyncio.CancelledError:
+                pass
+            self._monitor = None
+
     # for testing with pytest-asyncio
     async def create_all(self):
         """Create all tables (for testing)"""
+        from models.orm import users  # register the tables on Base.metadata
         async with self._engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
 
@@ -85,10 +279,25 @@ class DatabaseSessionManager:
             await conn.run_sync(Base.metadata.drop_all)
 
 
+def on_replica(session: AsyncSession) -> bool:
+    """Opened by read_session on a replica: what it reads may lag behind the primary"""
+    return session.info.get("replica", False)
+
+
 # Global session manager
 session_manager = DatabaseSessionManager()
 
+
+def client_key(request: Request) -> str:
+    """Identifies a client for read-your-writes, the bearer token when there is one, else the ip"""
+    identity = request.headers.get("authorization") or (request.client.host if request.client else "")
+    return hashlib.blake2b(identity.encode(), digest_size=12).hexdigest()
+
 # FastAPI dependencies
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
-    async with session_manager.session() as session:
-        yield session
\ No newline at end of file
+async def get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    async with session_manager.session(sticky_key=client_key(request)) as session:
+        yield session
+
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    async with session_manager.read_session(sticky_key=client_key(request)) as session:
+        yield session
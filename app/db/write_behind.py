@@ -0,0 +1,202 @@
+import asyncio, logging, time
+
+from datetime import datetime
+from typing import AsyncContextManager, Callable, Optional
+from uuid import UUID
+
+from sqlalchemy import DateTime, Integer, bindparam, case, cast, column, func, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import get_db_config
+from core.metrics import Counter, Gauge, Histogram, registry
+from db.cache import RepositoryCache, repository_cache
+from db.repositories.user_repository import KEEP_VERSION, user_id_key
+from models.orm.users import User
+
+logger = logging.getLogger(__name__)
+
+# 3 bind parameters per row, stays well under postgres' 32767 per statement
+FLUSH_BATCH_ROWS = 5000
+
+
+class _Pending:
+    __slots__ = ("points", "last_login", "events")
+
+    def __init__(self):
+        self.points = 0
+        self.last_login: Optional[datetime] = None
+        self.events = 0
+
+
+class UserCounterBuffer:
+    """
+        Write-behind for the hot User columns: events only touch a dict in memory, per user the
+        point deltas are summed and the latest last_login wins, and every `flush_interval` (or as soon
+        as `max_pending` users are waiting) everything goes out as one
+        UPDATE tb_users SET point = point + v.delta, last_login = greatest(...) FROM (VALUES ...) v.
+        A failed or cancelled flush puts its rows back, stop() lets the flusher finish the flush it is in
+        and writes what is left (called by the lifespan).
+        Producers: the login endpoint stamps last_login here (touch_login). Nothing in the API grants
+        points yet, add_points is where such an endpoint goes instead of its own UPDATE.
+        failed_attempts is not buffered: the lockout in UserRepository.begin_login has to see every
+        attempt the moment it happens
+    """
+    def __init__(self, session_factory: Optional[Callable[[], AsyncContextManager[AsyncSession]]] = None,
+                 flush_interval: float = 1.0, max_pending: int = 10_000, cache: Optional[RepositoryCache] = None):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.cache = cache or repository_cache
+        self._pending: dict[UUID, _Pending] = {}
+        self._full = asyncio.Event()
+        self._stopping = False
+        self._flushing = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    @property
+    def pending_events(self) -> int:
+        return sum(pending.events for pending in self._pending.values())
+
+    def _entry(self, user_id: UUID) -> _Pending:
+        pending = self._pending.get(user_id)
+        if pending is None:
+            pending = self._pending[user_id] = _Pending()
+            if len(self._pending) >= self.max_pending:
+                self._full.set()
+        pending.events += 1
+        return pending
+
+    def add_points(self, user_id: UUID, delta: int):
+        self._entry(user_id).points += delta
+
+    def touch_login(self, user_id: UUID, at: Optional[datetime] = None):
+        pending = self._entry(user_id)
+        at = at or datetime.now()
+        if pending.last_login is None or at > pending.last_login:
+            pending.last_login = at
+
+    def _statement(self, dialect: str, rows: list[tuple]):
+        if dialect == "postgresql":
+            rows_table = values(
+                column("user_id", PG_UUID(as_uuid=True)), column("delta", Integer), column("last_login", DateTime),
+                name="pending"
+            ).data(rows)
+            # greatest() skips NULLs in postgres, a row with only points keeps its last_login.
+            # The cast types the NULLs: in a batch where every last_login is None postgres would
+            # infer text for that VALUES column and refuse to compare it with a timestamp
+            return update(User).where(User.user_id == rows_table.c.user_id).values({
+                User.point: User.point + rows_table.c.delta,
+                User.last_login: func.greatest(User.last_login, cast(rows_table.c.last_login, User.last_login.type)),
+                **KEEP_VERSION
+            }).execution_options(synchronize_session=False), None
+
+        # sqlite stand-in has no VALUES with column names, same UPDATE as one executemany
+        last_login = bindparam("b_last_login", type_=DateTime)
+        return update(User.__table__).where(User.__table__.c.user_id == bindparam("b_user_id")).values({
+            "point": User.__table__.c.point + bindparam("b_delta", type_=Integer),
+            "last_login": case(
+                (last_login.is_(None), User.__table__.c.last_login),
+                (User.__table__.c.last_login.is_(None), last_login),
+                (last_login > User.__table__.c.last_login, last_login),
+                else_=User.__table__.c.last_login
+            ),
+            "updated_at": User.__table__.c.updated_at
+        }), [{"b_user_id": user_id, "b_delta": delta, "b_last_login": at} for user_id, delta, at in rows]
+
+    async def flush(self) -> int:
+        """Write everything pending, returns the number of users written"""
+        async with self._flushing:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+            self._full.clear()
+
+            rows = [(user_id, entry.points, entry.last_login) for user_id, entry in pending.items()]
+            started = time.perf_counter()
+            committed = False
+            try:
+                async with self.session_factory() as session:
+                    dialect = session.bind.dialect.name
+                    for start in range(0, len(rows), FLUSH_BATCH_ROWS):
+                        statement, params = self._statement(dialect, rows[start:start + FLUSH_BATCH_ROWS])
+                        await session.execute(statement, params)
+                    await session.commit()
+                    committed = True
+            except BaseException:
+                # cancellation included: nothing was written unless the commit went through,
+                # putting committed rows back would add their point deltas twice
+                if not committed:
+                    self._restore(pending)
+                    flush_failures.inc()
+                raise
+            finally:
+                flush_latency.observe(time.perf_counter() - started)
+
+            flushed_rows.inc(len(rows))
+            await self.cache.invalidate(*(user_id_key(user_id) for user_id in pending))
+            return len(rows)
+
+    def _restore(self, pending: dict[UUID, _Pending]):
+        """Put the rows of a failed flush back, merged with whatever came in meanwhile"""
+        for user_id, entry in pending.items():
+            current = self._pending.get(user_id)
+            if current is None:
+                self._pending[user_id] = entry
+                continue
+            current.points += entry.points
+            current.events += entry.events
+            if entry.last_login is not None and (current.last_login is None or entry.last_login > current.last_login):
+                current.last_login = entry.last_login
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            if self._stopping:
+                break
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("write-behind flush failed, %d users kept for the next one", len(self._pending))
+
+    def start(self):
+        if self.session_factory is None:
+            from db.session import session_manager
+            self.session_factory = session_manager.session
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and write what is left, must run before the engine is disposed"""
+        if self._task is not None:
+            # no cancel: a flush in progress runs to its end, the loop exits at its next check
+            self._stopping = True
+            self._full.set()
+            await self._task
+            self._task = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("final write-behind flush failed, %d users not written", len(self._pending))
+
+
+db_config = get_db_config()
+user_counters = UserCounterBuffer(
+    flush_interval=db_config.DATABASE_WRITE_BEHIND_INTERVAL,
+    max_pending=db_config.DATABASE_WRITE_BEHIND_MAX_PENDING
+)
+
+pending_gauge = registry.register(Gauge(
+    "db_write_behind_pending", "Users / events waiting in the write-behind buffer", ("unit",),
+    callback=lambda: {("users",): len(user_counters), ("events",): user_counters.pending_events}
+))
+flush_latency = registry.register(Histogram("db_write_behind_flush_seconds", "Duration of one write-behind flush"))
+flushed_rows = registry.register(Counter("db_write_behind_rows_total", "User rows written by write-behind flushes"))
+flush_failures = registry.register(Counter("db_write_behind_failures_total", "Write-behind flushes that failed"))
@@ -1,33 +1,137 @@
-import uvicorn, logging
+import asyncio, logging
 
-from fastapi import FastAPI, Request
-from fastapi.responses import Response
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.gzip import GZipMiddleware
-from fastapi.middleware.httpsredirect import HTTPSRedirectMiddleware
-from fastapi.middleware.wsgi import WSGIMiddleware
-from fastapi.middleware import Middleware
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING
 
-from datetime import datetime
+if TYPE_CHECKING:
+    from fastapi import FastAPI
 
-from core.middlewares import DDoSMiddlewareAPP
-from core.config import APPConfig
-
-
-app_config = APPConfig()
+# Only the app factory lives here: config, security (argon2), routers and the db layer are
+# imported inside create_app()/lifespan so `import main` stays cheap for the server process,
+# see benchmarks/bench_startup.py for the budget.
+# Serve with: uvicorn main:create_app --factory
 
 # Temporary origins
 ALLOW_ORIGINS = ["*"]
-ALLOWED_METHODS = ["GET", "HEAD", "OPTIONS", "PUT", "POST"]
+ALLOWED_METHODS = ["GET", "HEAD", "OPTIONS", "PUT", "POST", "PATCH"]
 ALLOW_HEADERS = ["*"]
 
-middlewares = [
-    #Middleware(DDoSMiddlewareAPP),
-    Middleware(GZipMiddleware),
-    Middleware(WSGIMiddleware),
-    #Middleware(HTTPSRedirectMiddleware),
-    # CORS middleware (carefully configured)
-    Middleware(
+logger = logging.getLogger(__name__)
+
+
+async def warm_up(app: "FastAPI"):
+    """
+        Runs next to the server so /live answers right away, /ready only turns on once this is done:
+        db pool opened + hot statements prepared on every connection, OpenAPI schema built, argon2 loaded
+    """
+    from uuid import UUID
+
+    from core.hashing import _get_hasher
+    from db.repositories.profile_repository import PROFILE_BY_USER_ID
+    from db.repositories.user_repository import USER_BY_EMAIL, USER_BY_ID
+    from db.session import session_manager
+
+    nil = UUID(int=0)
+    statements = [
+        (USER_BY_ID, {"user_id": nil}),
+        (USER_BY_EMAIL, {"email": ""}),
+        (PROFILE_BY_USER_ID, {"user_id": nil})
+    ]
+    attempt = 0
+    while True:
+        try:
+            connections = await session_manager.prewarm(statements)
+            break
+        except Exception:
+            delay = min(2 ** attempt, 30)
+            attempt += 1
+            logger.exception("database warm-up failed, retrying in %ss", delay)
+            await asyncio.sleep(delay)
+
+    try:
+        app.openapi()  # FastAPI caches it, the first /docs doesn't pay for it
+    except Exception:
+        # only a cache, /openapi.json will raise the same error itself, not a reason to stay out of rotation
+        logger.exception("OpenAPI schema prewarm failed")
+    await asyncio.to_thread(_get_hasher)
+    app.state.readiness = "ready"
+    logger.info("warm-up done, %d connections open", connections)
+
+
+def _warm_up_done(app: "FastAPI", task: asyncio.Task):
+    # an exception here would otherwise only surface at shutdown, with /ready stuck on "starting"
+    if not task.cancelled() and task.exception() is not None:
+        app.state.readiness = "failed"
+        logger.error("warm-up failed, the instance stays not ready", exc_info=task.exception())
+
+
+@asynccontextmanager
+async def lifespan(app: "FastAPI"):
+    from core.security import hashing_service, revocation_store
+    from db.availability import availability_index
+    from db.cache import repository_cache
+    from db.session import session_manager
+    from db.write_behind import user_counters
+
+    app.state.readiness = "starting"
+    session_manager.init()
+    await revocation_store.sync()
+    revocation_store.start()
+    repository_cache.start()
+    session_manager.start_monitor()
+    user_counters.start()
+    availability_index.start()  # first run loads the filter, then delta syncs
+    warm_up_task = asyncio.create_task(warm_up(app))
+    warm_up_task.add_done_callback(lambda task: _warm_up_done(app, task))
+    try:
+        yield
+    finally:
+        app.state.readiness = "stopping"
+        warm_up_task.cancel()
+        await asyncio.gather(warm_up_task, return_exceptions=True)  # already logged by _warm_up_done
+        await availability_index.stop()
+        await repository_cache.stop()
+        await revocation_store.stop()
+        await user_counters.stop()  # last flush, the engine must still be there
+        await session_manager.close()  # replica monitor + every engine
+        hashing_service.shutdown()
+
+
+def create_app() -> "FastAPI":
+    from fastapi import FastAPI
+    from fastapi.middleware.cors import CORSMiddleware
+
+    from api.v1.endpoints.admin import admin_endpoint
+    from api.v1.endpoints.auth import auth_route
+    from api.v1.endpoints.health import health_endpoint
+    from api.v1.endpoints.user import user_endpoint
+    from core.compression import CompressionMiddleware
+    from core.config import get_api_config, get_app_config
+    from core.exceptions import AppExceptionHandler, app_exception_handler
+    from core.middlewares import CustomHeadersMiddleware, DDoSMiddlewareAPP
+    from core.observability import RequestTimingMiddleware
+
+    app_config = get_app_config()
+    api_config = get_api_config()
+    app = FastAPI(
+        title=app_config.APP_APINAME,
+        version=app_config.API_VERSION,
+        description=app_config.APP_API_DESC,
+        docs_url="/docs" if app_config.API_DOCS_ENABLE else None,
+        redoc_url="/redoc" if app_config.API_DOCS_ENABLE else None,
+        lifespan=lifespan
+    )
+
+    app.add_exception_handler(AppExceptionHandler, app_exception_handler)
+
+    app.include_router(health_endpoint)
+    app.include_router(auth_route)
+    app.include_router(user_endpoint)
+    app.include_router(admin_endpoint)
+
+    # last added runs first: timing -> security headers -> rate limit -> compression -> CORS -> app,
+    # so a 429 still gets the security headers and is timed, but costs no compression or routing
+    app.add_middleware(
         CORSMiddleware,
         allow_origins=ALLOW_ORIGINS,  # Should be a list of specific origins
         allow_credentials=True,
@@ -37,33 +141,45 @@ middlewares = [
             "Authorization",
             "Content-Type",
             "Content-Length",
+            "ETag",
             "X-Request-ID",
             "X-Response-Time"
         ],
         max_age=600  # 10 minutes for preflight cache
     )
-]
+    app.add_middleware(CompressionMiddleware)
+    if api_config.API_RATELIMIT_ENABLE:
+        app.add_middleware(
+            DDoSMiddlewareAPP,
+            max_requests=api_config.API_RATELIMIT_MAX_REQUESTS,
+            window_seconds=api_config.API_RATELIMIT_WINDOW_SECONDS,
+            block_seconds=api_config.API_RATELIMIT_BLOCK_SECONDS
+        )
+    app.add_middleware(CustomHeadersMiddleware, config=api_config)
+    app.add_middleware(RequestTimingMiddleware)
 
-
-def boot_app() -> FastAPI:
-    app = FastAPI(
-        title=app_config.APP_APINAME,
-        version=app_config.API_VERSION,
-        docs_url="/docs",
-        middleware=middlewares
-    )
+    if app_config.API_PROMETHEUS:
+        from core.metrics import metrics_endpoint
+        app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
 
     return app
 
 
-from api.v1.endpoints.user import user_endpoint
-pp = FastAPI()
+def __getattr__(name: str):
+    # `uvicorn main:pp` still works, the app is only built when it is asked for
+    if name == "pp":
+        app = globals()["pp"] = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-pp.include_router(user_endpoint)
 
 if __name__ == "__main__":
+    import uvicorn
+
+    logging.basicConfig(level=logging.INFO)
     uvicorn.run(
-        app="main:pp",
+        app="main:create_app",
+        factory=True,
         host="localhost",
         reload=True
-    )
\ No newline at end of file
+    )
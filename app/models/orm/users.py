@@ -3,7 +3,7 @@ from enum import Enum
 from typing import Optional
 from uuid import UUID, uuid4
 
-from sqlalchemy import String, Boolean, Integer, ForeignKey, Enum as SQLEnum, text
+from sqlalchemy import JSON, String, Boolean, Integer, ForeignKey, Index, Enum as SQLEnum, func, text
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID, JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -23,10 +23,16 @@ class IdentityType(str, Enum):
 
 class User(Base, TimestampMixin):
     __tablename__ = "tb_users"
-    __table_args__ = {
-        "comment": "Stores system user authentication data",
-        "schema": "auth"  # Fixed typo from "schemas"
-    }
+    __table_args__ = (
+        # keyset pagination of GET /users, ORDER BY created_at DESC, user_id DESC
+        Index("ix_tb_users_created_at_user_id", "created_at", "user_id"),
+        # AvailabilityIndex.sync, WHERE updated_at >= <last watermark>
+        Index("ix_tb_users_updated_at", "updated_at"),
+        {
+            "comment": "Stores system user authentication data",
+            "schema": "auth"  # Fixed typo from "schemas"
+        }
+    )
 
     # Primary Key
     user_id: Mapped[UUID] = mapped_column(
@@ -91,13 +97,18 @@ class User(Base, TimestampMixin):
         default=0,
         comment="Consecutive failed login attempts"
     )
+    locked_until: Mapped[Optional[datetime]] = mapped_column(
+        comment="Login refused until then, set when failed_attempts reaches the limit"
+    )
 
     created_at: Mapped[datetime] = mapped_column(
-        default=datetime.now(),
+        default=datetime.now,
         comment="Datetime created the account"
     )
 
     modified_at: Mapped[datetime] = mapped_column(
+        server_default=func.now(),
+        onupdate=func.now(),
         comment="Datetime modified the account"
     )
 
@@ -145,7 +156,7 @@ class UserProfile(Base):
     )
     metadata_: Mapped[Optional[dict]] = mapped_column(
         "metadata",
-        JSONB,
+        JSONB().with_variant(JSON(), "sqlite"),  # sqlite stand-in for tests/benchmarks
         comment="Additional unstructured profile data"
     )
 
@@ -0,0 +1,17 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from uuid import UUID
+
+
+class ProfilePublic(BaseModel):
+    """Profile as the owner sees it, identity document fields left out"""
+    user_id: UUID
+    first_name: str
+    middle_name: Optional[str] = None
+    last_name: str
+    phone_number: Optional[str] = None
+    metadata: Optional[dict] = Field(None, validation_alias="metadata_")
+
+    class Config:
+        from_attributes = True
+        populate_by_name = True
@@ -3,17 +3,20 @@ from pydantic import BaseModel, Field
 from typing import Optional
 
 class TokenBase(BaseModel):
-    token_type: str = Field(default_factory="bearer", examples="bearer")
+    token_type: str = Field(default="bearer", examples=["bearer"])
 
 class TokenCreate(TokenBase):
-    access_token: str = Field(..., examples="e4hpy9et9weyfdgh...")
-    refresh_token: Optional[str] = Field(None, examples="9gehn9eprtjthgdilg...")
+    access_token: str = Field(..., examples=["e4hpy9et9weyfdgh..."])
+    refresh_token: Optional[str] = Field(None, examples=["9gehn9eprtjthgdilg..."])
+
+class TokenRefresh(BaseModel):
+    refresh_token: str = Field(..., description="Refresh token from /login, single use")
 
 class TokenPayload(BaseModel):
-    sub: str = Field(..., description="Subject (user_id)", examples="UUID tbh")
+    sub: str = Field(..., description="Subject (user_id)", examples=["UUID tbh"])
     exp: datetime = Field(..., description="Expiration time")
-    jti: str = Field(..., description="TOKEN UUID", examples="937ert-394h-3874rh-..")
-    type: str = Field(..., description="Token Type", examples="access/refresh")
+    jti: str = Field(..., description="TOKEN UUID", examples=["937ert-394h-3874rh-.."])
+    type: str = Field(..., description="Token Type", examples=["access/refresh"])
 
 class TokenBlacklist(BaseModel):
     """ For implementing logout """
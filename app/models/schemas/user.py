@@ -3,8 +3,9 @@ from pydantic import model_validator
 from typing import Optional
 from enum import Enum
 from datetime import datetime
+from uuid import UUID
 
-import re
+from core.password_policy import password_policy, username_policy
 
 class UserRole(str, Enum):
     ADMIN: str = "admin"
@@ -19,59 +20,23 @@ class RestrictedUsernames(str, Enum):
     SUPPORT = "support"
 
 class UserBase(BaseModel):
-    email: EmailStr = Field(examples="something@gmail.com", description="Must be a valid email address")
+    email: EmailStr = Field(examples=["something@gmail.com"], description="Must be a valid email address")
     username: str = Field(min_length=4, max_length=40, pattern=r"^[a-zA-Z0-9_]+$")
 
 class UserCreate(UserBase):
-    password: str = Field(..., min_length=8, max_length=50)
+    password: str = Field(..., min_length=password_policy.min_length, max_length=password_policy.max_length)
     password_confirm: str = Field(..., description="Must match password")
 
     @field_validator("username")
     @classmethod
     def validate_username(cls, v: str) -> str:
-        v_lower = v.lower()
-        for reserved in RestrictedUsernames:
-            if v_lower == reserved.value:
-                raise ValueError(f"Username : '{v}' is restricted")
-            
-        return v
+        return username_policy.validate(v)
 
     @field_validator("password")
     @classmethod
     def validate_password(cls, v):
-        forbidden_patterns = [
-            r"[\'\";]", # sql injection trigger
-            r"[<>]", # XML
-            r"\s", # Whitespace
-            r"[\\\/]", # path traversal
-            r"[\{\}\[\]\(\)]", # code block injection
-            r"(?i)(select|insert|delete|drop|alter|create|exec)", # SQL keywords
-            r"(?i)(union|join|having|where)",
-            r"(?i)(script|alert|onerror|onload)",
-            r"\.\.\/", # directory traversal
-        ]
-        # check length
-        if len(v) < 8:
-            raise ValueError("Password must be at least 8 characters")
-        if len(v) > 50:
-            raise ValueError("Password length can't be more than 50 characters")
-        
-        # check forbidden characters
-        for pattern in forbidden_patterns:
-            if re.search(pattern, v):
-                raise ValueError(f"Password contains invalid characters/pattersn: {pattern}")
-
-        requirements = [
-            r"[A-Z]",
-            r"[a-z]",
-            r"[0-9]",
-            r"[!@#$%^&*]", # Allowed special characters
-        ]
-        met = sum(bool(re.search(req, v)) for req in requirements)
-        if met < 3:
-            raise ValueError("Password must contain at least 3 of : uppercase, lowercase or special characters")
-        
-        return v
+        # every rule is checked in one scan, see core/password_policy.py
+        return password_policy.validate(v)
     
     @model_validator(mode="after")
     def validate_password_match(self) -> "UserCreate":
@@ -85,7 +50,12 @@ class UserUpdate(BaseModel):
     email: Optional[EmailStr] = Field(...)
     username: Optional[str] = Field(...)
     current_password: Optional[str] = Field(None, description="Required when changing sensitive field")
-    new_password: Optional[str] = Field(None, min_length=8, max_length=50)
+    new_password: Optional[str] = Field(None, min_length=password_policy.min_length, max_length=password_policy.max_length)
+
+    @field_validator("new_password")
+    @classmethod
+    def validate_new_password(cls, v: Optional[str]) -> Optional[str]:
+        return password_policy.validate(v) if v is not None else v
 
     @model_validator(mode="after")
     def validate_password_change(self) -> "UserUpdate":
@@ -98,7 +68,7 @@ class UserUpdate(BaseModel):
 
 
 class UserInDB(UserBase):
-    user_id: str = Field(..., alias="user_id")
+    user_id: UUID = Field(..., alias="user_id")
     role: UserRole = Field(default=UserRole.USER)
     is_active: bool = Field(default=True)
 
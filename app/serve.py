@@ -0,0 +1,83 @@
+"""
+    Production entry point, run from app/ : python serve.py [--workers N] [--host H] [--port P]
+    (main.py's __main__ is the single process dev server with reload)
+
+    - one worker per usable CPU unless APPLICATION_WORKERS says otherwise
+    - uvloop / httptools when they are installed, asyncio / h11 otherwise
+    - SIGTERM drains: in-flight requests get APPLICATION_GRACEFUL_TIMEOUT seconds to finish
+    - APPLICATION_MAX_REQUESTS recycles a worker after that many requests (uvicorn's supervisor starts a new one)
+    - rate limit counters, token revocations and repository cache invalidations live in shared
+      memory (core/shared_state.py) so every worker sees the same state
+"""
+import argparse, importlib.util, logging, os, shutil, tempfile
+
+import uvicorn
+
+from core.config import get_app_config
+from core.shared_state import CACHE_SEGMENT, RATELIMIT_SEGMENT, REVOCATION_SEGMENT, SHARED_STATE_ENV, SharedSegment, fcntl
+
+logger = logging.getLogger("serve")
+
+
+def cpu_count() -> int:
+    # the cpus this process may run on (container cpusets), not every cpu of the host
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def pick(preferred: str, fallback: str) -> str:
+    return preferred if importlib.util.find_spec(preferred) is not None else fallback
+
+
+def create_shared_state() -> str:
+    """Directory every worker maps its segments from, created before the workers start"""
+    directory = tempfile.mkdtemp(prefix="app-state-", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+    for name, size in (RATELIMIT_SEGMENT, REVOCATION_SEGMENT, CACHE_SEGMENT):
+        SharedSegment(os.path.join(directory, name), size).close()
+    return directory
+
+
+def main():
+    app_config = get_app_config()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=app_config.APP_HOST)
+    parser.add_argument("--port", type=int, default=app_config.APP_PORT)
+    parser.add_argument("--workers", type=int, default=app_config.APP_WORKERS or cpu_count())
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if app_config.APP_DEBUG else logging.INFO)
+    loop, http = pick("uvloop", "asyncio"), pick("httptools", "h11")
+
+    shared_state = None
+    if app_config.APP_SHARED_STATE and args.workers > 1 and fcntl is not None:
+        shared_state = os.environ[SHARED_STATE_ENV] = create_shared_state()
+
+    logger.info(
+        "serving on %s:%s, %d workers, loop=%s http=%s, shared state %s",
+        args.host, args.port, args.workers, loop, http, shared_state or "off"
+    )
+    try:
+        uvicorn.run(
+            "main:create_app",
+            factory=True,
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            loop=loop,
+            http=http,
+            ssl_certfile=app_config.APP_SSLCERT,
+            ssl_keyfile=app_config.APP_SSLPEM,
+            timeout_graceful_shutdown=app_config.APP_GRACEFUL_TIMEOUT,
+            limit_max_requests=app_config.APP_MAX_REQUESTS or None,
+            proxy_headers=True,
+            server_header=False,
+            log_level="debug" if app_config.APP_DEBUG else "info"
+        )
+    finally:
+        if shared_state is not None:
+            shutil.rmtree(shared_state, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+    run from app/ : python -m pytest tests
+    Every test gets its own throwaway aiosqlite file, the same stand-in the benchmarks use
+"""
+import asyncio, os, tempfile, uuid
+
+# before any app module is imported, the config getters read the environment once.
+# The app fixture runs the real lifespan against this file, the repository tests get their own
+os.environ.setdefault("POSTGRES_DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'app.db')}")
+os.environ.setdefault("API_RATELIMIT_MAX_REQUESTS", "1000000")
+os.environ.setdefault("API_SECRET_KEY", "test-access-secret")
+os.environ.setdefault("API_REFRESH_SECRETKEY", "test-refresh-secret")
+os.environ.setdefault("API_CSRFKEY", "test-csrf-secret")
+
+import httpx, pytest, pytest_asyncio
+
+from sqlalchemy import insert
+
+from db.cache import RepositoryCache
+from db.session import DatabaseSessionManager
+from models.orm.users import User, UserRole
+
+
+@pytest_asyncio.fixture
+async def manager(tmp_path):
+    manager = DatabaseSessionManager()
+    manager.init(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", replica_urls=[])
+    await manager.create_all()
+    yield manager
+    await manager.close()
+
+
+@pytest_asyncio.fixture
+async def session(manager):
+    async with manager.session() as session:
+        yield session
+
+
+@pytest.fixture
+def cache():
+    # nothing cached, every read goes to the database
+    return RepositoryCache(max_entries=0)
+
+
+@pytest_asyncio.fixture
+async def users(manager):
+    """`await users(n)` inserts n users and returns their ids"""
+    async def create(count: int) -> list[uuid.UUID]:
+        rows = [
+            {"user_id": uuid.uuid4(), "email": f"user{i}@example.com", "username": f"user_{i}",
+             "hashed_password": "x", "role": UserRole.USER}
+            for i in range(count)
+        ]
+        async with manager.session() as session:
+            await session.execute(insert(User), rows)
+            await session.commit()
+        return [row["user_id"] for row in rows]
+    return create
+
+
+@pytest_asyncio.fixture(loop_scope="session")
+async def client():
+    """
+        create_app() with its lifespan and every middleware, driven over ASGI. The app's singletons
+        (write-behind buffer, caches) bind to the loop they first run on: tests using this fixture
+        run on the session loop, `pytestmark = pytest.mark.asyncio(loop_scope="session")`
+    """
+    from main import create_app
+
+    schema = DatabaseSessionManager()
+    schema.init(replica_urls=[])
+    await schema.create_all()
+    await schema.close()
+
+    app = create_app()
+    async with app.router.lifespan_context(app):
+        while app.state.readiness != "ready":
+            await asyncio.sleep(0.01)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            yield client
+
+
+@pytest_asyncio.fixture(loop_scope="session")
+async def signed_up(client):
+    """`await signed_up()` creates a user and logs in, returns (user_id, Authorization header)"""
+    async def create(password: str = "Test_pass_123") -> tuple[str, dict]:
+        username = f"user_{uuid.uuid4().hex[:12]}"
+        response = await client.post("/users", json={
+            "email": f"{username}@example.com", "username": username, "password": password, "password_confirm": password
+        })
+        assert response.status_code == 201, response.text
+        tokens = (await client.post("/login", data={"username": username, "password": password})).json()
+        return response.json()["user_id"], {"Authorization": f"Bearer {tokens['access_token']}"}
+    return create
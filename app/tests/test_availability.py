@@ -0,0 +1,68 @@
+import pytest
+
+from sqlalchemy import insert, text
+
+from db.availability import AvailabilityIndex
+from models.orm.users import User, UserRole
+
+
+@pytest.mark.asyncio
+async def test_unloaded_index_answers_probably_taken(manager):
+    index = AvailabilityIndex(manager.session, capacity=100)
+    assert index.might_have_username("anyone") and index.might_have_email("anyone@example.com")
+
+
+@pytest.mark.asyncio
+async def test_load_has_no_false_negatives(manager, users):
+    await users(500)
+    index = AvailabilityIndex(manager.session, capacity=500, error_rate=0.001)
+
+    assert await index.load() == 1000
+    assert all(index.might_have_username(f"user_{i}") for i in range(500))
+    assert all(index.might_have_email(f"user{i}@EXAMPLE.com") for i in range(500))  # domain case folded
+    assert sum(index.might_have_username(f"free_{i}") for i in range(1000)) < 20
+    assert index.stats()["expected_fp_rate"] < 0.001
+
+
+@pytest.mark.asyncio
+async def test_local_add_and_sync_from_other_workers(manager, users):
+    await users(10)
+    index = AvailabilityIndex(manager.session, capacity=100)
+    await index.load()
+
+    index.add("created_here", "here@example.com")
+    assert index.might_have_username("created_here")
+
+    async with manager.session() as session:  # another worker's insert
+        await session.execute(insert(User), [{"email": "there@example.com", "username": "created_there",
+                                              "hashed_password": "x", "role": UserRole.USER}])
+        await session.commit()
+    assert await index.sync() == 2
+    assert index.might_have_username("created_there") and index.might_have_email("there@example.com")
+    assert await index.sync() == 0  # rows seen again through the overlap don't count twice
+
+
+@pytest.mark.asyncio
+async def test_is_available_confirms_probable_hits(manager):
+    index = AvailabilityIndex(manager.session, capacity=100)
+    await index.load()
+    index.add("taken")
+    asked = []
+
+    async def exact(name: str) -> bool:
+        asked.append(name)
+        return name == "taken"
+
+    assert await index.is_available(index.might_have_username, exact, "free_name")
+    assert not await index.is_available(index.might_have_username, exact, "taken")
+    assert asked == ["taken"]
+
+
+@pytest.mark.asyncio
+async def test_sync_scan_uses_the_updated_at_index(manager):
+    async with manager.session() as session:
+        plan = (await session.execute(
+            text("EXPLAIN QUERY PLAN SELECT username, email, updated_at FROM tb_users WHERE updated_at >= :since"),
+            {"since": "2026-01-01"}
+        )).all()
+    assert any("ix_tb_users_updated_at" in row[-1] for row in plan), plan
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from core.bulk_import import TOO_LONG, BulkUserImporter, iter_lines, iter_records
+from core.hashing import PasswordHashingService
+
+PASSWORD = "Test_pass_123"
+
+
+async def stream(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+async def collect(iterator) -> list:
+    return [item async for item in iterator]
+
+
+def user(name: str, **fields) -> dict:
+    return {"email": f"{name}@example.com", "username": name, "password": PASSWORD, "password_confirm": PASSWORD, **fields}
+
+
+@pytest.mark.asyncio
+async def test_lines_across_chunks_and_over_the_limit():
+    lines = await collect(iter_lines(stream(b"one\r\ntw", b"o\n" + b"x" * 10, b"x" * 10, b"x\nthree\n\xff\nlast"), max_line_bytes=16))
+    assert lines == ["one", "two", TOO_LONG, "three", None, "last"]
+
+    # the rest of a long line is dropped chunk by chunk, never held
+    assert await collect(iter_lines(stream(b"y" * 20, b"y" * 20, b"y" * 20), max_line_bytes=16)) == [TOO_LONG]
+
+
+@pytest.mark.asyncio
+async def test_ndjson_records():
+    body = b"\n".join([json.dumps(user("alice")).encode(), b"", b"{not json", b"[1, 2]", b'{"a": "' + b"z" * 200 + b'"}'])
+    records = await collect(iter_records(stream(body), "application/x-ndjson", max_line_bytes=160))
+    assert records[0]["username"] == "alice"
+    assert records[1:] == [None, None, TOO_LONG]
+
+
+@pytest.mark.asyncio
+async def test_csv_records():
+    body = b"email,username , password\r\na@example.com,alice,pw\r\n\r\nonly,two\r\n" + b"b" * 64 + b"\r\nc@example.com,carol,pw"
+    records = await collect(iter_records(stream(body), "text/csv; charset=utf-8", max_line_bytes=48))
+    assert records == [
+        {"email": "a@example.com", "username": "alice", "password": "pw"},
+        None, TOO_LONG,
+        {"email": "c@example.com", "username": "carol", "password": "pw"},
+    ]
+
+    # without its header no row can be read
+    assert await collect(iter_records(stream(b"h" * 64 + b"\na,b"), "text/csv", max_line_bytes=48)) == [TOO_LONG]
+
+
+@pytest.mark.asyncio
+async def test_every_row_gets_its_own_outcome(manager):
+    hasher = PasswordHashingService(max_workers=2)
+    importer = BulkUserImporter(manager.session, hasher, batch_size=2, max_line_bytes=256)
+    body = b"\n".join(json.dumps(record).encode() for record in [
+        user("alice"), user("bob_1", password_confirm="Other_pass_123"), user("alice"), {"email": "x" * 300}, user("carol")
+    ]) + b"\n{broken"
+    try:
+        report = await collect(importer.run(iter_records(stream(body), "application/x-ndjson", max_line_bytes=256)))
+    finally:
+        hasher.shutdown()
+
+    outcomes = {entry["row"]: entry for entry in report}
+    assert sorted(outcomes) == [1, 2, 3, 4, 5, 6]
+    assert outcomes[1]["status"] == "created" and outcomes[5]["status"] == "created"
+    assert outcomes[2]["status"] == "invalid"
+    assert outcomes[3]["status"] == "duplicate"
+    assert outcomes[4] == {"row": 4, "status": "invalid", "code": 413, "errors": ["row longer than 256 bytes"]}
+    assert outcomes[6] == {"row": 6, "status": "invalid", "errors": ["malformed row"]}
@@ -0,0 +1,96 @@
+import asyncio, pytest
+
+from core.shared_state import SharedSegment
+from db.cache import ALL_KEYS, RepositoryCache, SharedMemoryCacheBackend
+
+
+@pytest.fixture
+def segment(tmp_path):
+    segment = SharedSegment(str(tmp_path / "cache"), SharedMemoryCacheBackend.HEADER.size + 8 * SharedMemoryCacheBackend.RECORD.size)
+    yield segment
+    segment.close()
+
+
+@pytest.mark.asyncio
+async def test_invalidation_during_a_load_keeps_its_result_out():
+    cache = RepositoryCache()
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def stale_load():
+        started.set()
+        await release.wait()
+        return {"version": "before the write"}
+
+    load = asyncio.create_task(cache.get_or_load("user:1", stale_load))
+    await started.wait()
+    await cache.invalidate("user:1")  # the write committed while the load was reading
+
+    async def fresh_load():
+        return {"version": "after the write"}
+
+    # a caller arriving now must not join the stale load
+    assert await cache.get_or_load("user:1", fresh_load) == {"version": "after the write"}
+    release.set()
+    assert await load == {"version": "before the write"}  # its own caller still gets it
+    assert await cache.get("user:1") == {"version": "after the write"}
+
+
+@pytest.mark.asyncio
+async def test_set_with_generation_skips_dropped_keys():
+    cache = RepositoryCache()
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def load():
+        since = cache.generation
+        started.set()
+        await release.wait()
+        await cache.set("user:id:1", {"row": 1}, since)  # stored next to the key being loaded
+        return 1
+
+    task = asyncio.create_task(cache.get_or_load("user:email:a", load))
+    await started.wait()
+    await cache.invalidate("user:id:1")
+    release.set()
+    await task
+    assert await cache.get("user:id:1") is None
+    assert await cache.get("user:email:a") == 1
+
+
+@pytest.mark.asyncio
+async def test_invalidation_reaches_the_other_worker(segment):
+    workers = [RepositoryCache(backend=SharedMemoryCacheBackend(segment, poll_interval=0.01)) for _ in range(2)]
+    for cache in workers:
+        cache.start()
+    await asyncio.sleep(0.02)  # subscribed
+    try:
+        for cache in workers:
+            await cache.set("user:1", {"version": 1})
+            await cache.set("user:2", {"version": 1})
+
+        await workers[0].invalidate("user:1")
+        await asyncio.sleep(0.1)
+
+        assert [await cache.get("user:1") for cache in workers] == [None, None]
+        assert [await cache.get("user:2") for cache in workers] == [{"version": 1}] * 2
+    finally:
+        for cache in workers:
+            await cache.stop()
+
+
+def test_a_subscriber_that_fell_behind_drops_everything(segment):
+    backend = SharedMemoryCacheBackend(segment)
+    cursor = backend.count()
+    asyncio.run(backend.publish_invalidation([f"user:{i}" for i in range(backend.capacity + 1)]))
+    assert backend.fetch_since(cursor)[0] == [ALL_KEYS]
+
+    cursor = backend.count()
+    asyncio.run(backend.publish_invalidation(["user:email:" + "x" * 300]))  # too long for a record
+    assert backend.fetch_since(cursor) == ([ALL_KEYS], cursor + 1)
+
+
+@pytest.mark.asyncio
+async def test_drop_everything_clears_the_local_cache():
+    cache = RepositoryCache()
+    await cache.set("user:1", 1)
+    cache.discard_local([ALL_KEYS])
+    assert await cache.get("user:1") is None
@@ -0,0 +1,104 @@
+import gzip, zlib
+
+import pytest
+
+from core.compression import Codec, CompressionMiddleware, _ZlibStream, negotiate
+
+JSON = [(b"content-type", b"application/json")]
+
+
+def codec(name: str) -> Codec:
+    # the names are all that negotiation looks at, zlib stands in for zstd / br when they aren't installed
+    return Codec(name, 6, _ZlibStream)
+
+
+def app_sending(*messages):
+    async def app(scope, receive, send):
+        for message in messages:
+            await send(message)
+    return app
+
+
+def start(headers=JSON) -> dict:
+    return {"type": "http.response.start", "status": 200, "headers": list(headers)}
+
+
+def body(data: bytes, more: bool = False) -> dict:
+    return {"type": "http.response.body", "body": data, "more_body": more}
+
+
+async def request(middleware, path: str = "/", accept: str = "gzip", on_message=None) -> tuple[dict, list[dict]]:
+    scope = {"type": "http", "method": "GET", "path": path, "headers": [(b"accept-encoding", accept.encode())]}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+        if on_message is not None:
+            on_message(message)
+
+    await middleware(scope, receive, send)
+    return {name.decode(): value.decode() for name, value in sent[0].get("headers", [])}, sent[1:]
+
+
+def test_codec_is_picked_by_q_value_ties_by_server_order():
+    codecs = [codec("zstd"), codec("br"), codec("gzip")]
+    assert negotiate("gzip, br;q=0.9, zstd;q=0.5", codecs).name == "gzip"
+    assert negotiate("gzip, br", codecs).name == "br"
+    assert negotiate("*;q=0.3, zstd;q=0", codecs).name == "br"
+    assert negotiate("gzip;q=0, identity", codecs) is None
+    assert negotiate("gzip;q=abc", codecs) is None and negotiate(None, codecs) is None
+
+
+@pytest.mark.asyncio
+async def test_small_bodies_and_encoded_bodies_pass_through():
+    middleware = CompressionMiddleware(app_sending(start(), body(b"{}")), minimum_size=500, codecs=[codec("gzip")])
+    headers, messages = await request(middleware)
+    assert "content-encoding" not in headers and messages[0]["body"] == b"{}"
+
+    encoded = gzip.compress(b"x" * 1000)
+    middleware = CompressionMiddleware(
+        app_sending(start(JSON + [(b"content-encoding", b"gzip")]), body(encoded)), minimum_size=10, codecs=[codec("gzip")]
+    )
+    headers, messages = await request(middleware)
+    assert headers["content-encoding"] == "gzip" and messages[0]["body"] == encoded  # not compressed twice
+
+
+@pytest.mark.asyncio
+async def test_streamed_chunks_are_flushed_one_by_one():
+    chunks = [b'{"row": %d}\n' % n for n in range(3)]
+    middleware = CompressionMiddleware(
+        app_sending(start(), *(body(chunk, more=True) for chunk in chunks), body(b"")), minimum_size=10_000,
+        codecs=[codec("gzip")]
+    )
+    decoder, decoded = zlib.decompressobj(31), []
+
+    def on_message(message):
+        if message["type"] == "http.response.body":
+            # every chunk decodes completely the moment it is sent, nothing waits for the next one
+            decoded.append(decoder.decompress(message["body"]))
+
+    headers, messages = await request(middleware, on_message=on_message)
+    assert headers["content-encoding"] == "gzip" and "content-length" not in headers
+    assert decoded == [*chunks, b""]
+    assert decoder.eof and not messages[-1]["more_body"]
+
+
+@pytest.mark.asyncio
+async def test_static_document_is_recompressed_when_it_changes():
+    documents = [b'{"openapi": "3.1.0", "v": 1}' * 20, b'{"openapi": "3.1.0", "v": 2}' * 20]
+    served = iter([documents[0], documents[0], documents[1]])
+
+    async def app(scope, receive, send):
+        await send(start())
+        await send(body(next(served)))
+
+    middleware = CompressionMiddleware(app, minimum_size=10, codecs=[codec("gzip")])
+    first = (await request(middleware, "/openapi.json"))[1][0]["body"]
+    again = (await request(middleware, "/openapi.json"))[1][0]["body"]
+    changed = (await request(middleware, "/openapi.json"))[1][0]["body"]
+
+    assert again is first  # same document, the cached bytes
+    assert gzip.decompress(first) == documents[0] and gzip.decompress(changed) == documents[1]
@@ -0,0 +1,56 @@
+import pytest
+
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+PASSWORD = "Test_pass_123"
+
+
+def rename(username: str) -> dict:
+    return {"email": None, "username": username, "current_password": PASSWORD}
+
+
+async def test_get_user_revalidates_with_304(client, signed_up):
+    user_id, auth = await signed_up()
+    response = await client.get(f"/users/{user_id}", headers=auth)
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "private, no-cache"  # not the middleware's no-store
+    etag = response.headers["etag"]
+
+    response = await client.get(f"/users/{user_id}", headers={**auth, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag and response.headers["cache-control"] == "private, no-cache"
+    assert response.headers["x-content-type-options"] == "nosniff"  # the rest of the security block stays
+
+
+async def test_profile_revalidates_with_304(client, signed_up):
+    user_id, auth = await signed_up()
+    response = await client.get(f"/users/{user_id}/profile", headers=auth)
+    assert response.status_code == 200 and response.headers["cache-control"] == "private, no-cache"
+    etag = response.headers["etag"]
+    response = await client.get(f"/users/{user_id}/profile", headers={**auth, "If-None-Match": etag})
+    assert response.status_code == 304 and response.headers["cache-control"] == "private, no-cache"
+
+
+async def test_if_match_is_a_compare_and_swap(client, signed_up):
+    user_id, auth = await signed_up()
+    etag = (await client.get(f"/users/{user_id}", headers=auth)).headers["etag"]
+
+    first = await client.patch(f"/users/{user_id}", headers={**auth, "If-Match": etag}, json=rename(f"renamed_{user_id[:8]}"))
+    assert first.status_code == 200
+    assert first.headers["etag"] != etag
+
+    # same second as the first write: the stale tag must still lose, and nothing changes
+    stale = await client.patch(f"/users/{user_id}", headers={**auth, "If-Match": etag}, json=rename(f"again_{user_id[:8]}"))
+    assert stale.status_code == 412
+    current = await client.get(f"/users/{user_id}", headers=auth)
+    assert current.json()["username"] == f"renamed_{user_id[:8]}"
+    assert current.headers["etag"] == first.headers["etag"]
+
+    second = await client.patch(f"/users/{user_id}", headers={**auth, "If-Match": first.headers["etag"]}, json=rename(f"again_{user_id[:8]}"))
+    assert second.status_code == 200 and second.headers["etag"] not in (etag, first.headers["etag"])
+
+
+async def test_if_match_with_an_unknown_tag_fails(client, signed_up):
+    user_id, auth = await signed_up()
+    response = await client.patch(f"/users/{user_id}", headers={**auth, "If-Match": '"not-a-version"'}, json=rename("whatever_name"))
+    assert response.status_code == 412
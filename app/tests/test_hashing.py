@@ -0,0 +1,46 @@
+import asyncio, threading
+
+import pytest
+
+from core.exceptions import AppException
+from core.hashing import PasswordHashingService
+from core.metrics import registry
+from core.security import hashing_service
+
+
+@pytest.mark.asyncio
+async def test_calls_over_the_limit_are_rejected_not_queued():
+    service = PasswordHashingService(max_workers=1, queue_size=1)
+    release = threading.Event()
+    try:
+        running = [asyncio.create_task(service._run("hash", release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert service.in_flight == 2
+
+        with pytest.raises(AppException.ServiceUnavailable) as rejected:
+            await service._run("verify", release.wait)
+        assert rejected.value.status_code == 503
+        assert service.metrics()["verify"]["rejected"] == 1
+
+        release.set()
+        await asyncio.gather(*running)
+        assert service.in_flight == 0 and service.metrics()["hash"]["calls"] == 2
+    finally:
+        release.set()
+        service.shutdown()
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_saturated_signup_answers_503_and_shows_in_metrics(client, monkeypatch):
+    monkeypatch.setattr(hashing_service, "in_flight", hashing_service.max_in_flight)
+    rejected = hashing_service.stats["hash"].rejected
+
+    response = await client.post("/users", json={
+        "email": "saturated@example.com", "username": "saturated", "password": "Test_pass_123", "password_confirm": "Test_pass_123"
+    })
+    assert response.status_code == 503
+    assert response.json()["error"] == "ServiceUnavailable"
+
+    scraped = registry.render()
+    assert f'password_hashing_in_flight{{measure="in_flight"}} {hashing_service.max_in_flight}' in scraped
+    assert f'password_hashing_operations{{operation="hash",measure="rejected"}} {rejected + 1}' in scraped
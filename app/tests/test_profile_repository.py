@@ -0,0 +1,64 @@
+import pytest
+
+from sqlalchemy import func, select
+
+from db.repositories import profile_repository
+from db.repositories.profile_repository import ProfileRepository
+from models.orm.users import UserProfile
+
+
+@pytest.mark.asyncio
+async def test_create_or_update_inserts_then_updates_given_columns(session, cache, users):
+    user_id, = await users(1)
+    repository = ProfileRepository(session, cache)
+
+    created = await repository.create_or_update(user_id, {"first_name": "Ada", "last_name": "Lovelace", "middle_name": "King"})
+    assert (created.first_name, created.middle_name) == ("Ada", "King")
+
+    updated = await repository.create_or_update(user_id, {"first_name": "Augusta", "last_name": "Lovelace"})
+    assert (updated.first_name, updated.middle_name) == ("Augusta", "King")  # not given, kept
+    assert await session.scalar(select(func.count()).select_from(UserProfile)) == 1
+
+
+@pytest.mark.asyncio
+async def test_merge_metadata_patches_and_removes_keys(session, cache, users):
+    user_id, = await users(1)
+    repository = ProfileRepository(session, cache)
+    await repository.create_or_update(user_id, {"first_name": "Ada", "last_name": "Lovelace", "metadata_": {"a": 1, "b": 2}})
+
+    assert await repository.merge_metadata(user_id, {"c": 3}) == {"a": 1, "b": 2, "c": 3}
+    assert await repository.merge_metadata(user_id, {"a": 10}, remove=["b"]) == {"a": 10, "c": 3}
+    assert (await repository.get_by_user_id(user_id)).metadata_ == {"a": 10, "c": 3}
+
+
+@pytest.mark.asyncio
+async def test_merge_metadata_without_profile(session, cache, users):
+    user_id, = await users(1)
+    assert await ProfileRepository(session, cache).merge_metadata(user_id, {"a": 1}) is None
+
+
+@pytest.mark.asyncio
+async def test_upsert_many_last_row_wins_per_user(session, cache, users):
+    first, second = await users(2)
+    written = await ProfileRepository(session, cache).upsert_many([
+        {"user_id": first, "first_name": "old", "last_name": "x"},
+        {"user_id": second, "first_name": "only", "last_name": "y"},
+        {"user_id": first, "first_name": "new", "last_name": "z"},
+    ])
+
+    assert written == 2
+    rows = dict((await session.execute(select(UserProfile.user_id, UserProfile.first_name))).all())
+    assert rows == {first: "new", second: "only"}
+
+
+@pytest.mark.asyncio
+async def test_upsert_many_splits_statements_and_updates_existing(session, cache, users, monkeypatch):
+    user_ids = await users(25)
+    monkeypatch.setattr(profile_repository, "MAX_BIND_PARAMS", 30)  # 3 columns -> 10 rows per statement
+    repository = ProfileRepository(session, cache)
+
+    assert await repository.upsert_many([{"user_id": user_id, "first_name": "a", "last_name": "b"} for user_id in user_ids[:10]]) == 10
+    assert await repository.upsert_many([{"user_id": user_id, "first_name": "c", "last_name": "d"} for user_id in user_ids]) == 25
+
+    names = (await session.execute(select(UserProfile.first_name))).scalars().all()
+    assert sorted(names) == ["c"] * 25
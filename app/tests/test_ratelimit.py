@@ -0,0 +1,104 @@
+import multiprocessing
+
+import httpx, pytest
+
+from starlette.responses import PlainTextResponse
+
+from core.config import APIConfiguration, get_api_config
+from core.middlewares import DDoSMiddlewareAPP
+from core.ratelimit import InMemoryRateLimitBackend, SharedMemoryRateLimitBackend
+from core.shared_state import SharedSegment
+
+LIMITS = {"max_requests": 3, "window_seconds": 3, "block_seconds": 10}
+
+
+@pytest.fixture
+def segment_path(tmp_path):
+    return str(tmp_path / "ratelimit")
+
+
+def open_segment(path: str) -> SharedSegment:
+    return SharedSegment(path, SharedMemoryRateLimitBackend.SLOT.size * SharedMemoryRateLimitBackend.GROUP_SLOTS * 4)
+
+
+@pytest.fixture(params=["memory", "shared"])
+def backend(request, segment_path):
+    if request.param == "memory":
+        yield InMemoryRateLimitBackend(**LIMITS)
+        return
+    backend = SharedMemoryRateLimitBackend(open_segment(segment_path), **LIMITS)
+    yield backend
+    backend.segment.close()
+
+
+@pytest.mark.asyncio
+async def test_burst_then_block_then_refill(backend):
+    now = 1_000.0
+    # a full window of burst, one request per emission interval (1s) after that
+    assert [(await backend.hit("a", now)).allowed for _ in range(3)] == [True, True, True]
+    assert (await backend.hit("b", now)).allowed  # other keys are untouched
+
+    over = await backend.hit("a", now)
+    assert not over.allowed and over.retry_after == 10
+    # held for block_seconds even though the rate would allow it again
+    assert (await backend.hit("a", now + 5)) == (False, 5)
+
+    refilled = now + 10
+    assert (await backend.hit("a", refilled)).allowed
+    assert (await backend.hit("a", refilled + 1)).allowed  # one more per emission interval
+
+
+def _hit_from_child(path: str, now: float, queue):
+    backend = SharedMemoryRateLimitBackend(open_segment(path), **LIMITS)
+    queue.put([backend.hit_sync("client", now).allowed for _ in range(2)])
+    backend.segment.close()
+
+
+def test_workers_share_one_budget_through_the_segment(segment_path):
+    now = 2_000.0
+    first = SharedMemoryRateLimitBackend(open_segment(segment_path), **LIMITS)
+    second = SharedMemoryRateLimitBackend(open_segment(segment_path), **LIMITS)
+    try:
+        assert first.hit_sync("client", now).allowed
+
+        # another process spends the rest of the window
+        context = multiprocessing.get_context("fork")
+        queue = context.Queue()
+        child = context.Process(target=_hit_from_child, args=(segment_path, now, queue))
+        child.start()
+        assert queue.get(timeout=10) == [True, True]
+        child.join()
+
+        assert not second.hit_sync("client", now).allowed
+        assert not first.hit_sync("client", now + 1).allowed  # the block is shared as well
+    finally:
+        first.segment.close()
+        second.segment.close()
+
+
+@pytest.mark.asyncio
+async def test_limited_client_gets_429_with_retry_after():
+    async def ok(scope, receive, send):
+        await PlainTextResponse("ok")(scope, receive, send)
+
+    app = DDoSMiddlewareAPP(ok, backend=InMemoryRateLimitBackend(max_requests=2, window_seconds=60, block_seconds=30))
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app, client=("10.0.0.1", 1234)), base_url="http://test") as client:
+        assert [(await client.get("/")).status_code for _ in range(2)] == [200, 200]
+        limited = await client.get("/")
+    assert limited.status_code == 429
+    assert limited.headers["retry-after"] == "30"
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app, client=("10.0.0.2", 1234)), base_url="http://test") as client:
+        assert (await client.get("/")).status_code == 200
+
+
+def test_ratelimit_enable_false_leaves_the_middleware_out(monkeypatch):
+    from main import create_app
+
+    monkeypatch.setenv("API_RATELIMIT_ENABLE", "false")
+    assert APIConfiguration().API_RATELIMIT_ENABLE is False
+
+    monkeypatch.setattr(get_api_config(), "API_RATELIMIT_ENABLE", False)
+    assert DDoSMiddlewareAPP not in [middleware.cls for middleware in create_app().user_middleware]
+    monkeypatch.setattr(get_api_config(), "API_RATELIMIT_ENABLE", True)
+    assert DDoSMiddlewareAPP in [middleware.cls for middleware in create_app().user_middleware]
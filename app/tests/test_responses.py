@@ -0,0 +1,37 @@
+import json, uuid
+
+from types import SimpleNamespace
+
+from pydantic import TypeAdapter
+
+from core.responses import SchemaJSONResponse
+from models.orm.users import UserRole
+from models.schemas.profile import ProfilePublic
+from models.schemas.user import UserPublic
+
+
+def user_row(i: int):
+    return SimpleNamespace(user_id=uuid.uuid4(), email=f"user{i}@example.com", username=f"user_{i}",
+                           role=UserRole.USER, is_active=True, hashed_password="x")
+
+
+def validated(content, schema):
+    adapter = TypeAdapter(list[schema] if isinstance(content, list) else schema)
+    return json.loads(adapter.dump_json(adapter.validate_python(content, from_attributes=True)))
+
+
+def test_trusted_rows_dump_like_the_validated_schema():
+    rows = [user_row(i) for i in range(3)]
+    assert json.loads(SchemaJSONResponse(rows[0], UserPublic).body) == validated(rows[0], UserPublic)
+    assert json.loads(SchemaJSONResponse(rows, UserPublic).body) == validated(rows, UserPublic)
+
+    # repository projections (read_one) are dicts, extra columns stay out
+    projected = {**vars(rows[0]), "updated_at": None}
+    assert json.loads(SchemaJSONResponse(projected, UserPublic).body) == validated(rows[0], UserPublic)
+
+
+def test_validation_alias_is_read_from_the_row():
+    profile = SimpleNamespace(user_id=uuid.uuid4(), first_name="Ada", middle_name=None, last_name="Lovelace",
+                              phone_number=None, metadata_={"theme": "dark"})
+    body = json.loads(SchemaJSONResponse(profile, ProfilePublic).body)
+    assert body["metadata"] == {"theme": "dark"} and body == validated(profile, ProfilePublic)
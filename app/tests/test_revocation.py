@@ -0,0 +1,109 @@
+import asyncio, multiprocessing, time, uuid
+
+from datetime import datetime
+
+import pytest
+
+from core.revocation import BloomFilter, InMemoryRevocationBackend, SharedMemoryRevocationBackend, TokenRevocationStore
+from core.shared_state import SharedSegment
+from models.schemas.token import TokenBlacklist
+
+
+def entry(exp: float, jti: str = None) -> TokenBlacklist:
+    return TokenBlacklist(jti=jti or str(uuid.uuid4()), exp=datetime.fromtimestamp(exp))
+
+
+def open_segment(path: str, records: int = 256) -> SharedSegment:
+    return SharedSegment(path, SharedMemoryRevocationBackend.HEADER.size + records * SharedMemoryRevocationBackend.RECORD.size)
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=2000, error_rate=0.01)
+    revoked = [str(uuid.uuid4()) for _ in range(2000)]
+    for jti in revoked:
+        bloom.add(jti)
+    assert all(jti in bloom for jti in revoked)
+    assert sum(str(uuid.uuid4()) in bloom for _ in range(10_000)) < 250
+
+
+@pytest.mark.asyncio
+async def test_expired_entries_are_compacted_live_ones_still_sync():
+    backend = InMemoryRevocationBackend()
+    now = time.time()
+    reader = TokenRevocationStore(backend)
+
+    expired = [entry(now - 60) for _ in range(5)]
+    for revoked in expired[:3]:
+        await backend.publish(revoked)
+    await reader.sync()  # cursor in the middle of what gets compacted
+    live = entry(now + 3600)
+    for revoked in (*expired[3:], live):
+        await backend.publish(revoked)
+
+    backend.compact(now)
+    assert await backend.fetch_since(0) == ([live], 6)
+    assert not await backend.claim(live) and await backend.claim(expired[0])  # an expired jti leaves the claim set
+
+    await reader.sync()
+    assert reader.is_revoked(live.jti) and len(reader) == 1
+
+    # compaction kicks in on its own once the log doubled
+    for _ in range(backend.MIN_COMPACT):
+        await backend.publish(entry(now - 1))
+    assert len(backend._log) < backend.MIN_COMPACT
+
+
+@pytest.mark.asyncio
+async def test_revocation_reaches_other_workers_through_the_ring(tmp_path):
+    segment = open_segment(str(tmp_path / "revocation"), records=4)
+    writer, reader = (TokenRevocationStore(SharedMemoryRevocationBackend(segment)) for _ in range(2))
+    try:
+        jtis = [str(uuid.uuid4()) for _ in range(6)]
+        for jti in jtis:
+            await writer.revoke(jti, time.time() + 3600)
+        # 6 published into 4 records: the reader skips to the oldest one still kept
+        await reader.sync()
+        assert [reader.is_revoked(jti) for jti in jtis] == [False, False, True, True, True, True]
+        assert not reader.is_revoked(str(uuid.uuid4()))
+    finally:
+        segment.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_claims_have_exactly_one_winner():
+    backend = InMemoryRevocationBackend()
+    workers = [TokenRevocationStore(backend) for _ in range(5)]
+    exp = time.time() + 3600
+
+    results = await asyncio.gather(*(workers[n % 5].claim("refresh-jti", exp) for n in range(50)))
+    assert sum(results) == 1
+    assert all(worker.is_revoked("refresh-jti") for worker in workers)
+
+
+def _claim_in_process(path: str, barrier, queue):
+    segment = open_segment(path)
+    store = TokenRevocationStore(SharedMemoryRevocationBackend(segment))
+    barrier.wait()
+    queue.put(asyncio.run(store.claim("refresh-jti", time.time() + 3600)))
+    segment.close()
+
+
+def test_concurrent_claims_across_processes_have_exactly_one_winner(tmp_path):
+    path = str(tmp_path / "revocation")
+    open_segment(path).close()
+    context = multiprocessing.get_context("fork")
+    barrier, queue = context.Barrier(10), context.Queue()
+    processes = [context.Process(target=_claim_in_process, args=(path, barrier, queue)) for _ in range(10)]
+    for process in processes:
+        process.start()
+    results = [queue.get(timeout=30) for _ in processes]
+    for process in processes:
+        process.join()
+    assert sum(results) == 1
+
+    # a jti that is a prefix of a claimed one is not taken
+    segment = open_segment(path)
+    try:
+        assert asyncio.run(SharedMemoryRevocationBackend(segment).claim(entry(time.time() + 60, "refresh")))
+    finally:
+        segment.close()
@@ -0,0 +1,92 @@
+import uuid, pytest, pytest_asyncio
+
+from sqlalchemy import insert
+
+from db.cache import RepositoryCache
+from db.repositories.user_repository import UserRepository, user_id_key
+from db.session import DatabaseSessionManager, on_replica
+from models.orm.base import Base
+from models.orm.users import User, UserRole
+
+
+@pytest_asyncio.fixture
+async def replicated(tmp_path):
+    """primary + 2 replicas, each its own sqlite file with the schema, nothing replicates between them"""
+    manager = DatabaseSessionManager()
+    manager.init(f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}",
+                 replica_urls=[f"sqlite+aiosqlite:///{tmp_path / f'replica{i}.db'}" for i in range(2)])
+    await manager.create_all()
+    for replica in manager.replicas:
+        async with replica.engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+    yield manager
+    await manager.close()
+
+
+@pytest.mark.asyncio
+async def test_pick_replica_least_outstanding_healthy(replicated):
+    first, second = replicated.replicas
+    first.outstanding = 3
+    assert replicated.pick_replica() is second
+
+    second.healthy = False
+    assert replicated.pick_replica() is first
+
+    first.healthy = False
+    assert replicated.pick_replica() is None
+
+
+@pytest.mark.asyncio
+async def test_read_session_falls_back_to_primary(replicated):
+    async with replicated.read_session() as session:
+        assert on_replica(session)
+        assert sum(replica.outstanding for replica in replicated.replicas) == 1
+    assert all(replica.outstanding == 0 for replica in replicated.replicas)
+
+    for replica in replicated.replicas:
+        replica.healthy = False
+    async with replicated.read_session() as session:
+        assert not on_replica(session)
+
+
+@pytest.mark.asyncio
+async def test_sticky_client_reads_primary_until_expiry(replicated, monkeypatch):
+    async with replicated.session(sticky_key="client") as session:
+        await session.commit()
+    assert replicated.is_sticky("client") and not replicated.is_sticky("other")
+
+    async with replicated.read_session("client") as session:
+        assert not on_replica(session)
+    async with replicated.read_session("other") as session:
+        assert on_replica(session)
+
+    monkeypatch.setattr(replicated.config, "DATABASE_STICKY_SECONDS", 0.0)
+    replicated.mark_written("client")
+    async with replicated.read_session("client") as session:
+        assert on_replica(session)
+
+
+@pytest.mark.asyncio
+async def test_replica_reads_dont_fill_the_cache(replicated):
+    user_id = uuid.uuid4()
+    row = {"user_id": user_id, "email": "stale@example.com", "username": "stale",
+           "hashed_password": "x", "role": UserRole.USER}
+    for replica in replicated.replicas:
+        async with replica.sessionmaker() as session:
+            await session.execute(insert(User), [row])
+            await session.commit()
+
+    cache = RepositoryCache()
+    async with replicated.read_session() as session:
+        assert (await UserRepository(session, cache).get_by_id(user_id)).email == "stale@example.com"
+        assert await UserRepository(session, cache).get_by_mail("stale@example.com") is not None
+    assert await cache.get(user_id_key(user_id)) is None
+    assert cache.misses == 3
+
+    # what a primary read stores, a replica read uses
+    async with replicated.session() as session:
+        await session.execute(insert(User), [{**row, "email": "fresh@example.com"}])
+        await session.commit()
+        await UserRepository(session, cache).get_by_id(user_id)
+    async with replicated.read_session() as session:
+        assert (await UserRepository(session, cache).get_by_id(user_id)).email == "fresh@example.com"
@@ -0,0 +1,114 @@
+import asyncio, pytest
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, select
+
+from db.repositories.profile_repository import ProfileRepository
+from db.cache import RepositoryCache
+from db.repositories.user_repository import UNCACHED_COLUMNS, UserRepository, user_id_key
+from models.orm.users import User
+
+
+@pytest.fixture
+def queries(manager):
+    """Statements sent to the database, read with len()"""
+    sent = []
+    engine = manager._engine.sync_engine
+    listener = lambda conn, cursor, statement, *args: sent.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    yield sent
+    event.remove(engine, "before_cursor_execute", listener)
+
+
+@pytest.mark.asyncio
+async def test_read_projects_public_columns(session, cache, users):
+    user_ids = await users(3)
+    rows = await UserRepository(session, cache).read(user_ids)
+
+    assert sorted(row["user_id"] for row in rows) == sorted(user_ids)
+    assert all("hashed_password" not in row and "failed_attempts" not in row for row in rows)
+    assert not session.identity_map
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("strategy, statements", [("joined", 1), ("selectin", 2)])
+async def test_read_with_profile(session, cache, users, queries, strategy, statements):
+    with_profile, without_profile = await users(2)
+    await ProfileRepository(session, cache).create_or_update(with_profile, {"first_name": "Ada", "last_name": "Lovelace"})
+    queries.clear()
+
+    rows = {row["user_id"]: row for row in await UserRepository(session, cache).read([with_profile, without_profile], profile=strategy)}
+
+    assert len(queries) == statements
+    assert rows[with_profile]["profile"]["first_name"] == "Ada"
+    assert rows[without_profile]["profile"] is None
+
+
+async def login_attempt(manager, cache, login: str, now=None, max_attempts: int = 5):
+    async with manager.session() as session:
+        return await UserRepository(session, cache).begin_login(login, max_attempts, timedelta(minutes=15), now=now)
+
+
+async def login_state(manager, user_id) -> tuple:
+    async with manager.session() as session:
+        return (await session.execute(
+            select(User.failed_attempts, User.locked_until, User.updated_at).where(User.user_id == user_id)
+        )).one()
+
+
+@pytest.mark.asyncio
+async def test_parallel_attempts_stop_at_the_limit(manager, cache, users):
+    user_id, = await users(1)
+    results = await asyncio.gather(*(login_attempt(manager, cache, "user_0") for _ in range(20)))
+
+    assert sum(result is not None for result in results) == 5
+    failed, locked_until, _ = await login_state(manager, user_id)
+    assert failed == 5 and locked_until is not None
+    assert await login_attempt(manager, cache, "user0@example.com") is None  # by email, still locked
+
+
+@pytest.mark.asyncio
+async def test_expired_lockout_starts_the_count_over(manager, cache, users):
+    user_id, = await users(1)
+    for _ in range(5):
+        await login_attempt(manager, cache, "user_0")
+
+    attempt = await login_attempt(manager, cache, "user_0", now=datetime.now() + timedelta(minutes=16))
+    assert attempt is not None and attempt.user_id == user_id
+    assert (await login_state(manager, user_id))[:2] == (1, None)
+
+
+@pytest.mark.asyncio
+async def test_finish_login_resets_the_count_and_keeps_the_version(manager, cache, users):
+    user_id, = await users(1)
+    for _ in range(4):
+        await login_attempt(manager, cache, "user_0")
+    _, _, version = await login_state(manager, user_id)
+
+    async with manager.session() as session:
+        await UserRepository(session, cache).finish_login(user_id)
+    assert await login_state(manager, user_id) == (0, None, version)
+
+
+@pytest.mark.asyncio
+async def test_unknown_login(manager, cache, users):
+    await users(1)
+    assert await login_attempt(manager, cache, "nobody") is None
+
+
+@pytest.mark.asyncio
+async def test_cache_never_holds_credentials(session, users):
+    user_id, = await users(1)
+    cache = RepositoryCache(max_entries=100)
+    repository = UserRepository(session, cache)
+
+    user = await repository.get_by_id(user_id)
+    cached = await cache.get(user_id_key(user_id))
+    assert user.username == "user_0" and cached["username"] == "user_0"
+    assert UNCACHED_COLUMNS.isdisjoint(cached)
+    assert await repository.password_hash(user_id) == "x"
+
+    # a projection that needs an uncached column goes to the database instead
+    row = await repository.read_one(user_id, schema=None)
+    assert row["hashed_password"] == "x" and row["failed_attempts"] == 0
@@ -0,0 +1,72 @@
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+import pytest
+
+from sqlalchemy import select
+
+from db.write_behind import UserCounterBuffer
+from models.orm.users import User
+
+
+async def stored(manager, user_id) -> tuple:
+    async with manager.session() as session:
+        return (await session.execute(select(User.point, User.last_login).where(User.user_id == user_id))).one()
+
+
+@pytest.mark.asyncio
+async def test_events_coalesce_into_one_row_per_user(manager, users, cache):
+    first, second = await users(2)
+    buffer = UserCounterBuffer(manager.session, cache=cache)
+    earlier, later = datetime(2026, 1, 1, 12), datetime(2026, 1, 1, 13)
+
+    buffer.add_points(first, 5)
+    buffer.add_points(first, -2)
+    buffer.touch_login(first, later)
+    buffer.touch_login(first, earlier)
+    buffer.add_points(second, 1)
+    assert len(buffer) == 2 and buffer.pending_events == 5
+
+    assert await buffer.flush() == 2
+    assert len(buffer) == 0
+    assert await stored(manager, first) == (3, later)
+    # a row with only points keeps its last_login
+    assert await stored(manager, second) == (1, None)
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_puts_its_rows_back(manager, users, cache):
+    user_id, = await users(1)
+
+    @asynccontextmanager
+    async def broken():
+        raise ConnectionError("database went away")
+        yield
+
+    buffer = UserCounterBuffer(broken, cache=cache)
+    at = datetime(2026, 1, 1, 12)
+    buffer.add_points(user_id, 2)
+    buffer.touch_login(user_id, at)
+    with pytest.raises(ConnectionError):
+        await buffer.flush()
+
+    # merged with what came in meanwhile, written once the database is back
+    buffer.add_points(user_id, 3)
+    assert len(buffer) == 1 and buffer.pending_events == 3
+    buffer.session_factory = manager.session
+    assert await buffer.flush() == 1
+    assert await stored(manager, user_id) == (5, at)
+
+
+@pytest.mark.asyncio
+async def test_stop_writes_what_is_left(manager, users, cache):
+    user_id, = await users(1)
+    buffer = UserCounterBuffer(manager.session, flush_interval=3600, cache=cache)
+    buffer.start()
+    at = datetime.now() - timedelta(minutes=1)
+    buffer.add_points(user_id, 7)
+    buffer.touch_login(user_id, at)
+
+    await buffer.stop()
+    assert len(buffer) == 0
+    assert await stored(manager, user_id) == (7, at)